@@ -1,14 +1,88 @@
 import os
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session, text
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database_v13.db")
 
 connect_args = {"check_same_thread": False}
+
+# Per-role connection PRAGMAs.
+# Writer: WAL + synchronous=NORMAL keeps group commits cheap (the last commits may roll back on
+# power loss, the database stays consistent) and a long busy_timeout waits out checkpoints and
+# other processes instead of failing. Readers: forced read-only, large mmap window for scans.
+WRITER_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 30000,
+    "cache_size": -65536, # 64 MB
+    "temp_store": "MEMORY"
+}
+READER_PRAGMAS = {
+    "query_only": "ON",
+    "busy_timeout": 5000,
+    "cache_size": -32768, # 32 MB per connection
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY"
+}
+
+def _apply_pragmas(pragmas: dict):
+    def on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        cursor.close()
+    return on_connect
+
+# Write engine: background writer thread, poller, admin/settings mutations
 engine = create_engine(DATABASE_URL, connect_args=connect_args)
+event.listen(engine, "connect", _apply_pragmas(WRITER_PRAGMAS))
+
+# Read-only pool for request handlers
+read_engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_size=8, max_overflow=8)
+event.listen(read_engine, "connect", _apply_pragmas(READER_PRAGMAS))
+
+# Composite / covering indexes for the hot access paths. Created after all column
+# migrations (they may cover columns added by any of them).
+# tests/test_query_plans.py fails if a hot query falls back to a full table scan.
+HOT_INDEXES = {
+    # As-of resolution, latest-per-cluster and per-cluster trends
+    "ix_clustersnapshot_cluster_status_ts": "clustersnapshot (cluster_id, status, timestamp)",
+    # Retention purge of live rows and range filters
+    "ix_licenseusage_epoch": "licenseusage (ts_epoch)",
+    "ix_licenseusage_cluster_epoch": "licenseusage (cluster_id, ts_epoch)",
+    # Latest MAPID set per cluster; global trends read (time, mapid, cluster, licenses) from the index alone
+    "ix_mapidlicenseusage_cluster_epoch": "mapidlicenseusage (cluster_id, ts_epoch)",
+    "ix_mapidlicenseusage_epoch_mapid": "mapidlicenseusage (ts_epoch, mapid, cluster_id, license_count)",
+    # Latest score / history per cluster, retention purge
+    "ix_compliancescore_cluster_epoch": "compliancescore (cluster_id, ts_epoch)",
+    "ix_compliancescore_epoch": "compliancescore (ts_epoch)",
+    # MAPID analytics: daily series read (day, mapid, licenses) from the index alone; latest poll per cluster
+    "ix_mapid_daily_rollup_day_mapid": "mapid_daily_rollup (day, mapid, cluster_id, max_licenses)",
+    "ix_mapid_daily_rollup_cluster_last": "mapid_daily_rollup (cluster_id, last_ts_epoch)",
+    # Trend diffs range query per cluster, retention purge of the change log
+    "ix_license_change_event_cluster_epoch": "license_change_event (cluster_id, ts_epoch)",
+    "ix_license_change_event_epoch": "license_change_event (ts_epoch)",
+    # Operator matrix / fleet queries: installs of the resolved snapshots, by package
+    "ix_operator_install_snapshot_package": "operator_install (snapshot_id, package)",
+    # Unmapped-resource report: reportable rows of recent polls
+    "ix_unmapped_resource_excluded_epoch": "unmapped_resource (excluded, ts_epoch)",
+}
+
+# String-timestamp indexes replaced by their ts_epoch equivalents above
+SUPERSEDED_INDEXES = [
+    "ix_licenseusage_timestamp", "ix_licenseusage_cluster_ts",
+    "ix_mapidlicenseusage_cluster_ts", "ix_mapidlicenseusage_ts_mapid",
+    "ix_compliancescore_cluster_ts", "ix_compliancescore_timestamp",
+]
+
+# Rows per transaction when backfilling typed timestamps
+EPOCH_BACKFILL_BATCH = 50000
 
 def create_db_and_tables():
     # Enable WAL mode for better concurrency
     with engine.connect() as conn:
+        # Only takes effect on a brand new (empty) database; existing databases are
+        # converted by the next full VACUUM (see services/maintenance.run_vacuum_task)
+        conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL;"))
         conn.execute(text("PRAGMA journal_mode=WAL;"))
         conn.commit()
 
@@ -86,9 +160,174 @@ def create_db_and_tables():
                 conn.commit()
                 print("MIGRATION: Success.")
 
+            # Migration 6: Link snapshots and usage rows to a first-class PollRun
+            backfill_runs = False
+            for table in ["clustersnapshot", "licenseusage", "mapidlicenseusage", "compliancescore"]:
+                res = conn.execute(text(f"PRAGMA table_info({table})"))
+                columns = [row[1] for row in res.fetchall()]
+                if columns and "run_id" not in columns:
+                    print(f"MIGRATION: Adding 'run_id' column to {table} table...")
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "run_id" INTEGER REFERENCES pollrun(id)'))
+                    conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_run_id ON {table} (run_id)'))
+                    backfill_runs = True
+            conn.commit()
+
+            if backfill_runs:
+                print("MIGRATION: Backfilling poll runs from snapshot timestamps...")
+                conn.execute(text("""
+                    INSERT INTO pollrun (started_at, finished_at, "trigger", status, total_clusters, total_nodes, total_vcpu)
+                    SELECT timestamp, timestamp, 'scheduled',
+                           CASE WHEN SUM(status != 'Success') > 0 THEN 'Partial/Failed' ELSE 'Success' END,
+                           COUNT(*), COALESCE(SUM(node_count), 0), COALESCE(SUM(vcpu_count), 0)
+                    FROM clustersnapshot
+                    WHERE run_id IS NULL
+                    GROUP BY timestamp
+                """))
+                conn.execute(text("""
+                    UPDATE clustersnapshot
+                    SET run_id = (SELECT id FROM pollrun WHERE pollrun.started_at = clustersnapshot.timestamp)
+                    WHERE run_id IS NULL
+                """))
+
+                # Usage/compliance tables store second-precision strings; map them through an indexed temp table
+                conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS run_ts_map AS SELECT id, substr(started_at, 1, 19) AS ts FROM pollrun"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS temp.ix_run_ts_map_ts ON run_ts_map (ts)"))
+                for table in ["licenseusage", "mapidlicenseusage", "compliancescore"]:
+                    conn.execute(text(f"""
+                        UPDATE {table}
+                        SET run_id = (SELECT id FROM run_ts_map WHERE run_ts_map.ts = {table}.timestamp)
+                        WHERE run_id IS NULL
+                    """))
+                conn.execute(text("DROP TABLE IF EXISTS temp.run_ts_map"))
+                conn.commit()
+
+                # Totals came from the stored columns above; OLM is detected once here with a plain
+                # substring test (no JSON parsing), later runs read it from the snapshot columns
+                conn.execute(text("""
+                    UPDATE pollrun SET collected_components = '["Cluster"'
+                        || CASE WHEN EXISTS (
+                            SELECT 1 FROM clustersnapshot s WHERE s.run_id = pollrun.id
+                            AND (instr(s.data_json, '"csvs"') > 0 OR instr(s.data_json, '"subscriptions"') > 0)
+                        ) THEN ', "Operator"' ELSE '' END
+                        || CASE WHEN EXISTS (SELECT 1 FROM compliancescore c WHERE c.run_id = pollrun.id) THEN ', "Compliance"' ELSE '' END
+                        || ']'
+                    WHERE collected_components IS NULL
+                """))
+                conn.commit()
+                print("MIGRATION: Success.")
+
+            # Migration 7: Snapshot resolution for tiered retention downsampling
+            res = conn.execute(text("PRAGMA table_info(clustersnapshot)"))
+            columns = [row[1] for row in res.fetchall()]
+            if columns and "resolution" not in columns:
+                print("MIGRATION: Adding 'resolution' column to clustersnapshot table...")
+                conn.execute(text("ALTER TABLE clustersnapshot ADD COLUMN \"resolution\" VARCHAR DEFAULT 'raw'"))
+                conn.commit()
+                print("MIGRATION: Success.")
+
+            # Migration 8: Cold archive reference on snapshots
+            if columns and "archive_id" not in columns:
+                print("MIGRATION: Adding 'archive_id' column to clustersnapshot table...")
+                conn.execute(text('ALTER TABLE clustersnapshot ADD COLUMN "archive_id" INTEGER REFERENCES snapshotarchive(id)'))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_clustersnapshot_archive_id ON clustersnapshot (archive_id)"))
+                conn.commit()
+                print("MIGRATION: Success.")
+
+            # Migration 9: Typed epoch timestamps on usage/compliance tables
+            for table in ["licenseusage", "mapidlicenseusage", "compliancescore"]:
+                res = conn.execute(text(f"PRAGMA table_info({table})"))
+                columns = [row[1] for row in res.fetchall()]
+                if columns and "ts_epoch" not in columns:
+                    print(f"MIGRATION: Adding 'ts_epoch' column to {table} table...")
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "ts_epoch" INTEGER'))
+                    conn.commit()
+                    # Backfill in id ranges so a large table never sits in one transaction
+                    lo, hi = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).fetchone()
+                    while lo is not None and lo <= hi:
+                        conn.execute(text(f"""
+                            UPDATE {table} SET ts_epoch = CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER)
+                            WHERE id BETWEEN :lo AND :hi AND ts_epoch IS NULL
+                        """), {"lo": lo, "hi": lo + EPOCH_BACKFILL_BATCH - 1})
+                        conn.commit()
+                        lo += EPOCH_BACKFILL_BATCH
+                    print("MIGRATION: Success.")
+
+            # Migration 10: Precomputed health facts on snapshots (NULL current_version = not extracted)
+            res = conn.execute(text("PRAGMA table_info(clustersnapshot)"))
+            columns = [row[1] for row in res.fetchall()]
+            if columns:
+                to_add = {
+                    "licensed_vcpu_count": "FLOAT DEFAULT 0",
+                    "current_version": "VARCHAR",
+                    "desired_version": "VARCHAR",
+                    "upgrade_percentage": "INTEGER",
+                    "upgrade_message": "VARCHAR",
+                    "degraded_operator_count": "INTEGER DEFAULT 0",
+                    "console_url": "VARCHAR",
+                    "has_service_mesh": "BOOLEAN DEFAULT 0",
+                    "has_argocd": "BOOLEAN DEFAULT 0"
+                }
+                for col, sql_type in to_add.items():
+                    if col not in columns:
+                        print(f"MIGRATION: Adding '{col}' column to clustersnapshot table...")
+                        conn.execute(text(f'ALTER TABLE clustersnapshot ADD COLUMN "{col}" {sql_type}'))
+                conn.commit()
+
+            # Migration 11: Daily MAPID rollup, built once from existing raw usage (maintained on insert afterwards).
+            # Fill-only: rows the insert listener already wrote are never overwritten.
+            has_rollup = conn.execute(text("SELECT 1 FROM mapid_daily_rollup LIMIT 1")).first()
+            lo, hi = conn.execute(text("SELECT MIN(ts_epoch) / 86400, MAX(ts_epoch) / 86400 FROM mapidlicenseusage")).one()
+            if not has_rollup and lo is not None:
+                from app.services.rollup import REBUILD_DAYS_PER_BATCH, MAPID_ROLLUP_FILL_SQL
+                print("MIGRATION: Building mapid_daily_rollup from MAPID usage history...")
+                for day in range(lo, hi + 1, REBUILD_DAYS_PER_BATCH):
+                    conn.execute(text(MAPID_ROLLUP_FILL_SQL), {"lo": day * 86400, "hi": (day + REBUILD_DAYS_PER_BATCH) * 86400})
+                    conn.commit()
+                print("MIGRATION: Success.")
+
+            # Migration 12: OLM facts on snapshots (NULL olm_collected = polled before the operator_install inventory)
+            res = conn.execute(text("PRAGMA table_info(clustersnapshot)"))
+            columns = [row[1] for row in res.fetchall()]
+            if columns:
+                for col, sql_type in {"olm_collected": "BOOLEAN", "olm_auth_error": "BOOLEAN DEFAULT 0"}.items():
+                    if col not in columns:
+                        print(f"MIGRATION: Adding '{col}' column to clustersnapshot table...")
+                        conn.execute(text(f'ALTER TABLE clustersnapshot ADD COLUMN "{col}" {sql_type}'))
+                conn.commit()
+
+            # Migration 13: License rules fingerprint on snapshots (NULL = counts of unknown rules)
+            res = conn.execute(text("PRAGMA table_info(clustersnapshot)"))
+            columns = [row[1] for row in res.fetchall()]
+            if columns and "license_rules_hash" not in columns:
+                print("MIGRATION: Adding 'license_rules_hash' column to clustersnapshot table...")
+                conn.execute(text('ALTER TABLE clustersnapshot ADD COLUMN "license_rules_hash" VARCHAR'))
+                conn.commit()
+                print("MIGRATION: Success.")
+
+            # Migration 14: Composite indexes for hot queries. Keep this one last: the indexes cover columns added above
+            existing = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).fetchall()}
+            missing = [name for name in HOT_INDEXES if name not in existing]
+            superseded = [name for name in SUPERSEDED_INDEXES if name in existing]
+            if missing or superseded:
+                for name in superseded:
+                    print(f"MIGRATION: Dropping superseded index {name}...")
+                    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                for name in missing:
+                    print(f"MIGRATION: Creating index {name}...")
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {HOT_INDEXES[name]}"))
+                # Refresh planner statistics so the new indexes get picked up
+                conn.execute(text("PRAGMA optimize"))
+                conn.commit()
+                print("MIGRATION: Success.")
+
     except Exception as e:
         print(f"MIGRATION ERROR: {e}")
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def get_read_session():
+    """Session on the read-only pool for handlers that never write (writes go through services.writer)."""
+    with Session(read_engine) as session:
+        yield session
@@ -17,6 +17,12 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
+# gzip for clients that accept it, above a size threshold; streamed bodies are compressed
+# chunk by chunk, SSE streams are left alone
+from fastapi.middleware.gzip import GZipMiddleware
+from app.services.encoding import GZIP_MINIMUM_BYTES, GZIP_LEVEL, GZIP_EXCLUDED_CONTENT_TYPES
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_BYTES, compresslevel=GZIP_LEVEL, exclude_content_types=GZIP_EXCLUDED_CONTENT_TYPES)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 from app.routers import admin, dashboard, views, audit, auth, settings, operators
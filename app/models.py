@@ -1,8 +1,18 @@
+import calendar
 from typing import Optional, Any
 from datetime import datetime
+from sqlalchemy import event, text
 from sqlmodel import Field, SQLModel, Column, Text, Boolean
 from pydantic import field_validator
 
+def epoch_seconds(value) -> Optional[int]:
+    """UTC epoch seconds for a naive UTC datetime or a "%Y-%m-%d %H:%M:%S" string."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+    return calendar.timegm(value.utctimetuple())
+
 class ClusterBase(SQLModel):
     name: str = Field(index=True, unique=True)
     unique_id: Optional[str] = Field(default=None, index=True) # OpenShift Cluster ID
@@ -74,10 +84,27 @@ class AuditRule(SQLModel, table=True):
     match_environment: Optional[str] = None
     is_enabled: bool = Field(default=True)
 
+class PollRun(SQLModel, table=True):
+    __tablename__ = "pollrun"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    started_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    finished_at: Optional[datetime] = None
+    trigger: str = Field(default="scheduled") # "scheduled", "manual"
+    status: str = Field(default="Running") # Running, Success, Partial/Failed
+
+    # Precomputed aggregates (refreshed when the run finishes or loses snapshots)
+    total_clusters: int = Field(default=0)
+    total_nodes: int = Field(default=0)
+    total_vcpu: float = Field(default=0.0)
+    collected_components: Optional[str] = None # JSON list e.g. ["Cluster", "Operator", "Compliance"]
+
 class ComplianceScore(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     cluster_id: int = Field(index=True)
+    run_id: Optional[int] = Field(default=None, foreign_key="pollrun.id", index=True)
     timestamp: str 
+    ts_epoch: Optional[int] = None # Typed twin of `timestamp` (UTC epoch seconds), used for filtering/bucketing
     passed_count: int
     total_count: int
     score: float
@@ -86,7 +113,9 @@ class ComplianceScore(SQLModel, table=True):
 class LicenseUsage(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     cluster_id: int = Field(index=True)
+    run_id: Optional[int] = Field(default=None, foreign_key="pollrun.id", index=True) # Null for live dashboard refreshes
     timestamp: str
+    ts_epoch: Optional[int] = None # Typed twin of `timestamp` (UTC epoch seconds), used for filtering/bucketing
     node_count: int
     total_vcpu: float
     license_count: int
@@ -95,13 +124,54 @@ class LicenseUsage(SQLModel, table=True):
 class MapidLicenseUsage(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     cluster_id: int = Field(index=True)
+    run_id: Optional[int] = Field(default=None, foreign_key="pollrun.id", index=True)
     timestamp: str = Field(index=True)
+    ts_epoch: Optional[int] = None # Typed twin of `timestamp` (UTC epoch seconds), used for filtering/bucketing
     mapid: str = Field(index=True)
     lob: Optional[str] = None
     node_count: int
     total_vcpu: float
     license_count: int
 
+class MapidDailyRollup(SQLModel, table=True):
+    """
+    One row per cluster x UTC day x MAPID summarising that day's MapidLicenseUsage rows.
+    Maintained on every usage insert (see _roll_up_mapid_usage) and rebuildable from raw
+    rows (services.rollup), so analytics never re-aggregate raw history.
+    """
+    __tablename__ = "mapid_daily_rollup"
+
+    cluster_id: int = Field(primary_key=True)
+    day: int = Field(primary_key=True) # UTC days since the epoch (ts_epoch // 86400)
+    mapid: str = Field(primary_key=True)
+    lob: Optional[str] = None
+    samples: int = Field(default=0) # Usage rows (polls) folded in; avg_* = sum_* / samples
+    max_licenses: int = Field(default=0)
+    sum_licenses: int = Field(default=0)
+    max_nodes: int = Field(default=0)
+    sum_nodes: int = Field(default=0)
+    max_vcpu: float = Field(default=0.0)
+    sum_vcpu: float = Field(default=0.0)
+    # Values of the day's latest poll, for "current" breakdowns
+    last_ts_epoch: int = Field(default=0)
+    last_licenses: int = Field(default=0)
+    last_nodes: int = Field(default=0)
+    last_vcpu: float = Field(default=0.0)
+
+class LicenseChangeEvent(SQLModel, table=True):
+    """Licensed-node change between a cluster's previous and current successful poll (computed at poll time)."""
+    __tablename__ = "license_change_event"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cluster_id: int = Field(index=True)
+    run_id: Optional[int] = Field(default=None, foreign_key="pollrun.id", index=True) # Poll that observed the change
+    timestamp: str
+    ts_epoch: Optional[int] = None # Typed twin of `timestamp` (UTC epoch seconds), used for filtering/bucketing
+    change_type: str # ADDED, REMOVED, MODIFIED (node vCPU/licenses changed; no node_name = count moved, node set did not)
+    node_name: Optional[str] = None
+    vcpu: Optional[float] = None # Current vCPU (last known for REMOVED)
+    prev_vcpu: Optional[float] = None
+    license_diff: int = Field(default=0) # Licenses this change added (negative when removed)
 
 class LicenseRule(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -155,13 +225,28 @@ class AppConfig(SQLModel, table=True):
     key: str = Field(primary_key=True)
     value: Optional[str] = None
 
+class SnapshotArchive(SQLModel, table=True):
+    """Index row of a compressed per-run NDJSON archive holding cold snapshot blobs."""
+    __tablename__ = "snapshotarchive"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: Optional[int] = Field(default=None, foreign_key="pollrun.id", index=True)
+    path: str # File name relative to the archive directory
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    snapshot_count: int = Field(default=0)
+    raw_bytes: int = Field(default=0)
+    compressed_bytes: int = Field(default=0)
+
 class ClusterSnapshot(SQLModel, table=True):
     __tablename__ = "clustersnapshot"
     
     id: Optional[int] = Field(default=None, primary_key=True)
     cluster_id: int = Field(foreign_key="cluster.id", index=True)
+    run_id: Optional[int] = Field(default=None, foreign_key="pollrun.id", index=True)
     timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
     status: str = Field(default="Success") # Success, Partial, Failed
+    resolution: str = Field(default="raw") # raw, hourly, daily (set by tiered retention downsampling)
+    archive_id: Optional[int] = Field(default=None, foreign_key="snapshotarchive.id", index=True) # Set when blobs moved to cold archive
     
     # Identity freeze
     captured_name: Optional[str] = None
@@ -175,6 +260,25 @@ class ClusterSnapshot(SQLModel, table=True):
     machine_count: int = Field(default=0)
     license_count: int = Field(default=0)
     licensed_node_count: int = Field(default=0)
+    licensed_vcpu_count: float = Field(default=0.0)
+
+    # Health facts extracted at poll time (services.ocp.extract_health_facts) so the fast
+    # dashboard path never parses data_json. current_version is NULL on older snapshots.
+    current_version: Optional[str] = None
+    desired_version: Optional[str] = None
+    upgrade_percentage: Optional[int] = None # Set only while an upgrade is progressing
+    upgrade_message: Optional[str] = None
+    degraded_operator_count: int = Field(default=0) # ClusterOperators Degraded or not Available
+    console_url: Optional[str] = None
+    has_service_mesh: bool = Field(default=False)
+    has_argocd: bool = Field(default=False)
+    # services.license.license_rules_fingerprint of the rules license_count was calculated with
+    license_rules_hash: Optional[str] = None
+
+    # OLM facts (services.operator_inventory.olm_facts). olm_collected is NULL on snapshots
+    # polled before the operator_install inventory existed; readers fall back to data_json.
+    olm_collected: Optional[bool] = None
+    olm_auth_error: bool = Field(default=False)
     
     # Store full data dump
     data_json: str = Field(sa_column=Column(Text)) # Stores compressed/large JSON blob
@@ -188,3 +292,79 @@ class NamespaceExclusionRule(SQLModel, table=True):
     is_active: bool = Field(default=True)
     description: Optional[str] = None
 
+class OperatorInstall(SQLModel, table=True):
+    """One OLM subscription of a successful snapshot, joined to its installed CSV at poll time."""
+    __tablename__ = "operator_install"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cluster_id: int = Field(index=True)
+    snapshot_id: int
+    package: str # Subscription spec.name, e.g. "advanced-cluster-management"
+    display_name: str
+    provider: str = Field(default="Unknown")
+    channel: str = Field(default="unknown")
+    installed_csv: Optional[str] = None
+    version: str = Field(default="Unknown") # CSV spec.version, or currentCSV / "Pending" while installing
+    version_key: Optional[str] = None # Sortable form of `version` (operator_inventory.version_sort_key)
+    phase: str = Field(default="Unknown")
+    approval: str = Field(default="Automatic")
+    source: Optional[str] = None
+    subscription_name: Optional[str] = None
+    namespace: Optional[str] = None
+    managed_crds_json: Optional[str] = None # Owned CRDs of the installed CSV
+
+class UnmappedResource(SQLModel, table=True):
+    """Licensed node or project without a MAPID label in a cluster's latest successful poll (replaced at poll time)."""
+    __tablename__ = "unmapped_resource"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cluster_id: int = Field(index=True)
+    snapshot_id: Optional[int] = None # Snapshot the row was computed from
+    ts_epoch: int # Poll time (UTC epoch seconds)
+    kind: str # "Node" (licensed) or "Project"
+    name: str
+    excluded: bool = Field(default=False) # Project matched by a NamespaceExclusionRule (re-evaluated when rules change)
+
+def _stamp_epoch(mapper, connection, target):
+    """Keeps `ts_epoch` in step with the string `timestamp` for every ORM insert."""
+    if target.ts_epoch is None and target.timestamp:
+        target.ts_epoch = epoch_seconds(target.timestamp)
+
+for _model in (LicenseUsage, MapidLicenseUsage, ComplianceScore, LicenseChangeEvent):
+    event.listen(_model, "before_insert", _stamp_epoch)
+
+# Folds one usage row into its daily rollup row. SET expressions see the pre-update values,
+# so the "last" columns only move forward when the new row is at least as recent.
+MAPID_ROLLUP_UPSERT = text("""
+    INSERT INTO mapid_daily_rollup (
+        cluster_id, day, mapid, lob, samples, max_licenses, sum_licenses, max_nodes, sum_nodes,
+        max_vcpu, sum_vcpu, last_ts_epoch, last_licenses, last_nodes, last_vcpu
+    ) VALUES (
+        :cluster_id, :ts_epoch / 86400, :mapid, :lob, 1, :licenses, :licenses, :nodes, :nodes,
+        :vcpu, :vcpu, :ts_epoch, :licenses, :nodes, :vcpu
+    )
+    ON CONFLICT (cluster_id, day, mapid) DO UPDATE SET
+        samples = samples + 1,
+        max_licenses = MAX(max_licenses, excluded.max_licenses),
+        sum_licenses = sum_licenses + excluded.sum_licenses,
+        max_nodes = MAX(max_nodes, excluded.max_nodes),
+        sum_nodes = sum_nodes + excluded.sum_nodes,
+        max_vcpu = MAX(max_vcpu, excluded.max_vcpu),
+        sum_vcpu = sum_vcpu + excluded.sum_vcpu,
+        lob = CASE WHEN excluded.last_ts_epoch >= last_ts_epoch THEN COALESCE(excluded.lob, lob) ELSE lob END,
+        last_licenses = CASE WHEN excluded.last_ts_epoch >= last_ts_epoch THEN excluded.last_licenses ELSE last_licenses END,
+        last_nodes = CASE WHEN excluded.last_ts_epoch >= last_ts_epoch THEN excluded.last_nodes ELSE last_nodes END,
+        last_vcpu = CASE WHEN excluded.last_ts_epoch >= last_ts_epoch THEN excluded.last_vcpu ELSE last_vcpu END,
+        last_ts_epoch = MAX(last_ts_epoch, excluded.last_ts_epoch)
+""")
+
+def _roll_up_mapid_usage(mapper, connection, target):
+    """Keeps mapid_daily_rollup current for every ORM insert (poller, backfill), in the same transaction."""
+    if target.ts_epoch is None:
+        return
+    connection.execute(MAPID_ROLLUP_UPSERT, {
+        "cluster_id": target.cluster_id, "ts_epoch": target.ts_epoch, "mapid": target.mapid, "lob": target.lob,
+        "licenses": target.license_count, "nodes": target.node_count, "vcpu": target.total_vcpu
+    })
+
+event.listen(MapidLicenseUsage, "after_insert", _roll_up_mapid_usage)
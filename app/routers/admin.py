@@ -4,13 +4,18 @@ from sqlmodel import Session, select, SQLModel
 from typing import List, Optional
 import json
 import asyncio
+import logging
 from pydantic import BaseModel
 from app.database import get_session
 from app.models import Cluster, ClusterCreate, ClusterRead, ClusterUpdate, AppConfig, ClusterSnapshot, User
 from app.services.scheduler import refresh_jobs
 from app.dependencies import admin_required, operator_allowed
+from app.services.shared_cache import shared_cache
+from app.services.writer import write
 import os
 
+logger = logging.getLogger(__name__)
+
 class ConfigUpdate(BaseModel):
     poll_interval_minutes: int
     snapshot_retention_days: int
@@ -18,6 +23,8 @@ class ConfigUpdate(BaseModel):
     run_compliance: bool
     dashboard_cache_ttl_minutes: int
     enable_db_vacuum: bool = True
+    snapshot_retention_tiers: str = "" # e.g. "7:hourly,30:daily"
+    snapshot_archive_after_days: int = 0 # 0 = cold archive disabled
 
 class CleanupRequest(BaseModel):
     days: int
@@ -37,47 +44,61 @@ router = APIRouter(
 )
 
 class PollManager:
+    """
+    Streams poll progress to SSE subscribers. The poller publishes every run's progress to the
+    shared cache's event channel and holds a cross-process lease while running, so a subscriber
+    on any worker follows a run started on any other, and no two workers poll at once.
+    """
+    TAIL_INTERVAL_SECONDS = 0.5
+
     def __init__(self):
         self.subscribers: List[asyncio.Queue] = []
-        self.is_running = False
         self._lock = asyncio.Lock()
-        self.loop = None
+        self._tail_task = None
+        self._seq = 0
+
+    @property
+    def is_running(self) -> bool:
+        from app.services.poller import is_poll_running
+        return is_poll_running()
 
     async def subscribe(self) -> asyncio.Queue:
-        if not self.loop:
-            self.loop = asyncio.get_running_loop()
+        from app.services.poller import POLL_EVENTS_CHANNEL
         q = asyncio.Queue()
         self.subscribers.append(q)
+        if self._tail_task is None or self._tail_task.done():
+            self._seq = shared_cache.last_seq(POLL_EVENTS_CHANNEL)
+            self._tail_task = asyncio.create_task(self._tail())
         return q
 
     def unsubscribe(self, q: asyncio.Queue):
         if q in self.subscribers:
             self.subscribers.remove(q)
 
-    def broadcast(self, data):
-        if not self.loop:
-            return
-        for q in self.subscribers:
-            self.loop.call_soon_threadsafe(q.put_nowait, data)
+    async def _tail(self):
+        """Relays channel events (from this or any other worker) to local subscribers."""
+        from app.services.poller import POLL_EVENTS_CHANNEL
+        while self.subscribers:
+            for seq, data in shared_cache.events_since(POLL_EVENTS_CHANNEL, self._seq):
+                self._seq = seq
+                for q in list(self.subscribers):
+                    q.put_nowait(data)
+            await asyncio.sleep(self.TAIL_INTERVAL_SECONDS)
 
     async def start(self):
         async with self._lock:
             if self.is_running:
                 return
-            self.is_running = True
             
-            # Start in thread
+            # Start in thread; progress, "done" and errors arrive through the event channel
             import threading
             from app.services.poller import poll_all_clusters
             
             def run_wrapper():
                 try:
-                    poll_all_clusters(progress_callback=self.broadcast)
-                    self.broadcast({"type": "done"})
+                    poll_all_clusters(trigger="manual")
                 except Exception as e:
-                    self.broadcast({"type": "error", "message": str(e)})
-                finally:
-                    self.is_running = False
+                    logger.error(f"Manual poll failed: {e}")
 
             threading.Thread(target=run_wrapper, daemon=True).start()
 
@@ -173,6 +194,29 @@ def update_scheduler_config(config: ConfigUpdate, session: Session = Depends(get
     else:
         db_retention.value = str(config.snapshot_retention_days)
         session.add(db_retention)
+
+    # Update Retention Tiers (downsampling)
+    from app.services.retention import parse_retention_tiers
+    try:
+        parse_retention_tiers(config.snapshot_retention_tiers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid retention tiers: {e}")
+    db_tiers = session.get(AppConfig, "SNAPSHOT_RETENTION_TIERS")
+    if not db_tiers:
+        db_tiers = AppConfig(key="SNAPSHOT_RETENTION_TIERS", value=config.snapshot_retention_tiers.strip())
+        session.add(db_tiers)
+    else:
+        db_tiers.value = config.snapshot_retention_tiers.strip()
+        session.add(db_tiers)
+
+    # Update Cold Archive Age
+    db_archive = session.get(AppConfig, "SNAPSHOT_ARCHIVE_AFTER_DAYS")
+    if not db_archive:
+        db_archive = AppConfig(key="SNAPSHOT_ARCHIVE_AFTER_DAYS", value=str(max(0, config.snapshot_archive_after_days)))
+        session.add(db_archive)
+    else:
+        db_archive.value = str(max(0, config.snapshot_archive_after_days))
+        session.add(db_archive)
         
     # Update OLM Collection
     db_olm = session.get(AppConfig, "SNAPSHOT_COLLECT_OLM")
@@ -260,88 +304,82 @@ def trigger_manual_poll(session: Session = Depends(get_session), user: User = De
     """Manually triggers the background poller."""
     from app.services.poller import poll_all_clusters
     try:
-        poll_all_clusters()
+        if not poll_all_clusters(trigger="manual"):
+            return {"status": "skipped", "message": "A poll is already running"}
         return {"status": "success", "message": "Manual poll triggered"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/clusters/snapshots", response_model=dict)
 def list_snapshots(limit: int = 50, offset: int = 0, session: Session = Depends(get_session), user: User = Depends(operator_allowed)):
-    """Groups snapshots by global timestamp (run)."""
+    """Lists poll runs (newest first) with their snapshots. Aggregates are precomputed on PollRun."""
     from sqlmodel import func
+    from app.models import PollRun
 
-    # 1. Get total unique timestamps for pagination
-    total_runs = session.exec(select(func.count(func.distinct(ClusterSnapshot.timestamp)))).one()
+    # 1. Pagination counts
+    total_runs = session.exec(select(func.count(PollRun.id))).one()
     total_snapshots = session.exec(select(func.count(ClusterSnapshot.id))).one()
     
-    # 2. Get distinct timestamps first (Paginated)
-    ts_statement = select(ClusterSnapshot.timestamp)\
-        .distinct()\
-        .order_by(ClusterSnapshot.timestamp.desc())\
-        .offset(offset)\
+    # 2. Page of runs (indexed on started_at)
+    runs = session.exec(
+        select(PollRun)
+        .order_by(PollRun.started_at.desc())
+        .offset(offset)
         .limit(limit)
-        
-    timestamps = session.exec(ts_statement).all()
+    ).all()
     
-    if not timestamps:
+    if not runs:
         return {
             "total_runs": total_runs,
             "total_snapshots": total_snapshots,
             "groups": []
         }
 
-    from app.models import ComplianceScore
-    compliance_runs = session.exec(select(ComplianceScore.timestamp).where(ComplianceScore.timestamp.in_([ts.strftime("%Y-%m-%d %H:%M:%S") for ts in timestamps]))).all()
-    compliance_ts_set = set(compliance_runs)
+    groups = []
+    group_map = {}
+    for run in runs:
+        ts_str = run.started_at.strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            components = json.loads(run.collected_components) if run.collected_components else ["Cluster"]
+        except Exception:
+            components = ["Cluster"]
 
-    from sqlalchemy.orm import defer
+        g = {
+            "group_id": str(run.id),
+            "run_id": run.id,
+            "timestamp": run.started_at,
+            "timestamp_str": ts_str,
+            "finished_at": run.finished_at,
+            "trigger": run.trigger,
+            "total_clusters": run.total_clusters,
+            "status": run.status,
+            "total_nodes": run.total_nodes,
+            "total_vcpu": run.total_vcpu,
+            "collected_components": components,
+            "snapshots": []
+        }
+        groups.append(g)
+        group_map[run.id] = g
+
+    from sqlalchemy.orm import load_only
     
-    # 3. Fetch all snapshots for these timestamps
-    # CRITICAL OPTIMIZATION: Defer data_json to avoid loading megabytes of data per row
+    # 3. Fetch snapshot rows for these runs via the run_id index
+    # CRITICAL OPTIMIZATION: Only load the light columns, never the data_json blobs
     statement = select(ClusterSnapshot, Cluster.name)\
         .join(Cluster, isouter=True)\
-        .where(ClusterSnapshot.timestamp.in_(timestamps))\
-        .order_by(ClusterSnapshot.timestamp.desc())\
-        .options(defer(ClusterSnapshot.data_json))
+        .where(ClusterSnapshot.run_id.in_(list(group_map.keys())))\
+        .order_by(ClusterSnapshot.id)\
+        .options(load_only(
+            ClusterSnapshot.id, ClusterSnapshot.run_id, ClusterSnapshot.status,
+            ClusterSnapshot.captured_name, ClusterSnapshot.node_count, ClusterSnapshot.vcpu_count
+        ))
         
     results = session.exec(statement).all()
-    
-    # Check for groupings
-    groups = []
-    # Helper to find or create group
-    def get_or_create_group(ts):
-        ts_str = ts.strftime("%Y-%m-%d %H:%M:%S")
-        for g in groups:
-            if g['timestamp_str'] == ts_str:
-                return g
-        
-        # New Group
-        new_g = {
-            "group_id": ts_str, # Use TS as ID
-            "timestamp": ts,
-            "timestamp_str": ts_str,
-            "total_clusters": 0,
-            "status": "Success", # Will degrade if any child is partial/failed
-            "total_nodes": 0,
-            "total_vcpu": 0,
-            "collected_components": ["Cluster"], # Cluster always collected
-            "snapshots": []
-        }
-        
-        if ts_str in compliance_ts_set:
-            new_g["collected_components"].append("Compliance")
-            
-        groups.append(new_g)
-        return new_g
 
     for snap, c_name in results:
-        g = get_or_create_group(snap.timestamp)
-        g['total_clusters'] += 1
-        g['total_nodes'] += (snap.node_count or 0)
-        g['total_vcpu'] += (snap.vcpu_count or 0)
-        
-        if snap.status != 'Success':
-            g['status'] = 'Partial/Failed'
+        g = group_map.get(snap.run_id)
+        if not g:
+            continue
 
         resolved_name = snap.captured_name or c_name or "Unknown Cluster"
 
@@ -352,28 +390,6 @@ def list_snapshots(limit: int = 50, offset: int = 0, session: Session = Depends(
             "node_count": snap.node_count,
             "vcpu_count": snap.vcpu_count
         })
-
-    # After aggregating, check for OLM data efficiently for each group
-    for g in groups:
-        if "Operator" not in g["collected_components"]:
-            try:
-                # Optimized check: Fetch ONE snapshot's data_json partially or fully for this group
-                # Using a separate query to allow the main query to remain light
-                sample_snap = session.exec(
-                    select(ClusterSnapshot.data_json)
-                    .where(ClusterSnapshot.timestamp == g['timestamp'])
-                    .where(ClusterSnapshot.data_json.is_not(None))
-                    .limit(1)
-                ).first()
-                
-                if sample_snap:
-                    # Quick check string properties without parsing full JSON if possible? 
-                    # JSON parsing is safer. Even 50MB for one file is better than 50MB * 100
-                    data_sample = json.loads(sample_snap)
-                    if data_sample.get('csvs') or data_sample.get('subscriptions'):
-                        g["collected_components"].append("Operator")
-            except:
-                pass
         
     return {
         "total_runs": total_runs,
@@ -382,56 +398,65 @@ def list_snapshots(limit: int = 50, offset: int = 0, session: Session = Depends(
     }
 
 class BulkDeleteRequest(BaseModel):
-    group_ids: List[str] # List of timestamp strings
+    group_ids: List[str] # List of run ids (legacy clients may still send run timestamp strings)
+
+def resolve_run_ids(session: Session, group_ids: List[str]) -> List[int]:
+    """Maps group ids from the UI to PollRun ids. Accepts numeric run ids or '%Y-%m-%d %H:%M:%S' run timestamps."""
+    from datetime import datetime, timedelta
+    from app.models import PollRun
+
+    run_ids = []
+    for gid in group_ids:
+        if gid.isdigit():
+            run_ids.append(int(gid))
+            continue
+        try:
+            ts = datetime.strptime(gid.replace("T", " "), "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+        # Range match on the started_at index (stored with sub-second precision)
+        matches = session.exec(
+            select(PollRun.id).where(PollRun.started_at >= ts, PollRun.started_at < ts + timedelta(seconds=1))
+        ).all()
+        run_ids.extend(matches)
+    return run_ids
 
 @router.post("/clusters/snapshots/bulk-delete")
 def bulk_delete_snapshots(request: BulkDeleteRequest, session: Session = Depends(get_session), user: User = Depends(admin_required)):
     """Deletes all snapshots belonging to multiple runs."""
-    from sqlalchemy import text, func
-    
+    from app.services.retention import delete_run_snapshots
+    from app.services.unmapped import rebuild_unmapped_index
+
+    run_ids = resolve_run_ids(session, request.group_ids)
+    session.close()
+
+    # One writer job per run, so polls interleave with a large selection
     deleted_count = 0
-    for ts_str in request.group_ids:
-        # 1. Delete associated data using exact string match for timestamp
-        # LicenseUsage and ComplianceScore use string timestamps saved with %Y-%m-%d %H:%M:%S
-        session.execute(text("DELETE FROM licenseusage WHERE timestamp = :ts"), {"ts": ts_str})
-        session.execute(text("DELETE FROM compliancescore WHERE timestamp = :ts"), {"ts": ts_str})
-        
-        # 2. Find and delete ClusterSnapshots
-        # We use strftime to match the string timestamp from UI (SQLite specific)
-        statement = select(ClusterSnapshot).where(func.strftime("%Y-%m-%d %H:%M:%S", ClusterSnapshot.timestamp) == ts_str)
-        snaps = session.exec(statement).all()
-        for s in snaps:
-            session.delete(s)
-            deleted_count += 1
-            
-    session.commit()
+    reindex_ids = set()
+    for run_id in run_ids:
+        result = write(lambda s, run_id=run_id: delete_run_snapshots(s, [run_id]))
+        deleted_count += result["snapshots"]
+        reindex_ids.update(result["reindex_cluster_ids"])
+
+    # Re-index clusters whose unmapped index pointed at a deleted snapshot from their now-latest one
+    if reindex_ids:
+        rebuild_unmapped_index(list(reindex_ids))
     return {"status": "success", "deleted_count": deleted_count}
 
 
 @router.post("/clusters/snapshots/cleanup")
 def cleanup_snapshots(request: CleanupRequest, session: Session = Depends(get_session), user: User = Depends(admin_required)):
-    """Deletes snapshots older than X days."""
+    """Deletes snapshots older than X days in throttled batches and reports what was reclaimed."""
     from datetime import datetime, timedelta
+    from app.services.retention import get_cleanup_settings, purge_snapshots_before
+
     cutoff = datetime.utcnow() - timedelta(days=request.days)
-    cutoff_str = cutoff.strftime("%Y-%m-%d %H:%M:%S")
-    
-    from sqlalchemy import text
-    # Delete related records based on timestamp
-    # Note: Compliance/License tables use string timestamps
-    session.execute(text("DELETE FROM licenseusage WHERE timestamp < :cutoff"), {"cutoff": cutoff_str})
-    session.execute(text("DELETE FROM compliancescore WHERE timestamp < :cutoff"), {"cutoff": cutoff_str})
-    
-    # Delete Snapshots
-    statement = select(ClusterSnapshot).where(ClusterSnapshot.timestamp < cutoff)
-    results = session.exec(statement).all()
-    
-    count = 0
-    for snap in results:
-        session.delete(snap)
-        count += 1
-    
-    session.commit()
-    return {"status": "success", "deleted_count": count}
+    settings = get_cleanup_settings(session)
+    # Release our read transaction so the batches don't wait on it
+    session.close()
+
+    report = purge_snapshots_before(cutoff, batch_size=settings["batch_size"], pause_ms=settings["pause_ms"])
+    return {"status": "success", "deleted_count": report["snapshots"], "report": report}
 
 @router.delete("/clusters/snapshots/{snapshot_id}")
 def delete_snapshot(snapshot_id: int, session: Session = Depends(get_session), user: User = Depends(admin_required)):
@@ -439,8 +464,27 @@ def delete_snapshot(snapshot_id: int, session: Session = Depends(get_session), u
     if not snap:
         raise HTTPException(status_code=404, detail="Snapshot not found")
     
-    session.delete(snap)
-    session.commit()
+    from app.services.retention import delete_run_snapshots
+    from app.services.unmapped import rebuild_unmapped_index
+
+    cluster_id, run_id = snap.cluster_id, snap.run_id
+    session.close()
+
+    def job(s: Session) -> list:
+        if run_id is not None:
+            # Same path as the bulk delete, limited to this cluster's share of the run
+            return delete_run_snapshots(s, [run_id], cluster_id=cluster_id)["reindex_cluster_ids"]
+        # Legacy snapshot without a run: nothing else is keyed by it
+        from sqlalchemy import text
+        from app.models import UnmappedResource
+        reindex_ids = s.exec(select(UnmappedResource.cluster_id).where(UnmappedResource.snapshot_id == snapshot_id).distinct()).all()
+        s.execute(text("DELETE FROM operator_install WHERE snapshot_id = :snapshot_id"), {"snapshot_id": snapshot_id})
+        s.execute(text("DELETE FROM clustersnapshot WHERE id = :snapshot_id"), {"snapshot_id": snapshot_id})
+        return list(reindex_ids)
+
+    reindex_ids = write(job)
+    if reindex_ids:
+        rebuild_unmapped_index(reindex_ids)
     return {"ok": True}
 
 @router.get("/clusters/{cluster_id}", response_model=ClusterRead)
@@ -541,6 +585,14 @@ def get_db_stats(session: Session = Depends(get_session), user: User = Depends(o
     other_size_bytes = max(0, size_bytes - total_json_bytes)
     
     avg_snap_size_mb = round((snapshot_size_bytes / (1024 * 1024)) / snapshot_count, 2) if snapshot_count > 0 else 0
+
+    # Page-level space accounting (free pages are reclaimable by incremental vacuum)
+    from app.services.maintenance import get_space_stats, get_last_reclaim
+    from app.services.writer import writer
+    from app.services.cache import response_cache
+    from app.services.snapshots import parsed_snapshots
+    space = get_space_stats()
+    last_reclaim = get_last_reclaim()
     
     return {
         "file_size_mb": round(size_bytes / (1024 * 1024), 2),
@@ -556,17 +608,57 @@ def get_db_stats(session: Session = Depends(get_session), user: User = Depends(o
         "compliance_data_mb": round(compliance_size_bytes / (1024 * 1024), 2),
         "other_data_mb": round(other_size_bytes / (1024 * 1024), 2),
         "avg_snapshot_size_mb": avg_snap_size_mb,
+        "auto_vacuum": space["auto_vacuum"],
+        "needs_vacuum_conversion": space["auto_vacuum"] != "INCREMENTAL", # One full VACUUM required to enable online reclaim
+        "page_size": space["page_size"],
+        "page_count": space["page_count"],
+        "freelist_pages": space["freelist_pages"],
+        "reclaimable_mb": round(space["freelist_bytes"] / (1024 * 1024), 2),
+        "wal_size_mb": round(space["wal_bytes"] / (1024 * 1024), 2),
+        "last_reclaim": last_reclaim,
+        "last_reclaimed_mb": round(last_reclaim.get("reclaimed_bytes", 0) / (1024 * 1024), 2),
+        "writer": writer.stats(), # Single-writer queue depth and commit latency (this worker)
+        "response_cache": response_cache.stats(), # Snapshot-backed endpoint cache (this worker)
+        "parsed_snapshot_cache": parsed_snapshots.stats(), # Decoded payloads for drill-downs (this worker)
         "db_filename": db_file
     }
 
 @router.post("/clusters/config/db-vacuum", status_code=202)
-def vacuum_db(background_tasks: BackgroundTasks, session: Session = Depends(get_session), user: User = Depends(admin_required)):
-    """Runs SQLite VACUUM to reclaim space in the background."""
+def vacuum_db(background_tasks: BackgroundTasks, full: bool = False, session: Session = Depends(get_session), user: User = Depends(admin_required)):
+    """
+    Reclaims space in the background. Incremental (non-blocking) once the database is in
+    auto_vacuum=INCREMENTAL mode; a full VACUUM otherwise or when `full` is requested.
+    """
     from app.services.maintenance import run_vacuum_task
     
-    background_tasks.add_task(run_vacuum_task)
+    background_tasks.add_task(run_vacuum_task, full)
     return {"status": "accepted", "message": "Database optimization started in background."}
 
+@router.post("/clusters/config/mapid-rollup/rebuild", status_code=202)
+def rebuild_mapid_rollup_endpoint(background_tasks: BackgroundTasks, user: User = Depends(admin_required)):
+    """Recomputes the daily MAPID rollup from raw usage history in the background."""
+    from app.services.rollup import rebuild_mapid_rollup
+
+    background_tasks.add_task(rebuild_mapid_rollup)
+    return {"status": "accepted", "message": "MAPID rollup rebuild started in background."}
+
+@router.post("/clusters/config/mapid-backfill", status_code=202)
+def start_mapid_backfill(background_tasks: BackgroundTasks, user: User = Depends(admin_required)):
+    """Starts (or resumes) the MAPID usage backfill for history polled before it was recorded."""
+    from app.services.mapid_backfill import backfill_mapid_usage, get_mapid_backfill_progress, is_mapid_backfill_running
+
+    # The lease, not the last progress report, tells whether a worker is still at it
+    if is_mapid_backfill_running():
+        return {"status": "running", "progress": get_mapid_backfill_progress()}
+    background_tasks.add_task(backfill_mapid_usage)
+    return {"status": "accepted", "message": "MAPID usage backfill started in background."}
+
+@router.get("/clusters/config/mapid-backfill")
+def get_mapid_backfill(user: User = Depends(operator_allowed)):
+    """Progress of the MAPID usage backfill (shared by all workers)."""
+    from app.services.mapid_backfill import get_mapid_backfill_progress
+    return get_mapid_backfill_progress() or {"status": "never_run"}
+
 @router.patch("/clusters/{cluster_id}", response_model=ClusterRead)
 def update_cluster(cluster_id: int, cluster: ClusterUpdate, session: Session = Depends(get_session), user: User = Depends(admin_required)):
     db_cluster = session.get(Cluster, cluster_id)
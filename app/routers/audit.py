@@ -8,6 +8,7 @@ from datetime import datetime
 from app.database import get_session
 from app.models import AuditRule, AuditBundle, Cluster, ComplianceScore
 from app.services.ocp import fetch_resources, get_val
+from app.services.cache import conditional_response
 
 router = APIRouter(
     prefix="/api/audit",
@@ -401,7 +402,7 @@ def get_latest_scores(session: Session = Depends(get_session)):
         score = session.exec(
             select(ComplianceScore)
             .where(ComplianceScore.cluster_id == c.id)
-            .order_by(ComplianceScore.timestamp.desc())
+            .order_by(ComplianceScore.ts_epoch.desc())
         ).first()
         if score:
             scores.append(score)
@@ -513,7 +514,7 @@ def get_audit_history(cluster_id: int, session: Session = Depends(get_session)):
     scores = session.exec(
         select(ComplianceScore)
         .where(ComplianceScore.cluster_id == cluster_id)
-        .order_by(ComplianceScore.timestamp.asc())
+        .order_by(ComplianceScore.ts_epoch.asc())
     ).all()
     
     return [
@@ -527,7 +528,13 @@ def get_audit_history(cluster_id: int, session: Session = Depends(get_session)):
         for s in scores
     ]
 
+def score_validator(kw):
+    """Scores are written once per audit run and never updated, so their details are immutable."""
+    score_id = kw["session"].exec(select(ComplianceScore.id).where(ComplianceScore.id == kw["score_id"])).first()
+    return ((score_id,), True) if score_id is not None else None
+
 @router.get("/scores/{score_id}")
+@conditional_response(score_validator)
 def get_score_details(score_id: int, session: Session = Depends(get_session)):
     """Returns the details (rule statuses) for a specific historical run."""
     score = session.get(ComplianceScore, score_id)
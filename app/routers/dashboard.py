@@ -1,16 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, case, cast
 from sqlmodel import Session, select, func
 from typing import Any, List, Dict, Optional
 
 from datetime import datetime, timedelta, timezone
+import concurrent.futures
 import json
-from app.database import get_session
+import os
+import threading
+import time
+from app.database import get_session, get_read_session
+from app.services.cache import cached_response, conditional_response, generation_validator, skip_response_cache
+from app.services.encoding import fast_json
+from app.services.shared_cache import shared_cache
+from app.services.singleflight import SingleFlight
+from app.services.live_usage import record_live_usage, is_live_usage_id, resolve_live_usage
+from app.services.snapshots import iter_snapshots_as_of, load_snapshot_facts, load_snapshot_payload, resolve_snapshot_ids, snapshot_validator
+from app.services.resource_query import MAX_RESOURCE_PAGE, parse_label_selector, query_resources
 from app.models import Cluster, LicenseUsage, AppConfig, LicenseRule, ClusterSnapshot, User
-from app.services.ocp import fetch_resources, get_cluster_stats, parse_cpu, get_detailed_stats, parse_memory_to_gb, get_dynamic_client, get_argocd_application_details, get_argocd_applicationset_details
+from app.services.ocp import fetch_resources, get_cluster_stats, stats_from_health_facts, parse_cpu, get_detailed_stats, parse_memory_to_gb, get_dynamic_client, get_argocd_application_details, get_argocd_applicationset_details
 
 # Consolidated license calculation logic is now in poller, but for realtime we still might need it
 # Or we can reuse the logic
-from app.services.license import calculate_licenses
+from app.services.license import calculate_licenses, license_rules_fingerprint
 
 
 router = APIRouter(
@@ -27,19 +41,13 @@ RESOURCE_MAP = {
 
 }
 
-def get_snapshot_for_cluster(session: Session, cluster_id: int, target_time: datetime) -> Optional[ClusterSnapshot]:
-    """Finds the closest successful snapshot ON or BEFORE the target time (with 5m grace)."""
-    # Adding a grace period to target_time to account for multi-cluster polling delays
-    grace_target = target_time + timedelta(seconds=600)
-    statement = select(ClusterSnapshot).where(
-        ClusterSnapshot.cluster_id == cluster_id,
-        ClusterSnapshot.timestamp <= grace_target,
-        ClusterSnapshot.status == "Success"
-    ).order_by(ClusterSnapshot.timestamp.desc()).limit(1)
-    return session.exec(statement).first()
+def as_of_validator(kw):
+    """Conditional-request validator of per-cluster time-travel reads (live reads are not conditional)."""
+    return snapshot_validator(kw["session"], kw.get("snapshot_time"), [kw["cluster_id"]])
 
 @router.get("/snapshots")
-def get_available_snapshots(session: Session = Depends(get_session)):
+@cached_response("snapshots")
+def get_available_snapshots(session: Session = Depends(get_read_session)):
     """Returns a list of distinct timestamps where snapshots are available."""
     # This might be heavy if lots of snapshots. For now, let's just get distinct truncated timestamps or similar.
     # Actually, let's return all unique timestamps from the last 7 days?
@@ -58,39 +66,73 @@ def get_available_snapshots(session: Session = Depends(get_session)):
     return [t.strftime("%Y-%m-%dT%H:%M:%S") for t in grouped]
 
 @router.get("/{cluster_id}/resources/{resource_type}")
-def get_cluster_resources(cluster_id: int, resource_type: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_session)):
+@fast_json
+@conditional_response(as_of_validator)
+@cached_response("cluster_resources", when=lambda kw: kw.get("snapshot_time") is not None)
+def get_cluster_resources(
+    cluster_id: int,
+    resource_type: str,
+    snapshot_time: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="Case-insensitive substring of name, namespace or a label value"),
+    label: Optional[str] = Query(None, description="Label selector, e.g. 'env=prod,mapid,!legacy'"),
+    sort: Optional[str] = Query(None, description="Dotted field path, '-' prefix for descending"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_RESOURCE_PAGE),
+    fields: Optional[str] = Query(None, description="Comma-separated dotted paths to return"),
+    session: Session = Depends(get_read_session)
+):
+    """
+    Resource list of a cluster, live or as of `snapshot_time`. Filtering, sorting, paging and
+    field projection happen server-side; with `limit` the response is a page envelope
+    {items, total, offset, limit}, otherwise the (filtered) list itself.
+    """
     if resource_type not in RESOURCE_MAP:
         raise HTTPException(status_code=400, detail="Invalid resource type")
+    try:
+        label_terms = parse_label_selector(label) if label else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
 
+    def shape(items):
+        page, total = query_resources(
+            items, q=q, label_terms=label_terms, sort=sort, offset=offset, limit=limit,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        )
+        if limit is None:
+            return page
+        return {"items": page, "total": total, "offset": offset, "limit": limit}
+
     # Time Travel Logic
     if snapshot_time:
         try:
             # Handle both T and space separators
             clean_ts = snapshot_time.replace("T", " ")
             target_dt = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            snap = get_snapshot_for_cluster(session, cluster_id, target_dt)
-            if snap and snap.data_json:
-                data = json.loads(snap.data_json)
-                return data.get(resource_type, [])
-            return [] # Snapshot missing or empty
+            # Served from the parsed-payload LRU; each page/filter result is cached on its own
+            data = load_snapshot_payload(session, cluster_id, target_dt)
+            if data:
+                return shape(data.get(resource_type, []))
+            return shape([]) # Snapshot missing or empty
         except ValueError:
             pass # Fallback to live? Or empty? Better empty/error for specific historical query
-            return []
+            return shape([])
 
-    # Live Logic
+    # Live Logic: the label selector is pushed down to the API server
     meta = RESOURCE_MAP[resource_type]
     try:
-        return fetch_resources(cluster, meta["api_version"], meta["kind"], namespace=meta.get("namespace"))
+        return shape(fetch_resources(cluster, meta["api_version"], meta["kind"], namespace=meta.get("namespace"), label_selector=label))
     except Exception as e:
         print(f"Error checking resources {resource_type} for cluster {cluster_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{cluster_id}/details")
-def get_cluster_details(cluster_id: int, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_session)):
+@conditional_response(as_of_validator)
+@cached_response("cluster_details", when=lambda kw: kw.get("snapshot_time") is not None)
+def get_cluster_details(cluster_id: int, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_read_session)):
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
@@ -100,19 +142,8 @@ def get_cluster_details(cluster_id: int, snapshot_time: Optional[str] = Query(No
         try:
             clean_ts = snapshot_time.replace("T", " ")
             target_dt = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            snap = get_snapshot_for_cluster(session, cluster_id, target_dt)
-            if snap and snap.data_json:
-                snapshot_data = json.loads(snap.data_json)
-                if snap.service_mesh_json:
-                    try:
-                        snapshot_data['service_mesh'] = json.loads(snap.service_mesh_json)
-                    except Exception:
-                        pass
-                if snap.argocd_json:
-                    try:
-                        snapshot_data['argocd'] = json.loads(snap.argocd_json)
-                    except Exception:
-                        pass
+            # Includes service_mesh / argocd
+            snapshot_data = load_snapshot_payload(session, cluster_id, target_dt)
         except ValueError:
             pass # Ignore invalid time format, fallback to live? Or error? Let's fallback for robustness but maybe should error.
 
@@ -123,7 +154,9 @@ def get_cluster_details(cluster_id: int, snapshot_time: Optional[str] = Query(No
 
 
 @router.get("/{cluster_id}/nodes/{node_name}/details")
-def get_node_details_endpoint(cluster_id: int, node_name: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_session)):
+@conditional_response(as_of_validator)
+@cached_response("node_details", when=lambda kw: kw.get("snapshot_time") is not None)
+def get_node_details_endpoint(cluster_id: int, node_name: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_read_session)):
     from app.services.ocp import get_node_details
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -134,9 +167,7 @@ def get_node_details_endpoint(cluster_id: int, node_name: str, snapshot_time: Op
         try:
             clean_ts = snapshot_time.replace("T", " ")
             target_dt = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            snap = get_snapshot_for_cluster(session, cluster_id, target_dt)
-            if snap and snap.data_json:
-                snapshot_data = json.loads(snap.data_json)
+            snapshot_data = load_snapshot_payload(session, cluster_id, target_dt)
         except:
             pass
 
@@ -146,7 +177,9 @@ def get_node_details_endpoint(cluster_id: int, node_name: str, snapshot_time: Op
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{cluster_id}/machines/{machine_name}/details")
-def get_machine_details_endpoint(cluster_id: int, machine_name: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_session)):
+@conditional_response(as_of_validator)
+@cached_response("machine_details", when=lambda kw: kw.get("snapshot_time") is not None)
+def get_machine_details_endpoint(cluster_id: int, machine_name: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_read_session)):
     from app.services.ocp import get_machine_details
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -157,9 +190,7 @@ def get_machine_details_endpoint(cluster_id: int, machine_name: str, snapshot_ti
         try:
             clean_ts = snapshot_time.replace("T", " ")
             target_dt = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            snap = get_snapshot_for_cluster(session, cluster_id, target_dt)
-            if snap and snap.data_json:
-                snapshot_data = json.loads(snap.data_json)
+            snapshot_data = load_snapshot_payload(session, cluster_id, target_dt)
         except:
             pass
 
@@ -169,7 +200,7 @@ def get_machine_details_endpoint(cluster_id: int, machine_name: str, snapshot_ti
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{cluster_id}/license-details/{usage_id}")
-def get_license_details(cluster_id: int, usage_id: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_session)):
+def get_license_details(cluster_id: int, usage_id: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_read_session)):
     """Returns detailed license breakdown for a cluster, either from history or a snapshot."""
     # usage_id can be "null" if coming from a dashboard without usage history record (like custom snapshot views)
     
@@ -178,9 +209,8 @@ def get_license_details(cluster_id: int, usage_id: str, snapshot_time: Optional[
         try:
             clean_ts = snapshot_time.replace("T", " ")
             target_dt = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            snap = get_snapshot_for_cluster(session, cluster_id, target_dt)
-            if snap and snap.data_json:
-                data = json.loads(snap.data_json)
+            data = load_snapshot_payload(session, cluster_id, target_dt)
+            if data:
                 nodes = data.get("nodes", [])
                 from app.models import LicenseRule, AppConfig
                 rules = session.exec(select(LicenseRule).where(LicenseRule.is_active == True).order_by(LicenseRule.order, LicenseRule.id)).all()
@@ -195,8 +225,14 @@ def get_license_details(cluster_id: int, usage_id: str, snapshot_time: Optional[
         except Exception as e:
             print(f"Error fetching snapshot for license details: {e}")
 
-    # Priority 2: Historical Usage Record
-    if usage_id and usage_id != "null":
+    # Priority 2: Live refresh result (ephemeral, see services.live_usage)
+    if is_live_usage_id(usage_id):
+        usage = resolve_live_usage(cluster_id, usage_id)
+        if usage:
+            return {key: usage[key] for key in ("node_count", "total_vcpu", "license_count", "details")}
+
+    # Priority 3: Historical Usage Record (poller)
+    if usage_id and usage_id != "null" and not is_live_usage_id(usage_id):
         try:
             usage = session.get(LicenseUsage, int(usage_id))
             if usage:
@@ -209,7 +245,7 @@ def get_license_details(cluster_id: int, usage_id: str, snapshot_time: Optional[
         except:
             pass
 
-    # Priority 3: Fallback (Live) - If we get here, we just calculate live?
+    # Priority 4: Fallback (Live) - If we get here, we just calculate live?
     # But usually this endpoint is for audits. If we want live, we fetch live.
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -231,28 +267,178 @@ def get_license_details(cluster_id: int, usage_id: str, snapshot_time: Optional[
         raise HTTPException(status_code=500, detail=str(e))
 
 class DashboardCache:
+    """
+    Live summary shared by all worker processes through the shared cache, so a refresh done by
+    one worker serves every other one. Each process keeps its parsed copy until another writes.
+    """
+    KEY = "dashboard:summary"
+
     def __init__(self):
-        self.data = None
-        self.timestamp = None
-    
+        self._data = None
+        self._stamp = None
+
+    def _load(self):
+        stamp = shared_cache.updated_at(self.KEY)
+        if stamp is None:
+            self._data, self._stamp = None, None
+        elif stamp != self._stamp:
+            self._data, self._stamp = shared_cache.get_with_time(self.KEY)
+
+    @property
+    def data(self):
+        self._load()
+        return self._data
+
+    @property
+    def timestamp(self):
+        self._load()
+        return datetime.fromtimestamp(self._stamp, timezone.utc) if self._stamp else None
+
     def is_valid(self, ttl_minutes):
-        if not self.data or not self.timestamp:
+        self._load()
+        if not self._data or not self._stamp:
             return False
-        delta = datetime.now(timezone.utc) - self.timestamp
+        delta = datetime.now(timezone.utc) - datetime.fromtimestamp(self._stamp, timezone.utc)
         return delta < timedelta(minutes=ttl_minutes)
 
     def set(self, data):
-        self.data = data
-        self.timestamp = datetime.now(timezone.utc)
+        self._stamp = shared_cache.set(self.KEY, data)
+        self._data = data
 
 dashboard_cache = DashboardCache()
 
+# Live summary fan-out: one long-lived, bounded pool shared by every refresh (instead of a pool
+# per request), one refresh in flight per process, and a lease for one per host
+LIVE_FANOUT_WORKERS = int(os.getenv("LIVE_FANOUT_WORKERS", "10"))
+LIVE_REFRESH_TIMEOUT_SECONDS = 45
+LIVE_REFRESH_LEASE_KEY = "dashboard:refresh"
+LIVE_EVENTS_CHANNEL = "dashboard"
+# Partial results are written back to the shared summary at most this often during a refresh
+LIVE_MERGE_INTERVAL_SECONDS = 1.0
+live_executor = concurrent.futures.ThreadPoolExecutor(max_workers=LIVE_FANOUT_WORKERS, thread_name_prefix="live-summary")
+live_refresh = SingleFlight()
+
+def _summary_entry_from_payload(cluster, snap, rules, default_include):
+    """Legacy path for snapshots taken before health facts were extracted: parses the payload."""
+    snapshot_data = json.loads(snap.data_json)
+    stats = get_cluster_stats(cluster, snapshot_data=snapshot_data)
+
+    # Inject Service Mesh / ArgoCD status from snapshot
+    stats['has_service_mesh'] = False
+    stats['has_argocd'] = False
+    for key, blob in (('has_service_mesh', snap.service_mesh_json), ('has_argocd', snap.argocd_json)):
+        if blob:
+            try:
+                stats[key] = json.loads(blob).get('is_active', False)
+            except:
+                pass
+
+    lic_data = calculate_licenses(snapshot_data.get("nodes", []), rules, default_include=default_include)
+    return stats, lic_data["total_licenses"], lic_data["node_count"], lic_data["total_vcpu"]
+
+def summarize_from_snapshots(session: Session, clusters, target_dt: Optional[datetime], rules, default_include: bool, global_stats: dict) -> list:
+    """
+    Summary rows for the fast and time-travel modes. Metrics and health facts come from the
+    as-of snapshot's columns in one indexed statement. Payloads are parsed, one snapshot at a
+    time, only for snapshots polled before fact extraction existed and for snapshots whose
+    stored license counts were calculated with other license rules than the current ones.
+    """
+    facts = load_snapshot_facts(session, target_dt)
+    fingerprint = license_rules_fingerprint(rules, default_include)
+    needs_payload = [cid for cid, row in facts.items() if row.current_version is None or row.license_rules_hash != fingerprint]
+
+    # (stats or None, licenses, licensed_nodes, licensed_vcpu) per cluster, or the parse error
+    from_payload = {}
+    by_id = {cluster.id: cluster for cluster in clusters}
+    for cluster_id, snap in (iter_snapshots_as_of(session, target_dt, needs_payload) if needs_payload else ()):
+        if cluster_id not in by_id or not snap.data_json:
+            continue
+        try:
+            if facts[cluster_id].current_version is None:
+                from_payload[cluster_id] = _summary_entry_from_payload(by_id[cluster_id], snap, rules, default_include)
+            else:
+                lic_data = calculate_licenses(json.loads(snap.data_json).get("nodes", []), rules, default_include=default_include)
+                from_payload[cluster_id] = (None, lic_data["total_licenses"], lic_data["node_count"], lic_data["total_vcpu"])
+        except Exception as e:
+            from_payload[cluster_id] = e
+
+    results = []
+    for cluster in clusters:
+        try:
+            row = facts.get(cluster.id)
+            entry = from_payload.get(cluster.id)
+            if isinstance(entry, Exception):
+                raise entry
+            if row is not None and row.current_version is not None:
+                stats = stats_from_health_facts(cluster.id, row)
+                if entry is not None:
+                    # Counts recalculated with the current rules
+                    licenses, licensed_nodes, licensed_vcpu = entry[1:]
+                else:
+                    licenses, licensed_nodes, licensed_vcpu = row.license_count, row.licensed_node_count, row.licensed_vcpu_count
+            elif entry is not None:
+                stats, licenses, licensed_nodes, licensed_vcpu = entry
+            else:
+                # No snapshot available
+                results.append({
+                    "id": cluster.id,
+                    "name": cluster.name,
+                    "datacenter": cluster.datacenter,
+                    "environment": cluster.environment,
+                    "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
+                    "license_info": {"count": "-", "usage_id": None},
+                    "licensed_node_count": "-",
+                    "licensed_vcpu_count": "-",
+                    "status": "gray" # No data
+                })
+                continue
+
+            # Use frozen identity if available (for snapshots)
+            captured = row
+            results.append({
+                "id": cluster.id,
+                "name": captured.captured_name or cluster.name,
+                "unique_id": captured.captured_unique_id or cluster.unique_id, # Pass unique ID to frontend
+                "datacenter": cluster.datacenter,
+                "environment": cluster.environment,
+                "stats": stats,
+                "license_info": {
+                    "count": licenses,
+                    "usage_id": "null"
+                },
+                "licensed_node_count": licensed_nodes,
+                "licensed_vcpu_count": licensed_vcpu,
+                "status": "yellow" # Indicating stale/snapshot data
+            })
+
+            # Globals
+            global_stats["total_nodes"] += (stats["node_count"] if isinstance(stats["node_count"], int) else 0)
+            global_stats["total_licensed_nodes"] += licensed_nodes
+            global_stats["total_vcpu"] += (stats["vcpu_count"] if isinstance(stats["vcpu_count"], int) else 0)
+            global_stats["total_licensed_vcpu"] += licensed_vcpu
+            global_stats["total_licenses"] += licenses
+        except Exception as e:
+            import traceback
+            print(f"ERROR processing snapshot summary for cluster {cluster.name}:")
+            traceback.print_exc()
+            results.append({
+                "id": cluster.id,
+                "name": cluster.name,
+                "status": "red",
+                "error": str(e)
+            })
+    return results
+
 @router.get("/summary")
-def get_dashboard_summary(snapshot_time: Optional[str] = Query(None), mode: Optional[str] = Query(None), refresh: bool = Query(False), session: Session = Depends(get_session)):
+@fast_json
+@conditional_response(lambda kw: generation_validator(kw) if kw.get("snapshot_time") and not kw.get("refresh") else None)
+@cached_response("summary", when=lambda kw: kw.get("snapshot_time") is not None or kw.get("mode") == "fast")
+def get_dashboard_summary(snapshot_time: Optional[str] = Query(None), mode: Optional[str] = Query(None), refresh: bool = Query(False), session: Session = Depends(get_read_session)):
     ttl_minutes = int((session.get(AppConfig, "DASHBOARD_CACHE_TTL_MINUTES") or AppConfig(value="15")).value)
 
     # 1. Check Cache (Live Mode only)
-    if not snapshot_time and mode != "fast" and not refresh:
+    live = not snapshot_time and mode != "fast"
+    if live and not refresh:
         if dashboard_cache.is_valid(ttl_minutes):
             return dashboard_cache.data
 
@@ -285,88 +471,7 @@ def get_dashboard_summary(snapshot_time: Optional[str] = Query(None), mode: Opti
 
     # Fast Mode: Return latest snapshot data immediately
     if mode == "fast" and not target_dt:
-        for cluster in clusters:
-            try:
-                # Get latest snapshot
-                snap = session.exec(select(ClusterSnapshot).where(
-                    ClusterSnapshot.cluster_id == cluster.id,
-                    ClusterSnapshot.status == "Success"
-                ).order_by(ClusterSnapshot.timestamp.desc()).limit(1)).first()
-                
-                if snap and snap.data_json:
-                    snapshot_data = json.loads(snap.data_json)
-                    stats = get_cluster_stats(cluster, snapshot_data=snapshot_data)
-                    
-                    # Inject Service Mesh status from snapshot
-                    stats['has_service_mesh'] = False
-                    if snap.service_mesh_json:
-                        try:
-                            sm_data = json.loads(snap.service_mesh_json)
-                            stats['has_service_mesh'] = sm_data.get('is_active', False)
-                        except:
-                            pass
-                    
-                    # Inject ArgoCD status from snapshot
-                    stats['has_argocd'] = False
-                    if snap.argocd_json:
-                        try:
-                            cd_data = json.loads(snap.argocd_json)
-                            stats['has_argocd'] = cd_data.get('is_active', False)
-                        except:
-                            pass
-
-                    s_nodes = snapshot_data.get("nodes", [])
-                    lic_data = calculate_licenses(s_nodes, rules, default_include=default_include)
-                    
-                    # Use frozen identity if available (for snapshots)
-                    c_name = snap.captured_name or cluster.name
-                    c_uid = snap.captured_unique_id or cluster.unique_id
-                    
-                    results.append({
-                        "id": cluster.id,
-                        "name": c_name,
-                        "unique_id": c_uid,
-                        "datacenter": cluster.datacenter,
-                        "environment": cluster.environment,
-                        "stats": stats,
-                        "license_info": {
-                            "count": lic_data["total_licenses"],
-                            "usage_id": "null"
-                        },
-                        "licensed_node_count": lic_data["node_count"],
-                        "licensed_vcpu_count": lic_data["total_vcpu"],
-                        "status": "yellow" # Indicating stale/snapshot data
-                    })
-                    
-                    # Globals
-                    global_stats["total_nodes"] += (stats["node_count"] if isinstance(stats["node_count"], int) else 0)
-                    global_stats["total_licensed_nodes"] += lic_data["node_count"]
-                    global_stats["total_vcpu"] += (stats["vcpu_count"] if isinstance(stats["vcpu_count"], int) else 0)
-                    global_stats["total_licensed_vcpu"] += lic_data["total_vcpu"]
-                    global_stats["total_licenses"] += lic_data["total_licenses"]
-                else:
-                    # No snapshot available
-                    results.append({
-                        "id": cluster.id,
-                        "name": cluster.name,
-                        "datacenter": cluster.datacenter,
-                        "environment": cluster.environment,
-                        "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
-                        "license_info": {"count": "-", "usage_id": None},
-                        "licensed_node_count": "-",
-                        "licensed_vcpu_count": "-",
-                        "status": "gray" # No data
-                    })
-            except Exception as e:
-                import traceback
-                print(f"ERROR processing cluster {cluster.name} in fast mode:")
-                traceback.print_exc()
-                results.append({
-                    "id": cluster.id,
-                    "name": cluster.name,
-                    "status": "red",
-                    "error": str(e)
-                })
+        results = summarize_from_snapshots(session, clusters, None, rules, default_include, global_stats)
         
         # Sort results
         results.sort(key=lambda x: x["name"])
@@ -376,253 +481,275 @@ def get_dashboard_summary(snapshot_time: Optional[str] = Query(None), mode: Opti
             "timestamp": timestamp
         }
 
-    import concurrent.futures
+    if target_dt:
+        # Time Travel (Fast, DB only): every cluster resolved in one pass
+        results = summarize_from_snapshots(session, clusters, target_dt, rules, default_include, global_stats)
+        results.sort(key=lambda x: x["name"])
+        return {
+            "clusters": results,
+            "global_stats": global_stats,
+            "timestamp": snapshot_time,
+            "ttl_minutes": ttl_minutes
+        }
 
-    def process_cluster(cluster):
-        """Helper to process a single cluster, intended for thread pool."""
-        # Create a new session for this thread if needed, OR relies on passed-in objects being thread-safe enough for read.
-        # Since we are just reading the 'cluster' object data which is already in memory, it's fine.
-        # HOWEVER, 'rules' is also bound to the main session. 
-        # But we are just reading 'rules' attributes (ints/strings), not doing lazy loads, so usually okay.
-        # For 'calculate_licenses', it operates on standard dicts/objects.
-        
-        # NOTE: DB session is NOT thread safe. We must not use 'session' here for lazy loading.
-        # 'cluster' attributes should be accessed/loaded before passing if they were lazy, 
-        # but here they are eager enough or simple columns.
-        
-        if target_dt:
-             # This path is fast (DB only), so we can return early or handle it outside.
-             return None 
-        
-        # Live Logic (Slow Path)
-        try:
-             nodes = fetch_resources(cluster, "v1", "Node")
-             stats = get_cluster_stats(cluster, nodes=nodes)
+    # Live, explicit refresh: wait for the fan-out (one in flight at a time; concurrent callers share it)
+    if refresh:
+        return live_refresh.do("summary", lambda: _refresh_live_summary(clusters, rules, default_include, ttl_minutes))
+
+    # Live, expired: stale-while-revalidate. Answer now with the last good payload (or, cold, with
+    # the latest snapshots) tagged with its age, and refresh in the background; clients follow the
+    # refresh on /summary/stream.
+    start_background_refresh(clusters, rules, default_include, ttl_minutes)
+    stale = dashboard_cache.data
+    if stale:
+        age = (datetime.now(timezone.utc) - dashboard_cache.timestamp).total_seconds()
+    else:
+        stale = {
+            "clusters": sorted(summarize_from_snapshots(session, clusters, None, rules, default_include, global_stats), key=lambda x: x["name"]),
+            "global_stats": global_stats,
+            "timestamp": timestamp,
+            "ttl_minutes": ttl_minutes,
+            "source": "snapshot"
+        }
+        age = None
+    return {**stale, "stale": True, "age_seconds": round(age) if age is not None else None, "refreshing": True}
+
+def _fetch_live_cluster(cluster, cancelled: threading.Event):
+    """Fetches one cluster's nodes and operator health for the live summary (runs on live_executor)."""
+    # NOTE: DB session is NOT thread safe. Only already-loaded 'cluster' / 'rules' attributes are read here.
+    if cancelled.is_set():
+        return None
+    try:
+         nodes = fetch_resources(cluster, "v1", "Node", timeout=LIVE_REFRESH_TIMEOUT_SECONDS)
+         if cancelled.is_set():
+             return None
+         stats = get_cluster_stats(cluster, nodes=nodes)
+         
+         # Check Operators for Red Status
+         # We need to fetch ClusterOperators to determine health
+         # This is an extra call but needed for the Red status requirement
+         operator_status = "green"
+         try:
+             dyn_client = get_dynamic_client(cluster)
+             co_api = dyn_client.resources.get(api_version='config.openshift.io/v1', kind='ClusterOperator')
+             operators = co_api.get(_request_timeout=LIVE_REFRESH_TIMEOUT_SECONDS).items
              
-             # Check Operators for Red Status
-             # We need to fetch ClusterOperators to determine health
-             # This is an extra call but needed for the Red status requirement
-             operator_status = "green"
-             try:
-                 dyn_client = get_dynamic_client(cluster)
-                 co_api = dyn_client.resources.get(api_version='config.openshift.io/v1', kind='ClusterOperator')
-                 operators = co_api.get().items
-                 
-                 # Check for degraded or not available
-                 has_errors = False
-                 for o in operators:
-                     degraded = any(c.type == "Degraded" and c.status == "True" for c in o.status.conditions)
-                     available = any(c.type == "Available" and c.status == "True" for c in o.status.conditions)
-                     if degraded or not available:
-                         has_errors = True
-                         break
-                 
-                 if has_errors:
-                     operator_status = "red"
-             except Exception as oe:
-                 print(f"Error checking operators for {cluster.name}: {oe}")
-                 operator_status = "red" # Assume error if we can't check
-
-             return {"success": True, "cluster": cluster, "stats": stats, "nodes": nodes, "operator_status": operator_status}
-        except Exception as e:
-             print(f"Error fetching nodes for {cluster.name}: {e}")
-             return {"success": False, "cluster": cluster, "error": str(e)}
+             # Check for degraded or not available
+             has_errors = False
+             for o in operators:
+                 degraded = any(c.type == "Degraded" and c.status == "True" for c in o.status.conditions)
+                 available = any(c.type == "Available" and c.status == "True" for c in o.status.conditions)
+                 if degraded or not available:
+                     has_errors = True
+                     break
+             
+             if has_errors:
+                 operator_status = "red"
+         except Exception as oe:
+             print(f"Error checking operators for {cluster.name}: {oe}")
+             operator_status = "red" # Assume error if we can't check
 
-    # 1. Prepare tasks
-    futures = {}
-    
-    # We will process Snapshot logic strictly in main thread to avoid DB complexity,
-    # and only thread the Live logic.
-    
-    if target_dt:
-        # Serial execution for Time Travel (Fast, DB only)
-        for cluster in clusters:
-             snap = get_snapshot_for_cluster(session, cluster.id, target_dt)
-             if snap and snap.data_json:
-                 snapshot_data = json.loads(snap.data_json)
-                 stats = get_cluster_stats(cluster, snapshot_data=snapshot_data)
-
-                 # Inject Service Mesh status from snapshot
-                 stats['has_service_mesh'] = False
-                 if snap.service_mesh_json:
-                     try:
-                         sm_data = json.loads(snap.service_mesh_json)
-                         stats['has_service_mesh'] = sm_data.get('is_active', False)
-                     except:
-                         pass
-                 
-                 # Inject ArgoCD status from snapshot
-                 stats['has_argocd'] = False
-                 if snap.argocd_json:
-                     try:
-                         cd_data = json.loads(snap.argocd_json)
-                         stats['has_argocd'] = cd_data.get('is_active', False)
-                     except:
-                         pass
-
-                 s_nodes = snapshot_data.get("nodes", [])
-                 lic_data = calculate_licenses(s_nodes, rules, default_include=default_include)
-                 
-                 # Use frozen identity if available (for snapshots)
-                 c_name = snap.captured_name or cluster.name
-                 c_uid = snap.captured_unique_id or cluster.unique_id
-                 
-                 results.append({
-                    "id": cluster.id,
-                    "name": c_name,
-                    "unique_id": c_uid, # Pass unique ID to frontend
-                    "datacenter": cluster.datacenter,
-                    "environment": cluster.environment,
-                    "stats": stats,
-                    "license_info": {
-                        "count": lic_data["total_licenses"],
-                        "usage_id": "null"
-                    },
-                    "licensed_node_count": lic_data["node_count"],
-                    "licensed_vcpu_count": lic_data["total_vcpu"],
-                    "status": "yellow" # Snapshot view
-                 })
-                 
-                 # Globals
-                 global_stats["total_nodes"] += (stats["node_count"] if isinstance(stats["node_count"], int) else 0)
-                 global_stats["total_licensed_nodes"] += lic_data["node_count"]
-                 global_stats["total_vcpu"] += (stats["vcpu_count"] if isinstance(stats["vcpu_count"], int) else 0)
-                 global_stats["total_licensed_vcpu"] += lic_data["total_vcpu"]
-                 global_stats["total_licenses"] += lic_data["total_licenses"]
-             else:
-                 # Snapshot missing
-                 results.append({
-                    "id": cluster.id,
-                    "name": cluster.name,
-                    "datacenter": cluster.datacenter,
-                    "environment": cluster.environment,
-                    "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
-                    "license_info": {"count": "-", "usage_id": None},
-                    "licensed_node_count": "-",
-                    "licensed_vcpu_count": "-",
-                    "status": "gray"
-                 })
-    else:
-        # Parallel Execution for Live Mode
-        # Use a manual executor to allow early exit (shutdown wait=False)
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
-        try:
-            for cluster in clusters:
-                futures[executor.submit(process_cluster, cluster)] = cluster
-                
-            # Wait for results with timeout
-            # Increased from 10s to 45s to allow for slower/more clusters
-            done, not_done = concurrent.futures.wait(futures.keys(), timeout=45)
-            
-            for f in done:
-                res = f.result()
-                if not res: continue 
-                
-                cluster = res["cluster"]
-                if res["success"]:
-                    stats = res["stats"]
-                    nodes = res["nodes"]
-                    op_status = res.get("operator_status", "green")
-                    
-                    # Lic calc (safe to run in main thread)
-                    lic_data = calculate_licenses(nodes, rules, default_include=default_include)
-                    
-                    # Save History
-                    usage = LicenseUsage(
-                        cluster_id=cluster.id,
-                        timestamp=timestamp,
-                        node_count=lic_data["node_count"],
-                        total_vcpu=lic_data["total_vcpu"],
-                        license_count=lic_data["total_licenses"],
-                        details_json=json.dumps(lic_data["details"])
-                    )
-                    session.add(usage)
-                    
-                    results.append({
-                        "id": cluster.id,
-                        "name": cluster.name,
-                        "unique_id": cluster.unique_id,
-                        "datacenter": cluster.datacenter,
-                        "environment": cluster.environment,
-                        "stats": stats,
-                        "license_info": {
-                            "count": lic_data["total_licenses"],
-                            "usage_id": usage
-                        },
-                        "licensed_node_count": lic_data["node_count"],
-                        "licensed_vcpu_count": lic_data["total_vcpu"],
-                        "status": op_status
-                    })
-                    
-                    global_stats["total_nodes"] += (stats["node_count"] if isinstance(stats["node_count"], int) else 0)
-                    global_stats["total_licensed_nodes"] += lic_data["node_count"]
-                    global_stats["total_vcpu"] += (stats["vcpu_count"] if isinstance(stats["vcpu_count"], int) else 0)
-                    global_stats["total_licensed_vcpu"] += lic_data["total_vcpu"]
-                    global_stats["total_licenses"] += lic_data["total_licenses"]
-                
-                else:
-                    # Failed case
-                    results.append({
-                        "id": cluster.id,
-                        "name": cluster.name,
-                        "datacenter": cluster.datacenter,
-                        "environment": cluster.environment,
-                        "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
-                        "license_info": {"count": "-", "usage_id": None},
-                        "licensed_node_count": "-",
-                        "licensed_vcpu_count": "-",
-                        "status": "red" # Fetch error
-                    })
-            
-            # Handle timed out tasks
-            for f in not_done:
-                cluster = futures[f]
-                # print(f"Cluster {cluster.name} timed out") # Optional log
-                results.append({
-                    "id": cluster.id,
-                    "name": cluster.name,
-                    "datacenter": cluster.datacenter,
-                    "environment": cluster.environment,
-                    "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
-                    "license_info": {"count": "-", "usage_id": None},
-                    "licensed_node_count": "-",
-                    "licensed_vcpu_count": "-",
-                    "status": "yellow" # Timed out, maybe still polling or just slow
-                })
+         return {"success": True, "cluster": cluster, "stats": stats, "nodes": nodes, "operator_status": operator_status}
+    except Exception as e:
+         print(f"Error fetching nodes for {cluster.name}: {e}")
+         return {"success": False, "cluster": cluster, "error": str(e)}
 
-        finally:
-            # Important: Do not wait for hanging threads!
-            executor.shutdown(wait=False, cancel_futures=True)
+def start_background_refresh(clusters, rules, default_include: bool, ttl_minutes: int):
+    """Starts the live fan-out in the background unless one is already running (here or in another worker)."""
+    if live_refresh.in_flight("summary") or shared_cache.get(LIVE_REFRESH_LEASE_KEY) is not None:
+        return
 
-        # Commit all usages
+    def run():
         try:
-            session.commit()
-            # Refresh IDs
-            for r in results:
-                u = r["license_info"].get("usage_id")
-                if u and isinstance(u, LicenseUsage):
-                    r["license_info"]["usage_id"] = u.id
+            live_refresh.do("summary", lambda: _refresh_live_summary(clusters, rules, default_include, ttl_minutes))
         except Exception as e:
-            print(f"Error commiting usage stats: {e}")
+            print(f"Background dashboard refresh failed: {e}")
 
-    # Sort results by ID or Name to maintain order
-    results.sort(key=lambda x: x["name"])
+    threading.Thread(target=run, daemon=True, name="live-summary-refresh").start()
+
+@router.get("/summary/stream")
+async def stream_summary_refresh():
+    """
+    Server-sent events for the live refresh in progress: one "cluster" event per cluster entry as
+    it is merged into the cached summary, then "done". Ends immediately if nothing is refreshing.
+    Shared-cache reads are SQLite queries and run on the threadpool, never on the event loop.
+    """
+    import asyncio
+
+    async def event_generator():
+        seq = await run_in_threadpool(shared_cache.last_seq, LIVE_EVENTS_CHANNEL)
+        if not live_refresh.in_flight("summary") and await run_in_threadpool(shared_cache.get, LIVE_REFRESH_LEASE_KEY) is None:
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            return
+        deadline = time.monotonic() + LIVE_REFRESH_TIMEOUT_SECONDS + 30
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            for seq, event in await run_in_threadpool(shared_cache.events_since, LIVE_EVENTS_CHANNEL, seq):
+                yield f"data: {json.dumps(event)}\n\n"
+                last_sent = time.monotonic()
+                if event.get("type") == "done":
+                    return
+            if time.monotonic() - last_sent > 15:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(0.5)
+        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+def _refresh_live_summary(clusters, rules, default_include: bool, ttl_minutes: int) -> dict:
+    """
+    Live fan-out to every cluster on the shared bounded executor. Across worker processes a
+    lease keeps it to one refresh per host: a worker that finds another one refreshing waits
+    for that result in the shared dashboard cache instead of scanning the fleet again.
+    """
+    before = dashboard_cache.timestamp
+    if not shared_cache.add(LIVE_REFRESH_LEASE_KEY, {"pid": os.getpid()}, ttl=LIVE_REFRESH_TIMEOUT_SECONDS + 15):
+        deadline = time.monotonic() + LIVE_REFRESH_TIMEOUT_SECONDS + 15
+        while time.monotonic() < deadline and shared_cache.get(LIVE_REFRESH_LEASE_KEY) is not None:
+            time.sleep(0.5)
+        if dashboard_cache.timestamp != before and dashboard_cache.data:
+            return dashboard_cache.data
+        # The other refresh died without a result; do our own
 
-    response_data = {
-        "clusters": results,
-        "global_stats": global_stats,
-        "timestamp": timestamp if not target_dt else snapshot_time,
-        "ttl_minutes": ttl_minutes
+    try:
+        return _run_live_fanout(clusters, rules, default_include, ttl_minutes)
+    finally:
+        shared_cache.delete(LIVE_REFRESH_LEASE_KEY)
+
+def _live_global_stats(entries) -> dict:
+    global_stats = {
+        "total_nodes": 0,
+        "total_licensed_nodes": 0,
+        "total_vcpu": 0,
+        "total_licensed_vcpu": 0,
+        "total_licenses": 0
     }
+    for entry in entries:
+        stats = entry.get("stats") or {}
+        global_stats["total_nodes"] += (stats.get("node_count") if isinstance(stats.get("node_count"), int) else 0)
+        global_stats["total_vcpu"] += (stats.get("vcpu_count") if isinstance(stats.get("vcpu_count"), int) else 0)
+        for key, field in (("total_licensed_nodes", "licensed_node_count"), ("total_licensed_vcpu", "licensed_vcpu_count")):
+            global_stats[key] += entry[field] if isinstance(entry.get(field), int) else 0
+        count = (entry.get("license_info") or {}).get("count")
+        global_stats["total_licenses"] += count if isinstance(count, int) else 0
+    return global_stats
+
+def _run_live_fanout(clusters, rules, default_include: bool, ttl_minutes: int) -> dict:
+    """
+    Fans out to every cluster and refreshes the shared dashboard cache.
+    Entries are merged into the last good summary as clusters answer (and announced on the
+    live events channel), so a slow or timed-out cluster keeps its previous entry, marked stale,
+    instead of holding back or blanking the rest.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    previous = {c["id"]: c for c in (dashboard_cache.data or {}).get("clusters", []) if "id" in c}
+    merged = dict(previous)
+    cluster_ids = {cluster.id for cluster in clusters}
+
+    def snapshot_payload():
+        entries = sorted((e for cid, e in merged.items() if cid in cluster_ids), key=lambda x: x["name"])
+        return {
+            "clusters": entries,
+            "global_stats": _live_global_stats(entries),
+            "timestamp": timestamp,
+            "ttl_minutes": ttl_minutes
+        }
+
+    def merge(entry):
+        merged[entry["id"]] = entry
+        shared_cache.publish(LIVE_EVENTS_CHANNEL, {"type": "cluster", "cluster": entry})
+
+    def build_entry(res):
+        cluster = res["cluster"]
+        if not res["success"]:
+            # Failed case
+            return {
+                "id": cluster.id,
+                "name": cluster.name,
+                "datacenter": cluster.datacenter,
+                "environment": cluster.environment,
+                "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
+                "license_info": {"count": "-", "usage_id": None},
+                "licensed_node_count": "-",
+                "licensed_vcpu_count": "-",
+                "status": "red" # Fetch error
+            }
+
+        stats = res["stats"]
+        nodes = res["nodes"]
+        # Lic calc (safe to run in main thread)
+        lic_data = calculate_licenses(nodes, rules, default_include=default_include)
+        
+        # Breakdown kept for the license-details modal; history is the poller's job
+        usage_id = record_live_usage(cluster.id, lic_data)
+        
+        return {
+            "id": cluster.id,
+            "name": cluster.name,
+            "unique_id": cluster.unique_id,
+            "datacenter": cluster.datacenter,
+            "environment": cluster.environment,
+            "stats": stats,
+            "license_info": {
+                "count": lic_data["total_licenses"],
+                "usage_id": usage_id
+            },
+            "licensed_node_count": lic_data["node_count"],
+            "licensed_vcpu_count": lic_data["total_vcpu"],
+            "status": res.get("operator_status", "green")
+        }
 
-    # Save to Cache in Live Mode
-    if not snapshot_time:
-        dashboard_cache.set(response_data)
+    cancelled = threading.Event()
+    futures = {live_executor.submit(_fetch_live_cluster, cluster, cancelled): cluster for cluster in clusters}
+    answered = set()
+    last_write = time.monotonic()
+    try:
+        # Increased from 10s to 45s to allow for slower/more clusters
+        for f in concurrent.futures.as_completed(futures, timeout=LIVE_REFRESH_TIMEOUT_SECONDS):
+            answered.add(f)
+            res = f.result()
+            if not res:
+                continue
+            merge(build_entry(res))
+            if time.monotonic() - last_write >= LIVE_MERGE_INTERVAL_SECONDS:
+                dashboard_cache.set(snapshot_payload())
+                last_write = time.monotonic()
+    except concurrent.futures.TimeoutError:
+        pass
+    finally:
+        # Stop leftover work: queued fetches are cancelled, running ones skip their remaining
+        # calls and their HTTP requests are bounded by the same timeout
+        cancelled.set()
+        for f in futures:
+            f.cancel()
+
+    # Handle timed out tasks: keep the last good entry (marked stale) when there is one
+    for f, cluster in futures.items():
+        if f in answered:
+            continue
+        if cluster.id in previous:
+            merge({**previous[cluster.id], "stale": True})
+        else:
+            merge({
+                "id": cluster.id,
+                "name": cluster.name,
+                "datacenter": cluster.datacenter,
+                "environment": cluster.environment,
+                "stats": {"node_count": "-", "vcpu_count": "-", "version": "-", "console_url": "#"},
+                "license_info": {"count": "-", "usage_id": None},
+                "licensed_node_count": "-",
+                "licensed_vcpu_count": "-",
+                "status": "yellow" # Timed out, maybe still polling or just slow
+            })
 
+    response_data = snapshot_payload()
+    dashboard_cache.set(response_data)
+    shared_cache.publish(LIVE_EVENTS_CHANNEL, {"type": "done", "timestamp": timestamp})
     return response_data
 
 @router.get("/{cluster_id}/live_stats")
-def get_cluster_live_stats(cluster_id: int, session: Session = Depends(get_session)):
+def get_cluster_live_stats(cluster_id: int, session: Session = Depends(get_read_session)):
     """Fetches live stats for a single cluster, including operator status."""
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -662,20 +789,8 @@ def get_cluster_live_stats(cluster_id: int, session: Session = Depends(get_sessi
         default_include = (session.get(AppConfig, "LICENSE_DEFAULT_INCLUDE") or AppConfig(value="False")).value.lower() == "true"
         lic_data = calculate_licenses(nodes, rules, default_include=default_include)
         
-        # 4. Save History
-        # We should save history even for single updates? Yes, why not.
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        usage = LicenseUsage(
-             cluster_id=cluster.id,
-             timestamp=timestamp,
-             node_count=lic_data["node_count"],
-             total_vcpu=lic_data["total_vcpu"],
-             license_count=lic_data["total_licenses"],
-             details_json=json.dumps(lic_data["details"])
-        )
-        session.add(usage)
-        session.commit()
-        session.refresh(usage)
+        # 4. Keep the breakdown for the license-details modal (history is recorded by the poller)
+        usage_id = record_live_usage(cluster.id, lic_data)
         
         return {
             "id": cluster.id,
@@ -683,7 +798,7 @@ def get_cluster_live_stats(cluster_id: int, session: Session = Depends(get_sessi
             "stats": stats,
             "license_info": {
                 "count": lic_data["total_licenses"],
-                "usage_id": usage.id
+                "usage_id": usage_id
             },
             "licensed_node_count": lic_data["node_count"],
             "licensed_vcpu_count": lic_data["total_vcpu"],
@@ -695,7 +810,7 @@ def get_cluster_live_stats(cluster_id: int, session: Session = Depends(get_sessi
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{cluster_id}/argocd/application/{namespace}/{name}")
-def get_argocd_app_details(cluster_id: int, namespace: str, name: str, session: Session = Depends(get_session)):
+def get_argocd_app_details(cluster_id: int, namespace: str, name: str, session: Session = Depends(get_read_session)):
     """Fetches live details for a specific ArgoCD Application."""
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -707,7 +822,7 @@ def get_argocd_app_details(cluster_id: int, namespace: str, name: str, session:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{cluster_id}/argocd/applicationset/{namespace}/{name}")
-def get_argocd_appset_details(cluster_id: int, namespace: str, name: str, session: Session = Depends(get_session)):
+def get_argocd_appset_details(cluster_id: int, namespace: str, name: str, session: Session = Depends(get_read_session)):
     """Fetches live details for a specific ArgoCD ApplicationSet."""
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -719,21 +834,29 @@ def get_argocd_appset_details(cluster_id: int, namespace: str, name: str, sessio
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/simple-clusters")
-def get_simple_clusters(session: Session = Depends(get_session)):
+@cached_response("simple_clusters")
+def get_simple_clusters(session: Session = Depends(get_read_session)):
     """Returns a simple list of clusters for fast initial dashboard loading."""
     clusters = session.exec(select(Cluster)).all()
     results = []
     
-    # Pre-fetch latest snapshots for all clusters to determine SM status efficienty?
-    # Or just do a subquery? For now, N+1 query on snapshots limit 1 is okay for small N clusters.
+    # Latest snapshot facts per cluster in one pass; the two small status blobs are only
+    # loaded for snapshots that predate health fact extraction
+    facts = load_snapshot_facts(session)
+    legacy_ids = [row.id for row in facts.values() if row.current_version is None]
+    flags = {}
+    if legacy_ids:
+        flags = {row[0]: row for row in session.exec(select(
+            ClusterSnapshot.cluster_id, ClusterSnapshot.service_mesh_json, ClusterSnapshot.argocd_json
+        ).where(ClusterSnapshot.id.in_(legacy_ids))).all()}
+
     for c in clusters:
-        # Check if latest snapshot has service mesh
-        has_sm = False
-        snap = session.exec(select(ClusterSnapshot).where(
-            ClusterSnapshot.cluster_id == c.id,
-            ClusterSnapshot.status == "Success"
-        ).order_by(ClusterSnapshot.timestamp.desc()).limit(1)).first()
+        row = facts.get(c.id)
+        has_sm = bool(row and row.has_service_mesh)
+        has_cd = bool(row and row.has_argocd)
+        snap = flags.get(c.id)
         
+        # Check if latest snapshot has service mesh
         if snap and snap.service_mesh_json:
              try:
                  sm_data = json.loads(snap.service_mesh_json)
@@ -743,7 +866,6 @@ def get_simple_clusters(session: Session = Depends(get_session)):
                  pass
         
         # Check for ArgoCD
-        has_cd = False
         if snap and snap.argocd_json:
              try:
                  cd_data = json.loads(snap.argocd_json)
@@ -765,18 +887,80 @@ def get_simple_clusters(session: Session = Depends(get_session)):
     results.sort(key=lambda x: x["name"])
     return results
 
+def set_resolution_header(response: Response, resolutions):
+    """
+    Reports which snapshot resolutions (raw/hourly/daily, see retention tiers) a series was
+    built from, finest first, e.g. "raw,hourly". Each point also carries its own resolution.
+    """
+    from app.services.retention import RESOLUTIONS
+    present = set(resolutions)
+    response.headers["X-Data-Resolution"] = ",".join(r for r in RESOLUTIONS if r in present) or "raw"
+
+# Time buckets a trend series can be aggregated to (width in seconds), finest first.
+# Buckets are aligned to the epoch so every cluster's series shares the same timestamps.
+TREND_BUCKETS = {"raw": None, "hourly": 3600, "6h": 6 * 3600, "daily": 86400, "weekly": 7 * 86400}
+
+def choose_trend_bucket(session: Session, cluster_ids: list, cutoff: datetime, bucket: Optional[str], max_points: Optional[int]) -> str:
+    """
+    Resolves the `bucket` / `max_points` trend parameters to a TREND_BUCKETS name. With
+    `max_points`, picks the finest bucket that keeps every series at or under it: raw when
+    the longest series already fits, otherwise the first width whose bucket count does.
+    """
+    if bucket:
+        if bucket not in TREND_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Unknown bucket '{bucket}' (expected one of {', '.join(TREND_BUCKETS)})")
+        return bucket
+    if not max_points:
+        return "raw"
+
+    per_cluster = select(func.count().label("points")).where(
+        ClusterSnapshot.cluster_id.in_(cluster_ids),
+        ClusterSnapshot.timestamp >= cutoff,
+        ClusterSnapshot.status == "Success"
+    ).group_by(ClusterSnapshot.cluster_id).subquery()
+    longest = session.exec(select(func.max(per_cluster.c.points))).one() or 0
+    if longest <= max_points:
+        return "raw"
+
+    window = max(1, (datetime.utcnow() - cutoff).total_seconds())
+    for name, width in TREND_BUCKETS.items():
+        if width and window // width + 1 <= max_points:
+            return name
+    return list(TREND_BUCKETS)[-1]
+
+def _bucket_columns(width: int):
+    """(bucket start epoch, coarsest snapshot resolution rank) SQL expressions for a bucket width."""
+    bucket_expr = (cast(func.strftime("%s", ClusterSnapshot.timestamp), Integer) // width * width).label("bucket")
+    # Rank: 0 daily, 1 hourly, 2 raw; MIN() reports the coarsest snapshots a bucket was built from
+    rank_expr = func.min(case(
+        (ClusterSnapshot.resolution == "daily", 0), (ClusterSnapshot.resolution == "hourly", 1), else_=2
+    )).label("resolution_rank")
+    return bucket_expr, rank_expr
+
+_RESOLUTION_BY_RANK = ["daily", "hourly", "raw"]
+
 @router.get("/trends")
+@fast_json
+@cached_response("trends")
 def get_resource_trends(
+    response: Response,
     environment: Optional[str] = Query(None),
     datacenter: Optional[str] = Query(None),
     cluster_id: Optional[int] = Query(None),
     days: int = Query(30),
     start_date: Optional[str] = Query(None),
-    session: Session = Depends(get_session)
+    bucket: Optional[str] = Query(None),
+    max_points: Optional[int] = Query(None, ge=2),
+    session: Session = Depends(get_read_session)
 ):
     """
     Returns aggregated time-series data for global or cluster-specific analytics.
     Buckets data by unified poll timestamps from ClusterSnapshot.
+    Older points may come from downsampled snapshots; see X-Data-Resolution.
+
+    Long windows can be aggregated in SQL into time buckets (peak value per bucket, stamped
+    with the bucket start): either a fixed `bucket` or the finest one that keeps each series
+    within `max_points`. The bucket used is reported in X-Trend-Bucket.
     """
     # 1. Base Query for Clusters (apply filters if any)
     cluster_query = select(Cluster.id, Cluster.name)
@@ -805,14 +989,70 @@ def get_resource_trends(
     else:
         cutoff = datetime.utcnow() - timedelta(days=days)
     
-    if cluster_id:
+    chosen = choose_trend_bucket(session, filtered_cluster_ids, cutoff, bucket, max_points)
+    response.headers["X-Trend-Bucket"] = chosen
+    width = TREND_BUCKETS[chosen]
+    if width:
+        bucket_expr, rank_expr = _bucket_columns(width)
+
+    if cluster_id and width:
+        statement = select(
+            bucket_expr,
+            func.max(ClusterSnapshot.node_count).label("nodes"),
+            func.max(ClusterSnapshot.vcpu_count).label("vcpus"),
+            func.max(ClusterSnapshot.license_count).label("licenses"),
+            func.max(ClusterSnapshot.licensed_node_count).label("licensed_nodes"),
+            rank_expr
+        ).where(
+            ClusterSnapshot.cluster_id == cluster_id,
+            ClusterSnapshot.timestamp >= cutoff,
+            ClusterSnapshot.status == "Success"
+        ).group_by(bucket_expr).order_by(bucket_expr)
+
+        trends = [{
+            "timestamp": datetime.utcfromtimestamp(row.bucket).strftime("%Y-%m-%d %H:%M:%S"),
+            "nodes": row.nodes,
+            "vcpus": int(row.vcpus),
+            "licenses": row.licenses,
+            "licensed_nodes": row.licensed_nodes,
+            "resolution": _RESOLUTION_BY_RANK[row.resolution_rank]
+        } for row in session.exec(statement).all()]
+        set_resolution_header(response, [t["resolution"] for t in trends])
+        return trends
+
+    elif width:
+        statement = select(
+            ClusterSnapshot.cluster_id,
+            bucket_expr,
+            func.max(ClusterSnapshot.license_count).label("licenses"),
+            rank_expr
+        ).where(
+            ClusterSnapshot.cluster_id.in_(filtered_cluster_ids),
+            ClusterSnapshot.timestamp >= cutoff,
+            ClusterSnapshot.status == "Success"
+        ).group_by(ClusterSnapshot.cluster_id, bucket_expr).order_by(bucket_expr)
+
+        results = session.exec(statement).all()
+        trends = {}
+        for row in results:
+            name = cluster_map.get(row.cluster_id, f"Cluster {row.cluster_id}")
+            trends.setdefault(name, []).append({
+                "timestamp": datetime.utcfromtimestamp(row.bucket).strftime("%Y-%m-%d %H:%M:%S"),
+                "licenses": row.licenses,
+                "resolution": _RESOLUTION_BY_RANK[row.resolution_rank]
+            })
+        set_resolution_header(response, [_RESOLUTION_BY_RANK[row.resolution_rank] for row in results])
+        return trends
+
+    elif cluster_id:
         # Single cluster summary (used by cluster details modal)
         statement = select(
             ClusterSnapshot.timestamp,
             func.sum(ClusterSnapshot.node_count).label("nodes"),
             func.sum(ClusterSnapshot.vcpu_count).label("vcpus"),
             func.sum(ClusterSnapshot.license_count).label("licenses"),
-            func.sum(ClusterSnapshot.licensed_node_count).label("licensed_nodes")
+            func.sum(ClusterSnapshot.licensed_node_count).label("licensed_nodes"),
+            func.max(ClusterSnapshot.resolution).label("resolution")
         ).where(
             ClusterSnapshot.cluster_id == cluster_id,
             ClusterSnapshot.timestamp >= cutoff,
@@ -831,8 +1071,10 @@ def get_resource_trends(
                 "nodes": row.nodes,
                 "vcpus": int(row.vcpus),
                 "licenses": row.licenses,
-                "licensed_nodes": row.licensed_nodes
+                "licensed_nodes": row.licensed_nodes,
+                "resolution": row.resolution or "raw"
             })
+        set_resolution_header(response, [t["resolution"] for t in trends])
         return trends
 
     else:
@@ -840,7 +1082,8 @@ def get_resource_trends(
         statement = select(
             ClusterSnapshot.cluster_id,
             ClusterSnapshot.timestamp,
-            ClusterSnapshot.license_count
+            ClusterSnapshot.license_count,
+            ClusterSnapshot.resolution
         ).where(
             ClusterSnapshot.cluster_id.in_(filtered_cluster_ids),
             ClusterSnapshot.timestamp >= cutoff,
@@ -858,135 +1101,94 @@ def get_resource_trends(
                 trends[name] = []
             trends[name].append({
                 "timestamp": row.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                "licenses": row.license_count
+                "licenses": row.license_count,
+                "resolution": row.resolution or "raw"
             })
+        set_resolution_header(response, [row.resolution or "raw" for row in results])
         return trends
 
 @router.get("/mapid/global-trends")
-def get_mapid_global_trends(days: int = Query(30), session: Session = Depends(get_session)):
-    """Returns aggregated MAPID license usage trends across all clusters."""
+@fast_json
+@cached_response("mapid_global_trends")
+def get_mapid_global_trends(
+    response: Response,
+    days: int = Query(30),
+    metric: str = Query("max", pattern="^(max|avg)$"),
+    session: Session = Depends(get_read_session)
+):
+    """
+    Returns aggregated MAPID license usage trends across all clusters (daily buckets).
+    Each day sums, across clusters, the cluster's peak (`metric=max`) or average (`avg`)
+    licenses for the MAPID that day, read from the daily rollup rather than raw usage.
+    History polled before MAPID usage was recorded is filled in by a background job
+    (services.mapid_backfill); its progress is included while it runs.
+    """
     cutoff = datetime.utcnow() - timedelta(days=days)
-    from app.models import MapidLicenseUsage
-    
-    # We need to aggregate by timestamp and mapid
-    # Since different clusters poll at slightly different times, we might need to bucket by day or hour?
-    # For now, let's just return raw data and let UI handle it, OR bucket by Day.
-    # Bucketing by Day is safest for global trends.
-    
-    # SQLAlchemy doesn't have a simple "date_trunc" across all DBs easily without func usage that varies.
-    # We'll fetch all and aggregate in python for MVP simplicity (assuming volume isn't massive yet).
-    # Optimization: Filter fields
-    
-    # Aggregate by Day + MAPID
-    # Logic: For a given Day, a Cluster might have multiple snapshots. 
-    # We should take the MAX usage for that MAPID on that Cluster for that Day.
-    # Then SUM these Maxes across all Clusters to get Global Day Total.
-    
+    from app.models import MapidDailyRollup, epoch_seconds
+    from app.services.mapid_backfill import get_mapid_backfill_progress
+
+    if metric == "avg":
+        value = func.round(func.sum(MapidDailyRollup.sum_licenses * 1.0 / MapidDailyRollup.samples), 2)
+    else:
+        value = func.sum(MapidDailyRollup.max_licenses) # Served from the (day, mapid, cluster_id, max_licenses) index
     statement = select(
-        MapidLicenseUsage.cluster_id, # Added cluster_id
-        MapidLicenseUsage.timestamp,
-        MapidLicenseUsage.mapid,
-        MapidLicenseUsage.license_count
+        MapidDailyRollup.day,
+        MapidDailyRollup.mapid,
+        value.label("licenses")
     ).where(
-        MapidLicenseUsage.timestamp >= cutoff.isoformat()
-    )
+        MapidDailyRollup.day >= epoch_seconds(cutoff) // 86400
+    ).group_by(MapidDailyRollup.day, MapidDailyRollup.mapid)
     results = session.exec(statement).all()
-    
-    # BACKFILL: If no results found, try to populate from ClusterSnapshots
-    if not results:
-        # Check if we have snapshots in this period?
-        snap_stmt = select(ClusterSnapshot).where(
-            ClusterSnapshot.timestamp >= cutoff,
-            ClusterSnapshot.status == "Success"
-        )
-        snapshots = session.exec(snap_stmt).all()
-        
-        if snapshots:
-            # We have snapshots but no MapidLicenseUsage. Backfill.
-            from app.models import LicenseRule, AppConfig
-            from app.services.license import calculate_mapid_usage
-            
-            rules = session.exec(select(LicenseRule).where(LicenseRule.is_active == True).order_by(LicenseRule.order, LicenseRule.id)).all()
-            default_include = (session.get(AppConfig, "LICENSE_DEFAULT_INCLUDE") or AppConfig(value="False")).value.lower() == "true"
-            
-            for snap in snapshots:
-                if not snap.data_json: continue
-                try:
-                    data = json.loads(snap.data_json)
-                    nodes = data.get("nodes", [])
-                    mapid_data_list = calculate_mapid_usage(nodes, rules, default_include=default_include)
-                    
-                    for m_data in mapid_data_list:
-                        m_usage = MapidLicenseUsage(
-                            cluster_id=snap.cluster_id,
-                            timestamp=snap.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                            mapid=m_data["mapid"],
-                            lob=m_data["lob"],
-                            node_count=m_data["node_count"],
-                            total_vcpu=m_data["total_vcpu"],
-                            license_count=m_data["license_count"]
-                        )
-                        session.add(m_usage)
-                except Exception as e:
-                    print(f"Error backfilling snapshot {snap.id}: {e}")
-            
-            session.commit()
-            
-            # Re-query
-            results = session.exec(statement).all()
 
-    # Processing:
-    # 1. Bucket by Date -> Cluster -> MAPID -> Max(License)
-    processed = {} # Date -> { ClusterID -> { MAPID -> MaxLic } }
-    
+    # Chart Format: one dataset per MAPID over the union of days, zero-filled
+    days_seen = sorted({row.day for row in results})
+    index = {day: i for i, day in enumerate(days_seen)}
+    series = {}
     for row in results:
-        dt = row.timestamp.split(" ")[0]
-        cid = row.cluster_id
-        mid = row.mapid
-        
-        if dt not in processed: processed[dt] = {}
-        if cid not in processed[dt]: processed[dt][cid] = {}
-        
-        current_max = processed[dt][cid].get(mid, 0)
-        if row.license_count > current_max:
-            processed[dt][cid][mid] = row.license_count
-            
-    # 2. Sum across clusters: Date -> MAPID -> Sum(MaxLic)
-    final_agg = {} # Date -> { MAPID -> Total }
-    
-    for dt, clusters in processed.items():
-        if dt not in final_agg: final_agg[dt] = {}
-        for cid, mapids in clusters.items():
-            for mid, count in mapids.items():
-                if mid not in final_agg[dt]: final_agg[dt][mid] = 0
-                final_agg[dt][mid] += count
-                
-    # 3. Chart Format
-    dates = sorted(list(final_agg.keys()))
-    all_mapids = set()
-    for d in final_agg.values():
-        all_mapids.update(d.keys())
-        
-    datasets = []
-    for m in sorted(list(all_mapids)):
-        data = []
-        for d in dates:
-            data.append(final_agg[d].get(m, 0))
-        datasets.append({
-            "label": m,
-            "data": data
-        })
-        
-    return {
-        "labels": dates,
-        "datasets": datasets
+        series.setdefault(row.mapid, [0] * len(days_seen))[index[row.day]] = row.licenses
+
+    # Daily max per cluster, so daily-downsampled history yields the same series shape
+    response.headers["X-Data-Resolution"] = "daily"
+    result = {
+        "labels": [datetime.utcfromtimestamp(day * 86400).strftime("%Y-%m-%d") for day in days_seen],
+        "datasets": [{"label": m, "data": series[m]} for m in sorted(series)],
+        "resolution": "daily"
     }
+    backfill = get_mapid_backfill_progress()
+    if backfill and backfill["status"] == "running":
+        result["backfill"] = backfill
+    return result
+
+def latest_mapid_rollups(session: Session, cluster_ids: list, since_day: Optional[int] = None) -> list:
+    """
+    MAPID rollup rows of each cluster's latest poll: the rows whose last_ts_epoch is the
+    cluster's newest (a MAPID that vanished in that poll has an older one).
+    """
+    from app.models import MapidDailyRollup
+
+    if not cluster_ids:
+        return []
+    latest = select(
+        MapidDailyRollup.cluster_id,
+        func.max(MapidDailyRollup.last_ts_epoch).label("last_ts_epoch")
+    ).where(MapidDailyRollup.cluster_id.in_(cluster_ids))
+    if since_day is not None:
+        latest = latest.where(MapidDailyRollup.day >= since_day)
+    latest = latest.group_by(MapidDailyRollup.cluster_id).subquery()
+
+    rows = session.exec(select(MapidDailyRollup).join(
+        latest,
+        (MapidDailyRollup.cluster_id == latest.c.cluster_id) & (MapidDailyRollup.last_ts_epoch == latest.c.last_ts_epoch)
+    )).all()
+    return sorted(rows, key=lambda r: (r.cluster_id, r.mapid))
 
 @router.get("/mapid-breakdown")
+@fast_json
+@cached_response("mapid_breakdown")
 def get_mapid_breakdown(
     environment: Optional[str] = Query(None),
     datacenter: Optional[str] = Query(None),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
     Returns the latest MAPID usage aggregated by MAPID.
@@ -1019,43 +1221,16 @@ def get_mapid_breakdown(
     if not target_ids:
         return []
 
-    from app.models import MapidLicenseUsage
+    from app.models import epoch_seconds
 
-    # 2. Fetch Latest Usage for EACH Cluster
-    # Since we can't easily doing a "Greatest-N-per-Group" in basic SQLModel/SQLAlchemy without complex subqueries,
-    # and the number of clusters is manageable (dozens to hundreds, not millions),
-    # we can fetch recent records and filter in Python or iterate.
-    # Efficient approach: Fetch all MapidLicenseUsage records for these clusters from the last 7 days (or 24h),
-    # then for each cluster, pick the latest timestamp, and use only those records.
-    
-    cutoff = datetime.utcnow() - timedelta(days=7) # generous window to catch stale clusters too
-    
-    # We need to grab data. 
-    # Let's fetch all records for target clusters > cutoff
-    stmt = select(MapidLicenseUsage).where(
-        MapidLicenseUsage.cluster_id.in_(target_ids),
-        MapidLicenseUsage.timestamp >= cutoff.isoformat()
-    )
-    records = session.exec(stmt).all()
-
-    # 3. Filter for Latest per Cluster
-    # Map: cluster_id -> max_timestamp
-    latest_ts_map = {}
-    for r in records:
-        if r.cluster_id not in latest_ts_map:
-            latest_ts_map[r.cluster_id] = r.timestamp
-        else:
-            if r.timestamp > latest_ts_map[r.cluster_id]:
-                latest_ts_map[r.cluster_id] = r.timestamp
+    # 2. Latest poll's usage per cluster, from the daily rollup (stale clusters drop out after 7 days)
+    cutoff = datetime.utcnow() - timedelta(days=7)
+    records = latest_mapid_rollups(session, target_ids, since_day=epoch_seconds(cutoff) // 86400)
 
-    # 4. Aggregate
+    # 3. Aggregate
     mapid_stats = {} # mapid -> { details... }
 
     for r in records:
-        # Must be the latest snapshot for that cluster
-        if r.timestamp != latest_ts_map[r.cluster_id]:
-            continue
-            
         mid = r.mapid
         if mid not in mapid_stats:
             mapid_stats[mid] = {
@@ -1069,18 +1244,18 @@ def get_mapid_breakdown(
         
         c = cluster_map[r.cluster_id]
         
-        mapid_stats[mid]["total_licenses"] += r.license_count
-        mapid_stats[mid]["total_nodes"] += r.node_count
-        mapid_stats[mid]["total_vcpu"] += r.total_vcpu
+        mapid_stats[mid]["total_licenses"] += r.last_licenses
+        mapid_stats[mid]["total_nodes"] += r.last_nodes
+        mapid_stats[mid]["total_vcpu"] += r.last_vcpu
         
         mapid_stats[mid]["clusters"].append({
             "name": c.name,
             "cluster_id": c.id,
             "environment": c.environment or "-",
             "datacenter": c.datacenter or "-",
-            "licenses": r.license_count,
-            "nodes": r.node_count,
-            "vcpu": r.total_vcpu
+            "licenses": r.last_licenses,
+            "nodes": r.last_nodes,
+            "vcpu": r.last_vcpu
         })
 
     # Convert to list
@@ -1094,151 +1269,70 @@ def get_mapid_breakdown(
 
 
 @router.get("/mapid/cluster-breakdown")
-def get_mapid_cluster_breakdown(session: Session = Depends(get_session)):
+@fast_json
+@cached_response("mapid_cluster_breakdown")
+def get_mapid_cluster_breakdown(session: Session = Depends(get_read_session)):
     """Returns the latest breakdown of MAPIDs per cluster."""
     clusters = session.exec(select(Cluster)).all()
+
+    # One query for every cluster's latest poll
+    by_cluster = {}
+    for r in latest_mapid_rollups(session, [c.id for c in clusters]):
+        by_cluster.setdefault(r.cluster_id, []).append(r)
+
     results = []
-    
-    from app.models import MapidLicenseUsage
-    
     for c in clusters:
-        # Get latest timestamp for this cluster
-        last_entry = session.exec(select(MapidLicenseUsage).where(MapidLicenseUsage.cluster_id == c.id).order_by(MapidLicenseUsage.timestamp.desc()).limit(1)).first()
-        
-        if not last_entry:
+        entries = by_cluster.get(c.id)
+        if not entries:
             continue
-            
-        latest_ts = last_entry.timestamp
-        
-        # Get all records for this TS
-        entries = session.exec(select(MapidLicenseUsage).where(
-            MapidLicenseUsage.cluster_id == c.id,
-            MapidLicenseUsage.timestamp == latest_ts
-        )).all()
-        
-        mapids = []
-        for e in entries:
-            mapids.append({
-                "mapid": e.mapid,
-                "lob": e.lob,
-                "node_count": e.node_count,
-                "license_count": e.license_count,
-                "vcpu": e.total_vcpu
-            })
-            
+
         results.append({
             "cluster_name": c.name,
             "cluster_id": c.id, 
             "environment": c.environment or "None",
             "datacenter": c.datacenter or "None",
-            "timestamp": latest_ts,
-            "mapids": mapids
+            "timestamp": datetime.utcfromtimestamp(entries[0].last_ts_epoch).strftime("%Y-%m-%d %H:%M:%S"),
+            "mapids": [{
+                "mapid": e.mapid,
+                "lob": e.lob,
+                "node_count": e.last_nodes,
+                "license_count": e.last_licenses,
+                "vcpu": e.last_vcpu
+            } for e in entries]
         })
         
     return results
 
 @router.get("/mapid/unmapped-nodes")
-def get_unmapped_nodes_details(session: Session = Depends(get_session)):
+@cached_response("unmapped_nodes")
+def get_unmapped_nodes_details(session: Session = Depends(get_read_session)):
     """
-    Returns a list of nodes that are licensed but have 'Unmapped' MAPID.
-    Optimization: Only checks clusters that have reported 'Unmapped' usage in MapidLicenseUsage.
+    Returns licensed nodes and non-excluded projects without a MAPID in each cluster's latest
+    successful poll (within the last 7 days). Read from the unmapped_resource index, which the
+    poller replaces per cluster and the namespace rule endpoints keep up to date.
     """
-    from app.models import MapidLicenseUsage, LicenseRule, AppConfig, NamespaceExclusionRule
-    from app.services.license import calculate_licenses
-    
-    results = []
-    cutoff = datetime.utcnow() - timedelta(days=7)
+    from app.models import UnmappedResource, epoch_seconds
 
-    # 1. Identify clusters that HAVE unmapped nodes recently
-    # We look for records with mapid="Unmapped" (case sensitive match to service logic)
-    # or empty string.
-    stmt = select(MapidLicenseUsage.cluster_id).where(
-        (MapidLicenseUsage.mapid == "Unmapped") | (MapidLicenseUsage.mapid == ""),
-        MapidLicenseUsage.timestamp >= cutoff.isoformat()
-    ).distinct()
-    
-    target_cluster_ids = session.exec(stmt).all()
-    
-    if not target_cluster_ids:
-        return []
-        
-    # 2. Fetch clusters
-    clusters = session.exec(select(Cluster).where(Cluster.id.in_(target_cluster_ids))).all()
-    
-    # 3. Load snapshot only for these clusters
-    rules = session.exec(select(LicenseRule).where(LicenseRule.is_active == True).order_by(LicenseRule.order, LicenseRule.id)).all()
-    ns_rules = session.exec(select(NamespaceExclusionRule).where(NamespaceExclusionRule.is_active == True)).all()
-    default_include = (session.get(AppConfig, "LICENSE_DEFAULT_INCLUDE") or AppConfig(value="False")).value.lower() == "true"
-    
-    import re
-
-    for c in clusters:
-        # Get latest snapshot
-        snap = session.exec(select(ClusterSnapshot).where(
-            ClusterSnapshot.cluster_id == c.id,
-            ClusterSnapshot.status == "Success"
-        ).order_by(ClusterSnapshot.timestamp.desc()).limit(1)).first()
-        
-        if snap and snap.data_json:
-            try:
-                data = json.loads(snap.data_json)
-                nodes = data.get("nodes", [])
-                projects = data.get("projects", [])
-                
-                # --- NODES CHECK ---
-                lic_res = calculate_licenses(nodes, rules, default_include)
-                
-                for detail in lic_res["details"]:
-                    if detail["status"] == "INCLUDED":
-                        # Check labels
-                        node_obj = next((n for n in nodes if n["metadata"]["name"] == detail["name"]), None)
-                        if node_obj:
-                            labels = node_obj["metadata"].get("labels", {})
-                            val = labels.get("mapid", "Unmapped")
-                            
-                            if val == "Unmapped" or val == "":
-                                results.append({
-                                    "cluster_name": c.name,
-                                    "node_name": f"[Node] {detail['name']}",
-                                    "reason": f"Licensed Node missing MAPID"
-                                })
-                
-                # --- PROJECTS CHECK ---
-                for p in projects:
-                    name = p["metadata"]["name"]
-                    labels = p["metadata"].get("labels", {})
-                    
-                    # 1. Check Exclusions
-                    is_excluded = False
-                    for rule in ns_rules:
-                        try:
-                            if re.search(rule.match_pattern, name):
-                                is_excluded = True
-                                break
-                        except:
-                            pass # Bad regex
-                    
-                    if is_excluded:
-                        continue
-                        
-                    # 2. Check MapID
-                    val = labels.get("mapid", "Unmapped")
-                    if val == "Unmapped" or val == "":
-                         results.append({
-                            "cluster_name": c.name,
-                            "node_name": f"[Project] {name}",
-                            "reason": "Project missing MAPID"
-                        })
-
-            except Exception as e:
-                print(f"Error checking unmapped nodes for {c.name}: {e}")
+    cutoff = epoch_seconds(datetime.utcnow() - timedelta(days=7))
+    rows = session.exec(
+        select(Cluster.name, UnmappedResource.kind, UnmappedResource.name)
+        .join(Cluster, Cluster.id == UnmappedResource.cluster_id)
+        .where(UnmappedResource.excluded == False, UnmappedResource.ts_epoch >= cutoff)
+    ).all()
 
-
-    return results
+    reasons = {"Node": "Licensed Node missing MAPID", "Project": "Project missing MAPID"}
+    # Per cluster: licensed nodes first, then projects
+    rows = sorted(rows, key=lambda r: (r[0], r[1] != "Node", r[2]))
+    return [{
+        "cluster_name": cluster_name,
+        "node_name": f"[{kind}] {name}",
+        "reason": reasons[kind]
+    } for cluster_name, kind, name in rows]
 
 
 @router.get("/{cluster_id}/mapid/{mapid}/resources")
-def get_mapid_resources(cluster_id: int, mapid: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_session)):
+@cached_response("mapid_resources")
+def get_mapid_resources(cluster_id: int, mapid: str, snapshot_time: Optional[str] = Query(None), session: Session = Depends(get_read_session)):
     """Returns nodes and projects (namespaces) for a specific Cluster + MAPID."""
     cluster = session.get(Cluster, cluster_id)
     if not cluster:
@@ -1250,9 +1344,7 @@ def get_mapid_resources(cluster_id: int, mapid: str, snapshot_time: Optional[str
         try:
             clean_ts = snapshot_time.replace("T", " ")
             target_dt = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            snap = get_snapshot_for_cluster(session, cluster_id, target_dt)
-            if snap and snap.data_json:
-                snapshot_data = json.loads(snap.data_json)
+            snapshot_data = load_snapshot_payload(session, cluster_id, target_dt)
         except:
              pass
 
@@ -1260,12 +1352,7 @@ def get_mapid_resources(cluster_id: int, mapid: str, snapshot_time: Optional[str
     # For drill down consistency, if no time is provided, we should probably look at latest snapshot 
     # since the analytics view is based on "latest" or specific time.
     if not snapshot_data and not snapshot_time:
-         snap = session.exec(select(ClusterSnapshot).where(
-            ClusterSnapshot.cluster_id == cluster_id,
-            ClusterSnapshot.status == "Success"
-        ).order_by(ClusterSnapshot.timestamp.desc()).limit(1)).first()
-         if snap and snap.data_json:
-             snapshot_data = json.loads(snap.data_json)
+         snapshot_data = load_snapshot_payload(session, cluster_id, None)
     
     nodes = []
     projects = []
@@ -1274,7 +1361,8 @@ def get_mapid_resources(cluster_id: int, mapid: str, snapshot_time: Optional[str
         nodes = snapshot_data.get("nodes", [])
         projects = snapshot_data.get("projects", [])
     else:
-        # Fallback to live fetch (might be slow but accurate)
+        # Fallback to live fetch (might be slow but accurate); not snapshot data, so not cached
+        skip_response_cache()
         try:
             nodes = fetch_resources(cluster, "v1", "Node")
             projects = fetch_resources(cluster, "project.openshift.io/v1", "Project")
@@ -1307,34 +1395,25 @@ def get_mapid_resources(cluster_id: int, mapid: str, snapshot_time: Optional[str
     }
 
 @router.get("/trends/diffs")
+@fast_json
+@cached_response("trend_diffs")
 def get_resource_trends_diffs(
+    response: Response,
     environment: Optional[str] = Query(None),
     datacenter: Optional[str] = Query(None),
     cluster_id: Optional[int] = Query(None),
     days: int = Query(30),
     start_date: Optional[str] = Query(None),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
-    Returns a list of specific changes (Added/Removed nodes) that caused license count shifts.
+    Returns the licensed-node changes (added/removed nodes, vCPU changes) behind license count
+    shifts, newest first. Changes are recorded by the poller (services.change_log), so this is
+    a range query over the change log; `diff` is each change's own license delta.
     """
-    # 1. Base Query
-    cluster_query = select(Cluster.id, Cluster.name)
-    if cluster_id:
-        cluster_query = cluster_query.where(Cluster.id == cluster_id)
-    if environment:
-        cluster_query = cluster_query.where(Cluster.environment == environment)
-    if datacenter:
-        cluster_query = cluster_query.where(Cluster.datacenter == datacenter)
-    
-    clusters = session.exec(cluster_query).all()
-    filtered_cluster_ids = [c.id for c in clusters]
-    cluster_map = {c.id: c.name for c in clusters}
+    from app.models import LicenseChangeEvent, epoch_seconds
 
-    if not filtered_cluster_ids:
-        return []
-
-    # 2. Cutoff
+    # 1. Cutoff
     if start_date:
         try:
              cutoff = datetime.strptime(start_date, "%Y-%m-%d")
@@ -1343,137 +1422,43 @@ def get_resource_trends_diffs(
     else:
         cutoff = datetime.utcnow() - timedelta(days=days)
 
-
-    # Global Cache for Diff Results (Simple In-Memory)
-    # Key: f"{prev_id}-{curr_id}", Value: List[ChangeDict]
-    # Since snapshots are immutable, this is safe.
-    global DIFF_CACHE
-    if 'DIFF_CACHE' not in globals():
-        DIFF_CACHE = {}
-    
-    # 3. Fetch Snapshots
-    # We need strictly ordered snapshots per cluster
-    statement = select(
-        ClusterSnapshot.id,
-        ClusterSnapshot.cluster_id, 
-        ClusterSnapshot.timestamp, 
-        ClusterSnapshot.license_count,
-        ClusterSnapshot.data_json
+    # 2. Range query, cluster filters applied through the join
+    statement = select(LicenseChangeEvent, Cluster.name).join(
+        Cluster, Cluster.id == LicenseChangeEvent.cluster_id
     ).where(
-        ClusterSnapshot.cluster_id.in_(filtered_cluster_ids),
-        ClusterSnapshot.timestamp >= cutoff,
-        ClusterSnapshot.status == "Success"
-    ).order_by(
-        ClusterSnapshot.cluster_id,
-        ClusterSnapshot.timestamp.asc()
+        LicenseChangeEvent.ts_epoch >= epoch_seconds(cutoff)
     )
-    
-    rows = session.exec(statement).all()
-    
-    # Group by cluster
-    grouped = {}
-    for r in rows:
-        if r.cluster_id not in grouped: grouped[r.cluster_id] = []
-        grouped[r.cluster_id].append(r)
-
-    changes = []
-    
-    from app.services.license import calculate_licenses
-    from app.models import LicenseRule, AppConfig
+    if cluster_id:
+        statement = statement.where(LicenseChangeEvent.cluster_id == cluster_id)
+    if environment:
+        statement = statement.where(Cluster.environment == environment)
+    if datacenter:
+        statement = statement.where(Cluster.datacenter == datacenter)
+    statement = statement.order_by(LicenseChangeEvent.ts_epoch.desc(), LicenseChangeEvent.id)
 
-    # Optimization: Cache rules since they don't change per loop
-    rules = session.exec(select(LicenseRule).where(LicenseRule.is_active == True).order_by(LicenseRule.order, LicenseRule.id)).all()
-    default_include = (session.get(AppConfig, "LICENSE_DEFAULT_INCLUDE") or AppConfig(value="False")).value.lower() == "true"
+    def fmt_vcpu(value):
+        return f"{value:g}" if value is not None else "?"
 
-    # Helper to find vCPU
-    def get_vcpu(name, nodes_list):
-        n = next((x for x in nodes_list if x['metadata']['name'] == name), None)
-        if n:
-            try:
-                return n['status']['capacity'].get('cpu', '?')
-            except:
-                return '?'
-        return '?'
+    changes = []
+    for event, cluster_name in session.exec(statement).all():
+        if event.node_name is None:
+            detail = "License count changed but set of licensed nodes matches. Likely vCPU adjustment."
+            vcpu = "-"
+        elif event.change_type == "MODIFIED":
+            detail = f"Node {event.node_name} vCPU {fmt_vcpu(event.prev_vcpu)} -> {fmt_vcpu(event.vcpu)} (Licensed)"
+            vcpu = fmt_vcpu(event.vcpu)
+        else:
+            detail = f"Node {event.node_name} (Licensed)"
+            vcpu = fmt_vcpu(event.vcpu)
+        changes.append({
+            "timestamp": event.timestamp[:19],
+            "cluster": cluster_name,
+            "type": event.change_type,
+            "detail": detail,
+            "vcpu": vcpu,
+            "diff": event.license_diff,
+            "resolution": "raw" # Recorded per poll; downsampling thins snapshots, not the change log
+        })
 
-    for cid, snaps in grouped.items():
-        if len(snaps) < 2: continue
-        
-        c_name = cluster_map.get(cid, "Unknown")
-        
-        # Compare i with i-1
-        for i in range(1, len(snaps)):
-            curr = snaps[i]
-            prev = snaps[i-1]
-            
-            if curr.license_count != prev.license_count:
-                # CACHE CHECK
-                cache_key = f"{prev.id}-{curr.id}"
-                if cache_key in DIFF_CACHE:
-                    # Cache Hit
-                    changes.extend(DIFF_CACHE[cache_key])
-                    continue
-
-                # CACHE MISS - Calculate
-                local_changes = []
-                try:
-                    prev_data = json.loads(prev.data_json) if prev.data_json else {}
-                    curr_data = json.loads(curr.data_json) if curr.data_json else {}
-                    
-                    prev_nodes = prev_data.get("nodes", [])
-                    curr_nodes = curr_data.get("nodes", [])
-                    
-                    # Calculate licenses to know WHICH nodes are licensed
-                    prev_lic = calculate_licenses(prev_nodes, rules, default_include)
-                    curr_lic = calculate_licenses(curr_nodes, rules, default_include)
-                    
-                    prev_licensed_names = set(d['name'] for d in prev_lic['details'] if d['status'] == 'INCLUDED')
-                    curr_licensed_names = set(d['name'] for d in curr_lic['details'] if d['status'] == 'INCLUDED')
-                    
-                    added = curr_licensed_names - prev_licensed_names
-                    removed = prev_licensed_names - curr_licensed_names
-                    
-                    timestamp = curr.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-
-                    for node_name in added:
-                        vcpu = get_vcpu(node_name, curr_nodes)
-                        local_changes.append({
-                            "timestamp": timestamp,
-                            "cluster": c_name,
-                            "type": "ADDED",
-                            "detail": f"Node {node_name} (Licensed)",
-                            "vcpu": vcpu,
-                            "diff": curr.license_count - prev.license_count
-                        })
-                        
-                    for node_name in removed:
-                        vcpu = get_vcpu(node_name, prev_nodes)
-                        local_changes.append({
-                            "timestamp": timestamp,
-                            "cluster": c_name,
-                            "type": "REMOVED",
-                            "detail": f"Node {node_name} (Licensed)",
-                            "vcpu": vcpu,
-                            "diff": curr.license_count - prev.license_count
-                        })
-
-                    # If count changed but no nodes added/removed (maybe CPU count changed on existing node?)
-                    if not added and not removed:
-                         local_changes.append({
-                            "timestamp": timestamp,
-                            "cluster": c_name,
-                            "type": "MODIFIED",
-                            "detail": "License count changed but set of licensed nodes matches. Likely vCPU adjustment.",
-                            "vcpu": "-", # N/A or find changed?
-                            "diff": curr.license_count - prev.license_count
-                        })
-                    
-                    # STORE IN CACHE
-                    DIFF_CACHE[cache_key] = local_changes
-                    changes.extend(local_changes)
-
-                except Exception as e:
-                    print(f"Error diffing snapshots for {c_name}: {e}")
-                    
-    # Sort by timestamp desc
-    changes.sort(key=lambda x: x["timestamp"], reverse=True)
+    set_resolution_header(response, ["raw"])
     return changes
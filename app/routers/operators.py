@@ -4,8 +4,14 @@ from typing import List, Dict, Any, Optional
 import json
 from datetime import datetime
 
-from app.database import get_session
-from app.models import Cluster, ClusterSnapshot
+from app.database import get_read_session
+from app.models import Cluster, ClusterSnapshot, OperatorInstall
+from app.services.snapshots import resolve_snapshot_ids, snapshot_validator, parse_snapshot_time
+from app.services.cache import cached_response, conditional_response
+from app.services.encoding import fast_json
+from app.services.operator_inventory import (
+    install_as_dict, fleet_operator_installs, legacy_operator_installs, version_sort_key
+)
 
 router = APIRouter(
     prefix="/api/operators",
@@ -13,13 +19,14 @@ router = APIRouter(
 )
 
 @router.get("/matrix")
-def get_operator_matrix(snapshot_time: Optional[str] = None, session: Session = Depends(get_session)):
+@fast_json
+@conditional_response(lambda kw: snapshot_validator(kw["session"], kw.get("snapshot_time")))
+@cached_response("operator_matrix")
+def get_operator_matrix(snapshot_time: Optional[str] = None, session: Session = Depends(get_read_session)):
     """
     Returns a matrix of installed operators across all clusters.
     Data is sourced from the latest successful snapshot (or specific snapshot_time) for each cluster.
     """
-    from sqlalchemy import func, text
-    
     clusters = session.exec(select(Cluster)).all()
     
     matrix_data = {
@@ -40,39 +47,36 @@ def get_operator_matrix(snapshot_time: Optional[str] = None, session: Session =
             print(f"Failed to parse snapshot time: {snapshot_time}")
             pass
     
-    latest_ts = None
-    for cluster in clusters:
-        # Optimize: Fetch ONLY the needed fields using json_extract
-        # We need: timestamp, csvs, subscriptions, __errors
-        # Note: json_extract returns the JSON string for objects/arrays in SQLite
-        
+    # Best snapshot per cluster (latest, or as of snapshot_time with the shared grace window)
+    # resolved in one statement; the installs of those snapshots come from the operator_install
+    # inventory written at poll time, in one indexed query.
+    snapshot_ids = resolve_snapshot_ids(session, target_ts)
+    facts = {}
+    installs_by_snapshot = {}
+    legacy = {}
+    if snapshot_ids:
+        ids = list(snapshot_ids.values())
         query = select(
+            ClusterSnapshot.cluster_id,
+            ClusterSnapshot.id,
             ClusterSnapshot.timestamp,
-            func.json_extract(ClusterSnapshot.data_json, '$.csvs').label("csvs"),
-            func.json_extract(ClusterSnapshot.data_json, '$.subscriptions').label("subscriptions"),
-            func.json_extract(ClusterSnapshot.data_json, '$.__errors').label("errors")
-        ).where(ClusterSnapshot.cluster_id == cluster.id)
-        
-        if target_ts:
-            # Match logic from dashboard.py: 
-            # Allow up to 10 minutes (600s) delay (grace period) and pick the latest one in that window
-            from datetime import timedelta
-            grace_target = target_ts + timedelta(seconds=600)
-            query = query.where(ClusterSnapshot.timestamp <= grace_target)
-            query = query.where(ClusterSnapshot.status == "Success")
-            query = query.order_by(ClusterSnapshot.timestamp.desc())
-        else:
-            query = query.where(ClusterSnapshot.status == "Success").order_by(ClusterSnapshot.timestamp.desc())
-        
-        # Execute optimized query
-        # This avoids loading the full 50MB+ data_json into Python memory
-        result = session.exec(query.limit(1)).first()
-        
-        # Result is a tuple: (timestamp, csvs_json, subscriptions_json, errors_json) or None
-        
-        if result and (not latest_ts or result[0] > latest_ts):
-            latest_ts = result[0]
-            
+            ClusterSnapshot.olm_collected,
+            ClusterSnapshot.olm_auth_error
+        ).where(ClusterSnapshot.id.in_(ids))
+        facts = {row[0]: tuple(row[1:]) for row in session.exec(query).all()}
+        for row in session.exec(select(OperatorInstall).where(OperatorInstall.snapshot_id.in_(ids))).all():
+            installs_by_snapshot.setdefault(row.snapshot_id, []).append(install_as_dict(row))
+        # Snapshots that predate the inventory: OLM fragments of all of them in one query
+        legacy = legacy_operator_installs(session, [f[0] for f in facts.values() if f[2] is None])
+
+    latest_ts = None
+    for cluster in clusters:
+        result = facts.get(cluster.id)
+        # Result is a tuple: (snapshot_id, timestamp, olm_collected, olm_auth_error) or None
+
+        if result and (not latest_ts or result[1] > latest_ts):
+            latest_ts = result[1]
+
         cluster_info = {
             "id": cluster.id,
             "name": cluster.name,
@@ -81,106 +85,52 @@ def get_operator_matrix(snapshot_time: Optional[str] = None, session: Session =
             "has_data": False,
             "data_collected": False
         }
-        
+
         if result:
             cluster_info["has_data"] = True
             try:
-                # Parse the extracted JSON fragments
-                # SQLite json_extract returns the value. 
-                # If it didn't find the key, it returns None.
-                
-                raw_csvs = result[1]
-                raw_subs = result[2]
-                raw_errors = result[3]
-
-                csvs = json.loads(raw_csvs) if raw_csvs else []
-                subs = json.loads(raw_subs) if raw_subs else []
-                errors = json.loads(raw_errors) if raw_errors else {}
-                
-                # Check for Data Collection Status
-                # If both are None (not just empty lists, but null in DB extract), data might be missing structure
-                # But json_extract returns NULL if key missing.
-                # Logic: If key was missing in original JSON, result is None.
-                if raw_csvs is None and raw_subs is None:
-                    cluster_info["data_collected"] = False
+                if result[2] is None:
+                    # Snapshot predates the inventory: derive installs from the payload
+                    data_collected, auth_error, installs = legacy[result[0]]
                 else:
-                    cluster_info["data_collected"] = True
+                    data_collected, auth_error = result[2], bool(result[3])
+                    installs = installs_by_snapshot.get(result[0], [])
+                cluster_info["data_collected"] = data_collected
+                cluster_info["auth_error"] = auth_error
+
+                for install in installs:
+                    pkg_name = install["package"]
+                    display_name = install["display_name"]
 
-                # Check if we have specific errors for OLM resources
-                if errors.get("subscriptions") == "Forbidden" or errors.get("csvs") == "Forbidden":
-                    cluster_info["auth_error"] = True
-                else:
-                    cluster_info["auth_error"] = False
-
-                # Create a lookup for CSVs by name (metadata.name)
-                # csvs is a list of minified objects from poller
-                csv_map = {c["metadata"]["name"]: c for c in csvs if "metadata" in c and "name" in c["metadata"]}
-                
-                for sub in subs:
-                    # Subscription details
-                    # api_version: operators.coreos.com/v1alpha1
-                    # kind: Subscription
-                    meta = sub.get("metadata", {})
-                    spec = sub.get("spec", {})
-                    status = sub.get("status", {})
-                    
-                    pkg_name = spec.get("name") # e.g. "advanced-cluster-management"
-                    if not pkg_name: 
-                        continue
-                        
-                    channel = spec.get("channel", "unknown")
-                    installed_csv_name = status.get("installedCSV")
-                    
-                    # Find installed CSV details
-                    version = "Unknown"
-                    display_name = pkg_name
-                    provider = "Unknown"
-                    phase = "Unknown"
-                    
-                    managed_crds = []
-                    if installed_csv_name and installed_csv_name in csv_map:
-                        csv_obj = csv_map[installed_csv_name]
-                        version = csv_obj.get("spec", {}).get("version", "Unknown")
-                        display_name = csv_obj.get("spec", {}).get("displayName", pkg_name)
-                        provider = csv_obj.get("spec", {}).get("provider", {}).get("name", "Unknown") if isinstance(csv_obj.get("spec", {}).get("provider"), dict) else csv_obj.get("spec", {}).get("provider", "Unknown")
-                        phase = csv_obj.get("status", {}).get("phase", "Unknown")
-                        
-                        # Extract owned CRDs
-                        owned = csv_obj.get("spec", {}).get("customresourcedefinitions", {}).get("owned", [])
-                        managed_crds = [{"name": o.get("name"), "kind": o.get("kind"), "displayName": o.get("displayName")} for o in owned]
-                    else:
-                        # Fallback if we have currentCSV but no CSV object (maybe pending install)
-                        version = status.get("currentCSV", "Pending")
-                    
                     # Add to Matrix
                     if pkg_name not in matrix_data["operators"]:
                         matrix_data["operators"][pkg_name] = {
                             "name": pkg_name,
                             "displayName": display_name,
-                            "provider": provider,
+                            "provider": install["provider"],
                             "installations": {}
                         }
-                    
+
                     # We might have duplicates if multiple subscriptions for same package (namespaces?)
                     # For now, overwrite or simple combine? Overwrite is safest for fleet view.
                     matrix_data["operators"][pkg_name]["installations"][cluster.name] = {
-                        "version": version,
-                        "channel": channel,
-                        "status": phase,
-                        "subscription_name": meta.get("name"),
-                        "namespace": meta.get("namespace"),
-                        "approval": spec.get("installPlanApproval", "Automatic"),
-                        "source": spec.get("source"),
-                        "managed_crds": managed_crds
+                        "version": install["version"],
+                        "channel": install["channel"],
+                        "status": install["phase"],
+                        "subscription_name": install["subscription_name"],
+                        "namespace": install["namespace"],
+                        "approval": install["approval"],
+                        "source": install["source"],
+                        "managed_crds": install["managed_crds"]
                     }
-                    
+
                     # Update display name if it was just the package name before
                     if display_name != pkg_name and matrix_data["operators"][pkg_name]["displayName"] == pkg_name:
                          matrix_data["operators"][pkg_name]["displayName"] = display_name
 
             except Exception as e:
                 print(f"Error processing snapshot for operators matrix {cluster.name}: {e}")
-        
+
         matrix_data["clusters"].append(cluster_info)
 
     # Sort Clusters by Name
@@ -199,3 +149,38 @@ def get_operator_matrix(snapshot_time: Optional[str] = None, session: Session =
         "operators": op_list,
         "snapshot_time": (latest_ts.isoformat() + "Z") if latest_ts else None
     }
+
+@router.get("/installs")
+@fast_json
+@conditional_response(lambda kw: snapshot_validator(kw["session"], kw.get("snapshot_time")))
+def get_operator_installs(
+    package: str,
+    below: Optional[str] = None,
+    at_least: Optional[str] = None,
+    channel: Optional[str] = None,
+    snapshot_time: Optional[str] = None,
+    session: Session = Depends(get_read_session)
+):
+    """
+    Fleet-wide installs of one operator package, e.g. every cluster running
+    advanced-cluster-management below 2.10. Versions compare numerically.
+    """
+    if below is not None and version_sort_key(below) is None:
+        raise HTTPException(status_code=400, detail=f"Invalid version: {below}")
+    if at_least is not None and version_sort_key(at_least) is None:
+        raise HTTPException(status_code=400, detail=f"Invalid version: {at_least}")
+    target_ts = parse_snapshot_time(snapshot_time)
+    return fleet_operator_installs(session, package, below=below, at_least=at_least, channel=channel, target_time=target_ts)
+
+@router.get("/{package}/versions")
+@fast_json
+@conditional_response(lambda kw: snapshot_validator(kw["session"], kw.get("snapshot_time")))
+def get_operator_versions(package: str, snapshot_time: Optional[str] = None, session: Session = Depends(get_read_session)):
+    """Version distribution of one operator package across the fleet, oldest version first."""
+    target_ts = parse_snapshot_time(snapshot_time)
+    versions = {}
+    for install in fleet_operator_installs(session, package, target_time=target_ts):
+        entry = versions.setdefault(install["version"], {"version": install["version"], "count": 0, "clusters": []})
+        entry["count"] += 1
+        entry["clusters"].append(install["cluster_name"])
+    return list(versions.values())
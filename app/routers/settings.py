@@ -13,6 +13,7 @@ import json
 from app.models import Cluster, AppConfig, LicenseRule
 from app.services.ocp import fetch_resources
 from app.services.license import calculate_licenses
+from app.services.cache import generation
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 templates = Jinja2Templates(directory="app/templates")
@@ -345,6 +346,8 @@ def update_license_default_config(req: ConfigUpdate, session: Session = Depends(
         db_cfg.value = req.value
     session.add(db_cfg)
     session.commit()
+    # Settings writes don't start a data generation on their own, but license counts depend on this one
+    generation.bump()
     return {"ok": True}
 
 class LicensePreviewRequest(BaseModel):
@@ -387,6 +390,7 @@ def preview_license_config(req: LicensePreviewRequest, session: Session = Depend
 
 # --- Namespace Exclusion Rules ---
 from app.models import NamespaceExclusionRule
+from app.services.unmapped import refresh_namespace_exclusions
 
 @router.get("/namespaces", response_class=HTMLResponse)
 def namespace_settings_page(
@@ -427,6 +431,7 @@ def create_namespace_rule(rule: NamespaceRuleCreate, session: Session = Depends(
     session.add(db_rule)
     session.commit()
     session.refresh(db_rule)
+    refresh_namespace_exclusions()
     return {"ok": True, "rule": db_rule}
 
 @router.put("/api/namespaces/rules/{rule_id}")
@@ -441,6 +446,7 @@ def update_namespace_rule(rule_id: int, updated_rule: NamespaceRuleCreate, sessi
     session.add(db_rule)
     session.commit()
     session.refresh(db_rule)
+    refresh_namespace_exclusions()
     return {"ok": True, "rule": db_rule}
 
 @router.delete("/api/namespaces/rules/{rule_id}")
@@ -450,5 +456,6 @@ def delete_namespace_rule(rule_id: int, session: Session = Depends(get_session),
         return {"ok": False, "error": "Rule not found"}
     session.delete(rule)
     session.commit()
+    refresh_namespace_exclusions()
     return {"ok": True}
 
@@ -29,6 +29,12 @@ def admin_view(request: Request, tab: str = 'clusters', session: Session = Depen
     
     retention_config = session.get(AppConfig, "SNAPSHOT_RETENTION_DAYS")
     retention_days = int(retention_config.value) if retention_config else 30
+
+    retention_tiers_config = session.get(AppConfig, "SNAPSHOT_RETENTION_TIERS")
+    retention_tiers = retention_tiers_config.value if retention_tiers_config else ""
+
+    archive_after_config = session.get(AppConfig, "SNAPSHOT_ARCHIVE_AFTER_DAYS")
+    archive_after_days = int(archive_after_config.value) if archive_after_config else 0
     
     dashboard_ttl = session.get(AppConfig, "DASHBOARD_CACHE_TTL_MINUTES")
     dashboard_ttl_val = int(dashboard_ttl.value) if dashboard_ttl else 15
@@ -50,6 +56,8 @@ def admin_view(request: Request, tab: str = 'clusters', session: Session = Depen
         "active_tab": tab,
         "poll_interval": poll_interval,
         "retention_days": retention_days,
+        "retention_tiers": retention_tiers,
+        "archive_after_days": archive_after_days,
         "dashboard_cache_ttl": dashboard_ttl_val,
         "collect_olm": collect_olm,
         "run_compliance": run_compliance,
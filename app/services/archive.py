@@ -0,0 +1,240 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import text, bindparam
+from sqlmodel import Session
+from app.database import engine, DATABASE_URL
+from app.services.writer import write
+
+logger = logging.getLogger(__name__)
+
+# Archives live next to the database file unless overridden (e.g. a separate volume)
+_db_file = DATABASE_URL.replace("sqlite:///", "")
+ARCHIVE_DIR = os.getenv("SNAPSHOT_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(_db_file)), "archive"))
+CACHE_DIR = os.path.join(ARCHIVE_DIR, "cache")
+
+# Defaults (overridable through AppConfig)
+DEFAULT_ARCHIVE_AFTER_DAYS = 0 # 0 = archiving disabled
+DEFAULT_CACHE_MB = 512 # Budget for rehydrated snapshots on disk
+
+BLOB_COLUMNS = ["data_json", "service_mesh_json", "argocd_json"]
+
+# Serializes run extraction so concurrent time-travel requests decompress a run only once
+_extract_lock = threading.Lock()
+
+def get_archive_settings(session: Session) -> dict:
+    from app.models import AppConfig
+
+    after_days = int((session.get(AppConfig, "SNAPSHOT_ARCHIVE_AFTER_DAYS") or AppConfig(value=str(DEFAULT_ARCHIVE_AFTER_DAYS))).value)
+    cache_mb = int((session.get(AppConfig, "SNAPSHOT_ARCHIVE_CACHE_MB") or AppConfig(value=str(DEFAULT_CACHE_MB))).value)
+    return {"after_days": max(0, after_days), "cache_mb": max(1, cache_mb)}
+
+def _archive_run(run_id: int, cutoff_dt_str: str, report: dict):
+    """Writes one run's blobs to a gzip NDJSON file, then strips them from SQLite."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    with Session(engine) as session:
+        ids = session.execute(text("""
+            SELECT id FROM clustersnapshot
+            WHERE run_id = :run_id AND archive_id IS NULL AND timestamp < :cutoff
+            ORDER BY id
+        """), {"run_id": run_id, "cutoff": cutoff_dt_str}).scalars().all()
+    if not ids:
+        return
+
+    path = os.path.join(ARCHIVE_DIR, f"run_{run_id}_{int(time.time())}.ndjson.gz")
+    tmp_path = path + ".tmp"
+    raw_bytes = 0
+
+    try:
+        # One row at a time so a large run never sits in memory
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+                with Session(engine) as session:
+                    for snapshot_id in ids:
+                        row = session.execute(text("""
+                            SELECT id, cluster_id, timestamp, data_json, service_mesh_json, argocd_json
+                            FROM clustersnapshot WHERE id = :id
+                        """), {"id": snapshot_id}).mappings().first()
+                        line = (json.dumps(dict(row)) + "\n").encode("utf-8")
+                        raw_bytes += len(line)
+                        gz.write(line)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+
+        # Index row + blob removal commit together; the file is already durable at this point
+        compressed_bytes = os.path.getsize(path)
+
+        def index_archive(session: Session):
+            archive_id = session.execute(text("""
+                INSERT INTO snapshotarchive (run_id, path, created_at, snapshot_count, raw_bytes, compressed_bytes)
+                VALUES (:run_id, :path, :created_at, :count, :raw, :compressed)
+            """), {
+                "run_id": run_id,
+                "path": os.path.basename(path),
+                "created_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "count": len(ids),
+                "raw": raw_bytes,
+                "compressed": compressed_bytes
+            }).lastrowid
+            stmt = text("""
+                UPDATE clustersnapshot
+                SET data_json = NULL, service_mesh_json = NULL, argocd_json = NULL, archive_id = :archive_id
+                WHERE id IN :ids
+            """).bindparams(bindparam("ids", expanding=True))
+            session.execute(stmt, {"archive_id": archive_id, "ids": ids})
+
+        write(index_archive)
+    except Exception:
+        # Nothing references the file until the commit above succeeds: don't leave it behind
+        for leftover in (tmp_path, path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+    report["runs"] += 1
+    report["snapshots"] += len(ids)
+    report["raw_bytes"] += raw_bytes
+    report["compressed_bytes"] += compressed_bytes
+
+def archive_snapshots_before(cutoff: datetime, pause_ms: int = 250) -> dict:
+    """
+    Moves the blobs of snapshots older than `cutoff` into one compressed NDJSON file per
+    PollRun under ARCHIVE_DIR. The ClusterSnapshot row stays as the index entry (metrics,
+    status, run, resolution) with its blobs nulled and `archive_id` set, so trends and
+    listings keep working from SQLite. Each run is its own transaction.
+    """
+    start_time = time.time()
+    cutoff_dt_str = cutoff.strftime("%Y-%m-%d %H:%M:%S.%f")
+    report = {"runs": 0, "snapshots": 0, "raw_bytes": 0, "compressed_bytes": 0, "duration_seconds": 0.0}
+
+    with Session(engine) as session:
+        run_ids = session.execute(text("""
+            SELECT DISTINCT run_id FROM clustersnapshot
+            WHERE timestamp < :cutoff AND archive_id IS NULL AND run_id IS NOT NULL
+        """), {"cutoff": cutoff_dt_str}).scalars().all()
+
+    for run_id in sorted(run_ids):
+        try:
+            _archive_run(run_id, cutoff_dt_str, report)
+        except Exception as e:
+            logger.error(f"Failed to archive run {run_id}: {e}")
+        if pause_ms:
+            time.sleep(pause_ms / 1000.0)
+
+    report["duration_seconds"] = round(time.time() - start_time, 2)
+    return report
+
+def prune_orphan_archives() -> int:
+    """Removes archive files (and index rows) whose snapshots were all deleted by retention."""
+    def drop_orphans(session: Session) -> list:
+        orphans = session.execute(text("""
+            SELECT id, path FROM snapshotarchive
+            WHERE NOT EXISTS (SELECT 1 FROM clustersnapshot WHERE clustersnapshot.archive_id = snapshotarchive.id)
+        """)).all()
+        for archive_id, _ in orphans:
+            session.execute(text("DELETE FROM snapshotarchive WHERE id = :id"), {"id": archive_id})
+        return [path for _, path in orphans]
+
+    # Files go only once their index rows are committed away
+    paths = write(drop_orphans)
+    for path in paths:
+        try:
+            os.remove(os.path.join(ARCHIVE_DIR, path))
+        except FileNotFoundError:
+            pass
+    return len(paths)
+
+def _cache_path(snapshot_id: int) -> str:
+    return os.path.join(CACHE_DIR, f"{snapshot_id}.json")
+
+def _enforce_cache_budget(budget_bytes: int):
+    """Evicts least recently used rehydrated snapshots (by mtime, refreshed on hit)."""
+    try:
+        entries = []
+        total = 0
+        for entry in os.scandir(CACHE_DIR):
+            if entry.name.endswith(".json"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= budget_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= budget_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+    except FileNotFoundError:
+        pass
+
+def _extract_archive(path: str):
+    """Decompresses a run archive once and writes every member into the rehydration cache."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with gzip.open(os.path.join(ARCHIVE_DIR, path), "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            target = _cache_path(record["id"])
+            if os.path.exists(target):
+                continue
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as out:
+                json.dump({col: record.get(col) for col in BLOB_COLUMNS}, out)
+            os.replace(tmp, target)
+
+def load_archived_payload(session: Session, snapshot_id: int, archive_id: int) -> dict:
+    """
+    Returns {data_json, service_mesh_json, argocd_json} for an archived snapshot, served from
+    the on-disk cache and rehydrated from its run archive on a miss. None if unavailable.
+    """
+    target = _cache_path(snapshot_id)
+    try:
+        with open(target, encoding="utf-8") as f:
+            payload = json.load(f)
+        os.utime(target) # LRU touch
+        return payload
+    except FileNotFoundError:
+        pass
+
+    path = session.execute(text("SELECT path FROM snapshotarchive WHERE id = :id"), {"id": archive_id}).scalar()
+    if not path:
+        return None
+
+    settings = get_archive_settings(session)
+    with _extract_lock:
+        if not os.path.exists(target):
+            try:
+                _extract_archive(path)
+            except Exception as e:
+                logger.error(f"Failed to rehydrate archive {path}: {e}")
+                return None
+        try:
+            with open(target, encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        _enforce_cache_budget(settings["cache_mb"] * 1024 * 1024)
+    return payload
+
+def rehydrate_snapshot(session: Session, snap):
+    """
+    Fills the blobs of an archived ClusterSnapshot in place. The instance is expunged first
+    so the rehydrated blobs can never be flushed back into SQLite.
+    """
+    if snap is None or not snap.archive_id or snap.data_json is not None:
+        return snap
+    payload = load_archived_payload(session, snap.id, snap.archive_id)
+    if payload:
+        session.expunge(snap)
+        for col in BLOB_COLUMNS:
+            setattr(snap, col, payload.get(col))
+    return snap
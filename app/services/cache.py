@@ -0,0 +1,293 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlmodel import Session
+from app.services.shared_cache import shared_cache
+from app.services.encoding import dumps
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for cached responses (serialized JSON size)
+RESPONSE_CACHE_MB = int(os.getenv("RESPONSE_CACHE_MB", "64"))
+
+# How long a worker trusts its last read of the shared generation counter. Commits made by
+# this worker are seen at once; another worker's commits within this interval.
+GENERATION_REFRESH_SECONDS = float(os.getenv("GENERATION_REFRESH_SECONDS", "1"))
+
+# Statements that change data; any of them in a committed transaction starts a new generation
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+_WRITE_TARGET = re.compile(
+    r'^\s*(?:(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+
+# Tables cached responses are computed from: snapshots and everything derived from them, plus
+# the cluster list and license rules. Writes elsewhere (settings, users, audit definitions)
+# leave the generation alone; settings that do change results bump it explicitly.
+DATA_TABLES = frozenset({
+    "cluster", "pollrun", "clustersnapshot", "snapshotarchive", "operator_install",
+    "licenseusage", "mapidlicenseusage", "mapid_daily_rollup", "license_change_event",
+    "compliancescore", "unmapped_resource", "licenserule"
+})
+
+def _changes_data(statement: str) -> bool:
+    if not statement.lstrip()[:7].upper().startswith(_WRITE_VERBS):
+        return False
+    match = _WRITE_TARGET.match(statement)
+    return match is None or match.group(1).lower() in DATA_TABLES # Unparsed writes count, to be safe
+
+_MISS = object()
+
+class DataGeneration:
+    """
+    Monotonic counter of committed data changes, kept in the shared cache so every worker
+    process sees a commit made by any other. Engines are watched at the connection level,
+    so ORM writes, the writer thread and raw-SQL maintenance (retention, run deletion) all
+    count without each call site having to remember to invalidate. The counter is read at
+    most once per refresh interval, not on every cache lookup.
+    """
+
+    COUNTER = "data_generation"
+
+    def __init__(self, refresh_seconds: float = GENERATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._watched = set()
+        self._last = (0, float("-inf")) # (value, monotonic time it was read)
+
+    @property
+    def value(self) -> int:
+        value, read_at = self._last
+        now = time.monotonic()
+        if now - read_at >= self.refresh_seconds:
+            value = shared_cache.counter(self.COUNTER)
+            self._last = (value, now)
+        return value
+
+    def bump(self):
+        self._last = (shared_cache.incr(self.COUNTER), time.monotonic())
+
+    def watch(self, engine):
+        if id(engine) in self._watched:
+            return
+        with self._lock:
+            if id(engine) in self._watched:
+                return
+            self._watched.add(id(engine))
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if _changes_data(statement):
+                conn.info["data_changed"] = True
+
+        def after_commit(conn):
+            if conn.info.pop("data_changed", False):
+                self.bump()
+
+        def after_rollback(conn):
+            conn.info.pop("data_changed", None)
+
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(engine, "commit", after_commit)
+        event.listen(engine, "rollback", after_rollback)
+
+generation = DataGeneration()
+
+class ResponseCache:
+    """LRU of endpoint responses bounded by serialized size. Entries are valid for one data generation."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (generation, size, value, headers)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        current = generation.value
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != current:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return _MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, gen: int, value, headers: dict):
+        try:
+            size = len(dumps(value))
+        except (TypeError, ValueError):
+            return
+        if size > self.max_bytes or gen != generation.value:
+            return # Too large, or data changed while computing; don't pin a stale result
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (gen, size, value, headers)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "generation": generation.value
+        }
+
+response_cache = ResponseCache(RESPONSE_CACHE_MB * 1024 * 1024)
+
+def _key_part(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_key_part(v) for v in value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+_call_state = threading.local()
+
+def skip_response_cache():
+    """Keeps the running endpoint call's result out of the response cache (e.g. it fell back to a live read)."""
+    _call_state.skip = True
+
+def cached_response(name: str, when=None):
+    """
+    Caches a sync endpoint's return value per (endpoint, parameters, database) until the next
+    data generation. Headers the endpoint sets on its injected `response` are replayed on hits.
+    `when(kwargs)` limits caching to snapshot-backed calls (e.g. skip live cluster reads);
+    endpoints that only find out while running call skip_response_cache().
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if when is not None and not when(kwargs):
+                return fn(*args, **kwargs)
+
+            session = next((v for v in kwargs.values() if isinstance(v, Session)), None)
+            response = next((v for v in kwargs.values() if isinstance(v, Response)), None)
+            bind = session.get_bind() if session is not None else None
+            if bind is not None:
+                generation.watch(bind)
+
+            params = tuple(sorted(
+                (k, _key_part(v)) for k, v in kwargs.items() if not isinstance(v, (Session, Response))
+            ))
+            key = (name, id(bind), params)
+
+            entry = response_cache.get(key)
+            if entry is not _MISS:
+                if response is not None:
+                    response.headers.update(entry[3])
+                return entry[2]
+
+            gen = generation.value
+            _call_state.skip = False
+            value = fn(*args, **kwargs)
+            if isinstance(value, Response) or _call_state.skip:
+                return value # Streaming / custom responses and live reads are never cached
+            headers = {k: v for k, v in response.headers.items() if k.lower().startswith("x-")} if response is not None else {}
+            response_cache.put(key, gen, value, headers)
+            return value
+        return wrapper
+    return decorator
+
+# Writes normally go through the primary engine; read-pool engines are watched on first use
+from app.database import engine as _engine
+generation.watch(_engine)
+
+# Browser caching of conditional responses: settled historical data is never revalidated
+# within max-age; anything else is revalidated (cheaply, through If-None-Match) on every use
+IMMUTABLE_MAX_AGE_SECONDS = int(os.getenv("IMMUTABLE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+IMMUTABLE_CACHE_CONTROL = f"private, max-age={IMMUTABLE_MAX_AGE_SECONDS}, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    """Strong entity tag for a response fully determined by `parts`."""
+    return '"' + hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest() + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored, "*" matches anything."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return any(c == "*" or (c[2:] if c.startswith("W/") else c) == etag for c in candidates)
+
+def generation_validator(kwargs):
+    """Validator for responses that may depend on anything in the database: valid for one data generation."""
+    return (generation.value,), False
+
+def conditional_response(validator):
+    """
+    Adds a strong ETag and If-None-Match handling to a sync endpoint. `validator(kwargs)`
+    returns (parts, immutable) naming everything the response depends on besides its
+    parameters (e.g. the snapshot ids it reads), or None for calls that must not be
+    conditional (live reads). A matching request gets a 304 without running the endpoint.
+    Apply above @cached_response. The endpoint's own Request/Response parameters are reused;
+    missing ones are added to its signature.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        params = list(signature.parameters.values())
+        names = {}
+        for cls, default_name in ((Request, "_conditional_request"), (Response, "_conditional_response")):
+            existing = next((p.name for p in params if p.annotation is cls), None)
+            names[cls] = (existing or default_name, existing is None)
+            if existing is None:
+                params.append(inspect.Parameter(default_name, inspect.Parameter.KEYWORD_ONLY, annotation=cls))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request_name, request_added = names[Request]
+            response_name, response_added = names[Response]
+            request = kwargs.pop(request_name) if request_added else kwargs[request_name]
+            response = kwargs.pop(response_name) if response_added else kwargs[response_name]
+
+            validation = validator(kwargs)
+            if validation is None:
+                return fn(*args, **kwargs)
+            parts, immutable = validation
+            query = sorted((k, _key_part(v)) for k, v in kwargs.items() if not isinstance(v, (Session, Request, Response)))
+            headers = {
+                "ETag": make_etag(fn.__name__, query, parts),
+                "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+            }
+            if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+
+            value = fn(*args, **kwargs)
+            (value if isinstance(value, Response) else response).headers.update(headers)
+            return value
+
+        wrapper.__signature__ = signature.replace(parameters=params)
+        return wrapper
+    return decorator
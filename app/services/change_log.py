@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import text
+from sqlmodel import Session, select
+from app.database import engine
+from app.models import AppConfig, Cluster, ClusterSnapshot, LicenseChangeEvent, LicenseUsage, epoch_seconds
+from app.services.shared_cache import shared_cache
+from app.services.writer import write
+
+logger = logging.getLogger(__name__)
+
+# Events inserted per writer transaction while backfilling
+BACKFILL_BATCH = 500
+BACKFILL_LEASE_KEY = "backfill:license_change_event"
+# AppConfig: epoch from which the poller records events itself, and the last cluster backfilled below it
+BACKFILL_UNTIL_KEY = "LICENSE_CHANGE_BACKFILL_UNTIL"
+BACKFILL_CURSOR_KEY = "LICENSE_CHANGE_BACKFILL_CURSOR"
+
+def diff_license_details(prev_details: list, curr_details: list, license_diff: int) -> List[dict]:
+    """
+    Licensed-node changes between two `calculate_licenses` breakdowns: nodes that started or
+    stopped counting, and counted nodes whose vCPU/licenses moved. License deltas are per node,
+    so they add up to the cluster's change; whatever the nodes don't explain is one MODIFIED
+    entry without a node.
+    """
+    prev = {d["name"]: d for d in prev_details if d.get("status") == "INCLUDED"}
+    curr = {d["name"]: d for d in curr_details if d.get("status") == "INCLUDED"}
+
+    changes = []
+    for name in sorted(curr.keys() - prev.keys()):
+        changes.append({"change_type": "ADDED", "node_name": name, "vcpu": curr[name].get("vcpu"), "prev_vcpu": None,
+                        "license_diff": curr[name].get("licenses", 0)})
+    for name in sorted(prev.keys() - curr.keys()):
+        changes.append({"change_type": "REMOVED", "node_name": name, "vcpu": prev[name].get("vcpu"), "prev_vcpu": None,
+                        "license_diff": -prev[name].get("licenses", 0)})
+    for name in sorted(curr.keys() & prev.keys()):
+        before, after = prev[name], curr[name]
+        if before.get("vcpu") != after.get("vcpu") or before.get("licenses") != after.get("licenses"):
+            changes.append({"change_type": "MODIFIED", "node_name": name, "vcpu": after.get("vcpu"), "prev_vcpu": before.get("vcpu"),
+                            "license_diff": after.get("licenses", 0) - before.get("licenses", 0)})
+
+    unexplained = license_diff - sum(c["license_diff"] for c in changes)
+    if unexplained:
+        changes.append({"change_type": "MODIFIED", "node_name": None, "vcpu": None, "prev_vcpu": None, "license_diff": unexplained})
+    return changes
+
+def build_change_events(cluster_id: int, run_id: Optional[int], timestamp: str, baseline: dict, lic_data: dict) -> List[LicenseChangeEvent]:
+    """Change log rows for one poll. `baseline` is the previous successful poll's {"license_count", "details"}."""
+    changes = diff_license_details(baseline["details"], lic_data["details"], lic_data["total_licenses"] - baseline["license_count"])
+    return [LicenseChangeEvent(cluster_id=cluster_id, run_id=run_id, timestamp=timestamp, **c) for c in changes]
+
+def previous_license_baseline(session: Session, cluster_id: int) -> Optional[dict]:
+    """
+    License breakdown of the cluster's latest successful poll, read from its LicenseUsage row
+    (no snapshot payload is parsed). None when there is nothing to compare against.
+    """
+    run_id = session.exec(
+        select(ClusterSnapshot.run_id)
+        .where(ClusterSnapshot.cluster_id == cluster_id, ClusterSnapshot.status == "Success")
+        .order_by(ClusterSnapshot.timestamp.desc())
+        .limit(1)
+    ).first()
+    if run_id is None:
+        return None
+    usage = session.exec(
+        select(LicenseUsage.license_count, LicenseUsage.details_json)
+        .where(LicenseUsage.run_id == run_id, LicenseUsage.cluster_id == cluster_id)
+    ).first()
+    if usage is None or not usage.details_json:
+        return None
+    return {"license_count": usage.license_count, "details": json.loads(usage.details_json)}
+
+def _backfill_until(session: Session) -> int:
+    """Polls from this moment on record their own events; pinned on the first backfill run."""
+    config = session.get(AppConfig, BACKFILL_UNTIL_KEY)
+    if config:
+        return int(config.value)
+    until = epoch_seconds(datetime.utcnow())
+    write(lambda s: s.merge(AppConfig(key=BACKFILL_UNTIL_KEY, value=str(until))))
+    return until
+
+def backfill_change_events(batch_size: int = BACKFILL_BATCH) -> dict:
+    """
+    Builds the change log for history polled before it existed, from each cluster's
+    successful LicenseUsage breakdowns in time order (the same inputs the poller uses).
+    Runs one cluster at a time and records the last finished cluster, so an interrupted
+    backfill resumes where it stopped; a partially done cluster is redone from scratch.
+    One process at a time (shared lease).
+    """
+    if not shared_cache.add(BACKFILL_LEASE_KEY, {"pid": os.getpid()}, ttl=3600):
+        return {"status": "skipped"}
+
+    report = {"status": "done", "clusters": 0, "events": 0}
+    try:
+        with Session(engine) as session:
+            until = _backfill_until(session)
+            cursor = int((session.get(AppConfig, BACKFILL_CURSOR_KEY) or AppConfig(value="0")).value)
+            cluster_ids = session.exec(select(Cluster.id).where(Cluster.id > cursor).order_by(Cluster.id)).all()
+
+        for cid in cluster_ids:
+            write(lambda s, cid=cid: s.execute(
+                text("DELETE FROM license_change_event WHERE cluster_id = :cid AND ts_epoch < :until"),
+                {"cid": cid, "until": until}
+            ))
+
+            pending = []
+            with Session(engine) as session:
+                rows = session.execute(text("""
+                    SELECT u.run_id, u.timestamp, u.license_count, u.details_json
+                    FROM clustersnapshot s
+                    JOIN licenseusage u ON u.run_id = s.run_id AND u.cluster_id = s.cluster_id
+                    WHERE s.cluster_id = :cid AND s.status = 'Success' AND u.ts_epoch < :until
+                    ORDER BY s.timestamp
+                """), {"cid": cid, "until": until})
+
+                baseline = None
+                for row in rows:
+                    if not row.details_json:
+                        baseline = None # Legacy row without a breakdown; nothing to diff across it
+                        continue
+                    current = {"license_count": row.license_count, "details": json.loads(row.details_json)}
+                    if baseline is not None:
+                        lic_data = {"total_licenses": current["license_count"], "details": current["details"]}
+                        pending.extend(build_change_events(cid, row.run_id, row.timestamp, baseline, lic_data))
+                    baseline = current
+
+            # Events are few next to the breakdowns they come from; written once the read is closed
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                write(lambda s, chunk=chunk: s.add_all(chunk))
+                report["events"] += len(chunk)
+            write(lambda s, cid=cid: s.merge(AppConfig(key=BACKFILL_CURSOR_KEY, value=str(cid))))
+            report["clusters"] += 1
+
+        if report["clusters"]:
+            logger.info(f"License change log backfilled: {report['events']} events across {report['clusters']} clusters.")
+    finally:
+        shared_cache.delete(BACKFILL_LEASE_KEY)
+    return report
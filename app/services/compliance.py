@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 
 from app.models import AuditRule, AuditBundle, Cluster, ComplianceScore
 from app.services.ocp import fetch_resources, get_val
+from app.services.writer import add_all
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -59,7 +60,7 @@ def check_scope_match(scope_val: Optional[str], cluster_val: Optional[str]) -> b
 def get_nested_value(data: dict, path: str):
     return get_val(data, path, case_insensitive=True)
 
-def evaluate_cluster_compliance(session: Session, cluster: Cluster, rules: List[AuditRule], bundles: List[AuditBundle], run_timestamp: Optional[datetime] = None) -> Optional[ComplianceScore]:
+def evaluate_cluster_compliance(session: Session, cluster: Cluster, rules: List[AuditRule], bundles: List[AuditBundle], run_timestamp: Optional[datetime] = None, run_id: Optional[int] = None) -> Optional[ComplianceScore]:
     """
     Evaluates all applicable rules for a single cluster and saves a ComplianceScore.
     """
@@ -260,14 +261,15 @@ def evaluate_cluster_compliance(session: Session, cluster: Cluster, rules: List[
     
     db_score = ComplianceScore(
         cluster_id=cluster.id,
+        run_id=run_id,
         timestamp=ts_str,
         passed_count=passed,
         total_count=total,
         score=round(score_val, 1),
         results_json=json.dumps(compact_results)
     )
-    session.add(db_score)
-    session.commit()
+    # Persisted by the single writer thread; `session` is only used by callers for reads
+    add_all([db_score])
     
     logger.info(f"Compliance check finished for {cluster.name}: Score {db_score.score}%")
     return db_score
@@ -0,0 +1,71 @@
+import functools
+import inspect
+import json
+import os
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError: # Optional accelerator; the stdlib encoder is the fallback
+    orjson = None
+
+# Response compression (applied by GZipMiddleware in main): bodies below the threshold are
+# sent as-is, since gzip framing and CPU outweigh the savings on small payloads
+GZIP_MINIMUM_BYTES = int(os.getenv("GZIP_MINIMUM_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Never compressed, passed explicitly rather than relying on the Starlette version's defaults:
+# SSE events must reach the browser as they are sent, the rest is compressed already
+GZIP_EXCLUDED_CONTENT_TYPES = (
+    "text/event-stream",
+    "application/gzip", "application/x-gzip", "application/zip",
+    "image/png", "image/jpeg", "image/gif", "image/webp", "font/woff", "font/woff2",
+)
+
+def _unsupported(value):
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(value) -> bytes:
+    """
+    Compact JSON bytes for plain data (dicts, lists, str, numbers, datetimes). Anything else
+    falls back to FastAPI's jsonable_encoder walk, so the output always matches the default path.
+    """
+    try:
+        if orjson is not None:
+            return orjson.dumps(value, default=_unsupported, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, default=_unsupported, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    except (TypeError, ValueError):
+        return json.dumps(jsonable_encoder(value), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def fast_json(fn):
+    """
+    Returns a sync endpoint's plain-dict result as a FastJSONResponse, skipping the
+    jsonable_encoder pass FastAPI runs on every returned value. Headers set on the injected
+    `response` (ETag, X-*) are carried over; Response results (304s, streams) pass through.
+    Apply outermost, above @conditional_response / @cached_response.
+    """
+    signature = inspect.signature(fn)
+    params = list(signature.parameters.values())
+    response_name = next((p.name for p in params if p.annotation is Response), None)
+    added = response_name is None
+    if added:
+        response_name = "_fast_json_response"
+        params.append(inspect.Parameter(response_name, inspect.Parameter.KEYWORD_ONLY, annotation=Response))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        response = kwargs.pop(response_name) if added else kwargs[response_name]
+        value = fn(*args, **kwargs)
+        if isinstance(value, Response):
+            return value
+        result = FastJSONResponse(value, status_code=response.status_code or 200)
+        result.headers.update({k: v for k, v in response.headers.items() if k.lower() not in ("content-length", "content-type")})
+        return result
+
+    wrapper.__signature__ = signature.replace(parameters=params)
+    return wrapper
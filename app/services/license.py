@@ -1,3 +1,4 @@
+import hashlib
 import math
 import json
 import re
@@ -5,6 +6,15 @@ from typing import List, Dict, Any, Optional
 from app.services.ocp import parse_cpu, get_val
 from app.models import LicenseRule
 
+def license_rules_fingerprint(rules: List[LicenseRule], default_include: bool) -> str:
+    """
+    Identifies the license configuration counts were calculated with: the active rules in
+    evaluation order plus the default policy. Stored on snapshots so readers can tell whether
+    precomputed counts still match the current rules.
+    """
+    active = [[r.rule_type, r.match_value, r.action] for r in rules if r.is_active]
+    return hashlib.sha1(json.dumps([bool(default_include), active]).encode("utf-8")).hexdigest()
+
 def calculate_licenses(nodes: List[Any], rules: List[LicenseRule] = [], default_include: bool = False) -> Dict[str, Any]:
     """
     Calculates RedHat license usage based on nodes and LicenseRules.
@@ -0,0 +1,40 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Optional
+
+from app.services.shared_cache import shared_cache
+
+# Live dashboard refreshes are not history: the poller records LicenseUsage every interval.
+# Their breakdowns live here (shared by all workers) just long enough for the dashboard's
+# license-details modal to resolve them.
+LIVE_USAGE_PREFIX = "live-"
+LIVE_USAGE_TTL_SECONDS = 24 * 3600
+
+def record_live_usage(cluster_id: int, lic_data: dict) -> str:
+    """
+    Stores a live license calculation and returns its ephemeral usage id. Ids are derived from
+    the content, so refreshes that compute the same result reuse one entry.
+    """
+    details = json.dumps(lic_data["details"], sort_keys=True, default=str)
+    digest = hashlib.sha1(f"{cluster_id}:{details}".encode()).hexdigest()[:16]
+    usage_id = f"{LIVE_USAGE_PREFIX}{cluster_id}-{digest}"
+    shared_cache.set(f"usage:{usage_id}", {
+        "cluster_id": cluster_id,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "node_count": lic_data["node_count"],
+        "total_vcpu": lic_data["total_vcpu"],
+        "license_count": lic_data["total_licenses"],
+        "details": lic_data["details"]
+    }, ttl=LIVE_USAGE_TTL_SECONDS)
+    return usage_id
+
+def is_live_usage_id(usage_id: Optional[str]) -> bool:
+    return bool(usage_id) and usage_id.startswith(LIVE_USAGE_PREFIX)
+
+def resolve_live_usage(cluster_id: int, usage_id: str) -> Optional[dict]:
+    """Returns the stored breakdown for `usage_id`, or None if it expired or belongs to another cluster."""
+    usage = shared_cache.get(f"usage:{usage_id}")
+    if not usage or usage["cluster_id"] != cluster_id:
+        return None
+    return usage
@@ -1,26 +1,204 @@
+import json
 import logging
+import os
 import time
+from datetime import datetime
 from sqlalchemy import text
 from sqlmodel import Session
-from app.database import engine
+from app.database import engine, DATABASE_URL
+from app.services.writer import write
 
 logger = logging.getLogger(__name__)
 
-def run_vacuum_task():
+# auto_vacuum values reported by PRAGMA auto_vacuum
+AUTO_VACUUM_MODES = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+# Incremental reclaim defaults (overridable through AppConfig)
+DEFAULT_VACUUM_SLICE_PAGES = 2000 # ~8 MB per slice with 4 KB pages
+DEFAULT_VACUUM_SLICE_PAUSE_MS = 200
+DEFAULT_VACUUM_MAX_SECONDS = 120
+
+def get_auto_vacuum_mode() -> str:
+    with engine.connect() as conn:
+        mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+    return AUTO_VACUUM_MODES.get(mode, str(mode))
+
+def get_space_stats() -> dict:
+    """Page-level space accounting straight from SQLite (cheap, no table scans)."""
+    with engine.connect() as conn:
+        page_size = conn.execute(text("PRAGMA page_size")).scalar() or 0
+        page_count = conn.execute(text("PRAGMA page_count")).scalar() or 0
+        freelist_count = conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+        mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+
+    wal_bytes = 0
+    db_file = DATABASE_URL.replace("sqlite:///", "")
+    if os.path.exists(db_file + "-wal"):
+        wal_bytes = os.path.getsize(db_file + "-wal")
+
+    return {
+        "auto_vacuum": AUTO_VACUUM_MODES.get(mode, str(mode)),
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_pages": freelist_count,
+        "freelist_bytes": freelist_count * page_size,
+        "wal_bytes": wal_bytes
+    }
+
+def get_last_reclaim() -> dict:
+    """Result of the last space reclamation run (persisted so every worker sees it)."""
+    from app.models import AppConfig
+    try:
+        with Session(engine) as session:
+            cfg = session.get(AppConfig, "DB_LAST_RECLAIM")
+            return json.loads(cfg.value) if cfg and cfg.value else {}
+    except Exception:
+        return {}
+
+def _save_last_reclaim(result: dict):
+    from app.models import AppConfig
+
+    def job(session: Session):
+        cfg = session.get(AppConfig, "DB_LAST_RECLAIM") or AppConfig(key="DB_LAST_RECLAIM")
+        cfg.value = json.dumps(result)
+        session.add(cfg)
+
+    try:
+        write(job)
+    except Exception as e:
+        logger.error(f"Failed to record reclaim result: {e}")
+
+def _get_vacuum_settings() -> dict:
+    from app.models import AppConfig
+    settings = {
+        "slice_pages": DEFAULT_VACUUM_SLICE_PAGES,
+        "pause_ms": DEFAULT_VACUUM_SLICE_PAUSE_MS,
+        "max_seconds": DEFAULT_VACUUM_MAX_SECONDS
+    }
+    try:
+        with Session(engine) as session:
+            c_pages = session.get(AppConfig, "DB_VACUUM_SLICE_PAGES")
+            if c_pages: settings["slice_pages"] = max(1, int(c_pages.value))
+            c_pause = session.get(AppConfig, "DB_VACUUM_SLICE_PAUSE_MS")
+            if c_pause: settings["pause_ms"] = max(0, int(c_pause.value))
+            c_max = session.get(AppConfig, "DB_VACUUM_MAX_SECONDS")
+            if c_max: settings["max_seconds"] = max(1, int(c_max.value))
+    except Exception as e:
+        logger.error(f"Error reading vacuum settings: {e}")
+    return settings
+
+def run_wal_checkpoint(mode: str = "PASSIVE") -> dict:
     """
-    Executes a VACUUM command on the SQLite database to reclaim unused space.
-    This operation can be time-consuming and blocking, so it should be run 
+    Checkpoints the WAL back into the main file. PASSIVE never blocks writers;
+    TRUNCATE additionally resets the -wal file to zero bytes and is only used when idle.
+    """
+    from app.services.poller import is_poll_running
+
+    if mode == "TRUNCATE" and is_poll_running():
+        mode = "PASSIVE"
+    try:
+        with engine.connect() as conn:
+            busy, log_frames, checkpointed = conn.execute(text(f"PRAGMA wal_checkpoint({mode})")).fetchone()
+        return {"mode": mode, "busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+    except Exception as e:
+        logger.error(f"WAL checkpoint ({mode}) failed: {e}")
+        return {"mode": mode, "error": str(e)}
+
+def run_incremental_vacuum_task(max_seconds: int = None):
+    """
+    Returns free pages to the filesystem with PRAGMA incremental_vacuum(N) in small slices.
+    Each slice is its own short write transaction, so pollers and readers interleave between
+    slices. Slices run on their own connection rather than through the writer: the pragma must
+    run outside an ORM session and waits on the lock like any other writer (see DbWriter). Skips entirely while a poll is running and stops early if one starts.
+    Requires auto_vacuum=INCREMENTAL (see run_vacuum_task for the one-time conversion).
+    """
+    from app.services.poller import is_poll_running
+
+    if get_auto_vacuum_mode() != "INCREMENTAL":
+        logger.info("Incremental vacuum skipped: database is not in auto_vacuum=INCREMENTAL mode yet.")
+        return None
+    if is_poll_running():
+        logger.info("Incremental vacuum skipped: poll in progress.")
+        return None
+
+    settings = _get_vacuum_settings()
+    budget = max_seconds or settings["max_seconds"]
+    start_time = time.time()
+    before = get_space_stats()
+    slices = 0
+
+    try:
+        while True:
+            with engine.connect() as conn:
+                remaining = conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+                if remaining == 0:
+                    break
+                # SQLite frees one page per step of this pragma and a plain execute() only steps
+                # once; executescript runs it to completion
+                conn.connection.executescript(f"PRAGMA incremental_vacuum({int(settings['slice_pages'])});")
+                conn.commit()
+            slices += 1
+
+            if time.time() - start_time > budget:
+                logger.info("Incremental vacuum paused: time budget exhausted.")
+                break
+            if is_poll_running():
+                logger.info("Incremental vacuum paused: poll started.")
+                break
+            if settings["pause_ms"]:
+                time.sleep(settings["pause_ms"] / 1000.0)
+    except Exception as e:
+        logger.error(f"Incremental vacuum failed: {e}")
+
+    checkpoint = run_wal_checkpoint("TRUNCATE")
+    after = get_space_stats()
+
+    result = {
+        "mode": "incremental",
+        "finished_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "slices": slices,
+        "reclaimed_bytes": max(0, (before["page_count"] - after["page_count"]) * after["page_size"]),
+        "freelist_pages_remaining": after["freelist_pages"],
+        "duration_seconds": round(time.time() - start_time, 2),
+        "checkpoint": checkpoint
+    }
+    _save_last_reclaim(result)
+    logger.info(f"Incremental vacuum reclaimed {result['reclaimed_bytes'] / (1024 * 1024):.1f} MB in {slices} slices.")
+    return result
+
+def run_vacuum_task(full: bool = False):
+    """
+    Reclaims unused space in the SQLite database.
+    Databases already in auto_vacuum=INCREMENTAL mode get a non-blocking incremental reclaim.
+    Otherwise (or when `full` is requested) a full VACUUM is executed, which also converts the
+    database to INCREMENTAL mode - this is the one-time migration path for existing databases.
+    A full VACUUM is time-consuming, blocks writers and needs ~2x free disk, so it should be run
     in a background thread or process.
     """
+    if not full and get_auto_vacuum_mode() == "INCREMENTAL":
+        return run_incremental_vacuum_task(max_seconds=3600)
+
     start_time = time.time()
     logger.info("Starting database optimization (VACUUM)...")
-    
+    before = get_space_stats()
+
     try:
         with Session(engine) as session:
+            # Takes effect as part of the VACUUM rebuild below
+            session.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
             session.execute(text("VACUUM"))
             session.commit()
-            
+
         duration = time.time() - start_time
-        logger.info(f"Database optimization completed successfully in {duration:.2f} seconds.")
+        after = get_space_stats()
+        _save_last_reclaim({
+            "mode": "full",
+            "finished_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+            "reclaimed_bytes": max(0, (before["page_count"] - after["page_count"]) * after["page_size"]),
+            "freelist_pages_remaining": after["freelist_pages"],
+            "duration_seconds": round(duration, 2),
+            "auto_vacuum": after["auto_vacuum"]
+        })
+        logger.info(f"Database optimization completed successfully in {duration:.2f} seconds (auto_vacuum={after['auto_vacuum']}).")
     except Exception as e:
         logger.error(f"Database optimization failed: {e}")
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import text, bindparam
+from sqlmodel import Session, select
+from app.database import engine
+from app.models import AppConfig, LicenseRule, MapidLicenseUsage
+from app.services.license import calculate_mapid_usage
+from app.services.shared_cache import shared_cache
+from app.services.writer import write
+
+logger = logging.getLogger(__name__)
+
+# Snapshots parsed per writer transaction (each one is a full payload decode)
+MAPID_BACKFILL_BATCH = 50
+MAPID_BACKFILL_LEASE_KEY = "backfill:mapid_usage"
+MAPID_BACKFILL_LEASE_SECONDS = 600 # Renewed every batch; a crashed worker frees it quickly
+MAPID_BACKFILL_PROGRESS_KEY = "backfill:mapid_usage:progress"
+MAPID_BACKFILL_PROGRESS_TTL_SECONDS = 7 * 86400 # Last report stays visible this long after the run
+# AppConfig: highest snapshot id already examined, so a restarted backfill resumes after it
+MAPID_BACKFILL_CURSOR_KEY = "MAPID_BACKFILL_CURSOR"
+
+# Successful snapshots with no MAPID rows at their poll time (the poller writes both with the same timestamp)
+_MISSING_SQL = text("""
+    SELECT s.id FROM clustersnapshot s
+    WHERE s.id > :cursor AND s.status = 'Success'
+      AND NOT EXISTS (
+          SELECT 1 FROM mapidlicenseusage m
+          WHERE m.cluster_id = s.cluster_id AND m.ts_epoch = CAST(strftime('%s', substr(s.timestamp, 1, 19)) AS INTEGER)
+      )
+    ORDER BY s.id
+""")
+
+def is_mapid_backfill_running() -> bool:
+    """True while some worker holds the backfill lease (it expires if that worker dies)."""
+    return shared_cache.get(MAPID_BACKFILL_LEASE_KEY) is not None
+
+def get_mapid_backfill_progress() -> Optional[dict]:
+    """
+    Last reported state of the MAPID usage backfill (any worker), or None if it never ran.
+    A "running" report without a live lease belongs to a worker that died: "interrupted".
+    """
+    progress = shared_cache.get(MAPID_BACKFILL_PROGRESS_KEY)
+    if progress and progress.get("status") == "running" and not is_mapid_backfill_running():
+        progress = {**progress, "status": "interrupted"}
+    return progress
+
+def _report(progress: dict):
+    shared_cache.set(MAPID_BACKFILL_PROGRESS_KEY, progress, ttl=MAPID_BACKFILL_PROGRESS_TTL_SECONDS)
+
+def backfill_mapid_usage(batch_size: int = MAPID_BACKFILL_BATCH) -> dict:
+    """
+    Computes MapidLicenseUsage for successful snapshots polled before the poller recorded it,
+    using the current license rules. Works in small batches through the writer, records the
+    last examined snapshot after each one (an interrupted run resumes there) and publishes
+    progress to the shared cache. One process at a time (shared lease).
+    """
+    if not shared_cache.add(MAPID_BACKFILL_LEASE_KEY, {"pid": os.getpid()}, ttl=MAPID_BACKFILL_LEASE_SECONDS):
+        return {"status": "skipped"}
+
+    from app.services.archive import load_archived_payload
+
+    progress = {"status": "running", "done": 0, "total": 0, "rows": 0, "failed": 0,
+                "started_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}
+    try:
+        with Session(engine) as session:
+            cursor = int((session.get(AppConfig, MAPID_BACKFILL_CURSOR_KEY) or AppConfig(value="0")).value)
+            missing = session.execute(_MISSING_SQL, {"cursor": cursor}).scalars().all()
+            rules = session.exec(select(LicenseRule).where(LicenseRule.is_active == True).order_by(LicenseRule.order, LicenseRule.id)).all()
+            default_include = (session.get(AppConfig, "LICENSE_DEFAULT_INCLUDE") or AppConfig(value="False")).value.lower() == "true"
+        progress["total"] = len(missing)
+        _report(progress)
+
+        for start in range(0, len(missing), batch_size):
+            ids = missing[start:start + batch_size]
+            rows = []
+            with Session(engine) as session:
+                snaps = session.execute(
+                    text("SELECT id, cluster_id, run_id, timestamp, data_json, archive_id FROM clustersnapshot WHERE id IN :ids")
+                    .bindparams(bindparam("ids", expanding=True)),
+                    {"ids": ids}
+                ).all()
+                for snap in snaps:
+                    try:
+                        data_json = snap.data_json
+                        if data_json is None and snap.archive_id:
+                            data_json = (load_archived_payload(session, snap.id, snap.archive_id) or {}).get("data_json")
+                        nodes = json.loads(data_json).get("nodes", []) if data_json else []
+                        timestamp = str(snap.timestamp)[:19]
+                        for m_data in calculate_mapid_usage(nodes, rules, default_include=default_include):
+                            rows.append(MapidLicenseUsage(
+                                cluster_id=snap.cluster_id,
+                                run_id=snap.run_id,
+                                timestamp=timestamp,
+                                mapid=m_data["mapid"],
+                                lob=m_data["lob"],
+                                node_count=m_data["node_count"],
+                                total_vcpu=m_data["total_vcpu"],
+                                license_count=m_data["license_count"]
+                            ))
+                    except Exception as e:
+                        progress["failed"] += 1
+                        logger.error(f"Error backfilling MAPID usage of snapshot {snap.id}: {e}")
+
+            def job(session, rows=rows, last_id=ids[-1]):
+                session.add_all(rows)
+                session.merge(AppConfig(key=MAPID_BACKFILL_CURSOR_KEY, value=str(last_id)))
+            write(job)
+
+            progress["done"] += len(ids)
+            progress["rows"] += len(rows)
+            _report(progress)
+            shared_cache.set(MAPID_BACKFILL_LEASE_KEY, {"pid": os.getpid()}, ttl=MAPID_BACKFILL_LEASE_SECONDS)
+
+        progress["status"] = "done"
+        if progress["total"]:
+            logger.info(f"MAPID usage backfilled for {progress['done']} snapshots ({progress['rows']} rows, {progress['failed']} failed).")
+    except Exception as e:
+        progress["status"] = "error"
+        progress["error"] = str(e)
+        logger.error(f"MAPID usage backfill stopped: {e}")
+    finally:
+        progress["finished_at"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        _report(progress)
+        shared_cache.delete(MAPID_BACKFILL_LEASE_KEY)
+    return progress
@@ -140,9 +140,9 @@ def parse_cpu(cpu_val: Any) -> float:
     except Exception:
         return 0.0
 
-def fetch_resources(cluster: Cluster, api_version: str, kind: str, namespace: Optional[str] = None, timeout: int = 300, use_table: bool = False):
+def fetch_resources(cluster: Cluster, api_version: str, kind: str, namespace: Optional[str] = None, timeout: int = 300, use_table: bool = False, label_selector: Optional[str] = None):
     """
-    Generic fetcher with enrichment for specific types.
+    Generic fetcher with enrichment for specific types. `label_selector` is evaluated by the API server.
     """
     dyn_client = get_dynamic_client(cluster)
     resource_api = dyn_client.resources.get(api_version=api_version, kind=kind)
@@ -150,6 +150,8 @@ def fetch_resources(cluster: Cluster, api_version: str, kind: str, namespace: Op
     kwargs = {'_request_timeout': timeout}
     if namespace:
         kwargs['namespace'] = namespace
+    if label_selector:
+        kwargs['label_selector'] = label_selector
         
     if use_table:
         # Request Table format to reduce payload size (no full schemas/icons)
@@ -258,6 +260,56 @@ def enrich_machines(machines: List[Any]) -> List[Any]:
         enriched.append(m_dict)
     return enriched
 
+def extract_health_facts(cluster: Cluster, snapshot_data: dict, service_mesh: Optional[dict] = None, argocd: Optional[dict] = None) -> dict:
+    """
+    Derives the dashboard health facts from a snapshot payload once, at poll time, so the fast
+    summary can read them as ClusterSnapshot columns instead of re-parsing data_json.
+    """
+    stats = get_cluster_stats(cluster, snapshot_data=snapshot_data)
+    upgrade = stats.get("upgrade_status") or {}
+
+    # ClusterOperators that are Degraded or not Available (same rule as the live red status)
+    degraded = 0
+    for co in snapshot_data.get("clusteroperators", []):
+        conditions = get_val(co, 'status.conditions') or []
+        is_degraded = any(c.get('type') == "Degraded" and c.get('status') == "True" for c in conditions)
+        is_available = any(c.get('type') == "Available" and c.get('status') == "True" for c in conditions)
+        if is_degraded or not is_available:
+            degraded += 1
+
+    return {
+        "current_version": stats.get("version") or "N/A",
+        "desired_version": upgrade.get("target_version") or stats.get("version") or "N/A",
+        "upgrade_percentage": upgrade.get("percentage", 0) if upgrade.get("is_upgrading") else None,
+        "upgrade_message": upgrade.get("message") if upgrade.get("is_upgrading") else None,
+        "degraded_operator_count": degraded,
+        "console_url": stats.get("console_url") or "#",
+        "has_service_mesh": bool((service_mesh or {}).get("is_active", False)),
+        "has_argocd": bool((argocd or {}).get("is_active", False)),
+    }
+
+def stats_from_health_facts(cluster_id: int, snap) -> dict:
+    """Rebuilds the get_cluster_stats() shape from a snapshot's precomputed health fact columns."""
+    upgrade_status = None
+    if snap.upgrade_percentage is not None:
+        upgrade_status = {
+            "is_upgrading": True,
+            "message": snap.upgrade_message or "",
+            "percentage": snap.upgrade_percentage,
+            "target_version": snap.desired_version
+        }
+    return {
+        "id": cluster_id,
+        "node_count": snap.node_count,
+        "vcpu_count": int(snap.vcpu_count or 0),
+        "version": snap.current_version,
+        "console_url": snap.console_url or "#",
+        "upgrade_status": upgrade_status,
+        "degraded_operator_count": snap.degraded_operator_count,
+        "has_service_mesh": bool(snap.has_service_mesh),
+        "has_argocd": bool(snap.has_argocd)
+    }
+
 def get_cluster_stats(cluster: Cluster, nodes: Optional[List[Any]] = None, snapshot_data: Optional[dict] = None):
     try:
         if snapshot_data:
@@ -0,0 +1,214 @@
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.models import Cluster, ClusterSnapshot, OperatorInstall
+from app.services.snapshots import resolve_snapshot_ids
+
+_VERSION_CORE = re.compile(r"\d+(?:\.\d+)*")
+
+def version_sort_key(version: Optional[str]) -> Optional[str]:
+    """
+    Sortable string for an operator version: the first dotted numeric run ("4.14.2",
+    "acm.v2.9.0" -> 2.9.0) with each component zero-padded, so SQL string comparison orders
+    versions numerically. Pre-release suffixes are ignored. None when there is no number.
+    """
+    match = _VERSION_CORE.search(version or "")
+    if not match:
+        return None
+    parts = [int(p) for p in match.group(0).split(".")]
+    parts += [0] * (4 - len(parts))
+    return ".".join(f"{p:08d}" for p in parts)
+
+def olm_facts(data: dict) -> dict:
+    """OLM collection status of a snapshot payload (stored on ClusterSnapshot)."""
+    errors = data.get("__errors") or {}
+    return {
+        "olm_collected": "csvs" in data or "subscriptions" in data,
+        "olm_auth_error": errors.get("subscriptions") == "Forbidden" or errors.get("csvs") == "Forbidden"
+    }
+
+def operator_installs_from_payload(csvs: list, subs: list) -> List[dict]:
+    """
+    Joins subscriptions to their installed CSVs: one dict per subscription with a package name.
+    Missing or null CSV fields fall back to placeholders, as minified CSVs may carry nulls.
+    """
+    csv_map = {c["metadata"]["name"]: c for c in csvs if "metadata" in c and "name" in c["metadata"]}
+
+    installs = []
+    for sub in subs:
+        meta = sub.get("metadata", {})
+        spec = sub.get("spec", {})
+        status = sub.get("status", {})
+
+        pkg_name = spec.get("name") # e.g. "advanced-cluster-management"
+        if not pkg_name:
+            continue
+
+        installed_csv_name = status.get("installedCSV")
+        display_name = pkg_name
+        provider = "Unknown"
+        phase = "Unknown"
+        managed_crds = []
+        if installed_csv_name and installed_csv_name in csv_map:
+            csv_spec = csv_map[installed_csv_name].get("spec", {})
+            version = csv_spec.get("version") or "Unknown"
+            display_name = csv_spec.get("displayName") or pkg_name
+            raw_provider = csv_spec.get("provider")
+            provider = (raw_provider.get("name") or "Unknown") if isinstance(raw_provider, dict) else (raw_provider or "Unknown")
+            phase = (csv_map[installed_csv_name].get("status") or {}).get("phase") or "Unknown"
+            owned = csv_spec.get("customresourcedefinitions", {}).get("owned", [])
+            managed_crds = [{"name": o.get("name"), "kind": o.get("kind"), "displayName": o.get("displayName")} for o in owned]
+        else:
+            # Pending install: no CSV object yet
+            version = status.get("currentCSV") or "Pending"
+
+        installs.append({
+            "package": pkg_name,
+            "display_name": display_name,
+            "provider": provider,
+            "channel": spec.get("channel") or "unknown",
+            "installed_csv": installed_csv_name,
+            "version": version,
+            "phase": phase,
+            "approval": spec.get("installPlanApproval") or "Automatic",
+            "source": spec.get("source"),
+            "subscription_name": meta.get("name"),
+            "namespace": meta.get("namespace"),
+            "managed_crds": managed_crds
+        })
+    return installs
+
+def build_operator_installs(cluster_id: int, data: dict) -> List[OperatorInstall]:
+    """Inventory rows of one poll's payload (snapshot_id is set once the snapshot is flushed)."""
+    rows = []
+    for install in operator_installs_from_payload(data.get("csvs") or [], data.get("subscriptions") or []):
+        managed_crds = install.pop("managed_crds")
+        rows.append(OperatorInstall(
+            cluster_id=cluster_id,
+            snapshot_id=0,
+            version_key=version_sort_key(install["version"]),
+            managed_crds_json=json.dumps(managed_crds) if managed_crds else None,
+            **install
+        ))
+    return rows
+
+def install_as_dict(row: OperatorInstall) -> dict:
+    """Inverse of build_operator_installs, in operator_installs_from_payload's shape."""
+    return {
+        "package": row.package,
+        "display_name": row.display_name,
+        "provider": row.provider,
+        "channel": row.channel,
+        "installed_csv": row.installed_csv,
+        "version": row.version,
+        "phase": row.phase,
+        "approval": row.approval,
+        "source": row.source,
+        "subscription_name": row.subscription_name,
+        "namespace": row.namespace,
+        "managed_crds": json.loads(row.managed_crds_json) if row.managed_crds_json else []
+    }
+
+def legacy_operator_installs(session: Session, snapshot_ids: List[int]) -> Dict[int, Tuple[bool, bool, List[dict]]]:
+    """
+    (data_collected, auth_error, installs) per snapshot polled before the operator_install
+    inventory existed. Only the OLM fragments of all the snapshots are extracted, in one query:
+    json_extract returns the JSON string for objects/arrays in SQLite, which avoids loading
+    each full data_json into Python.
+    """
+    if not snapshot_ids:
+        return {}
+    rows = session.exec(select(
+        ClusterSnapshot.id,
+        func.json_extract(ClusterSnapshot.data_json, '$.csvs'),
+        func.json_extract(ClusterSnapshot.data_json, '$.subscriptions'),
+        func.json_extract(ClusterSnapshot.data_json, '$.__errors'),
+        ClusterSnapshot.archive_id
+    ).where(ClusterSnapshot.id.in_(snapshot_ids))).all()
+
+    results = {}
+    for snapshot_id, csvs, subs, errors, archive_id in rows:
+        data = {}
+        if csvs is not None:
+            data["csvs"] = json.loads(csvs)
+        if subs is not None:
+            data["subscriptions"] = json.loads(subs)
+        if errors is not None:
+            data["__errors"] = json.loads(errors)
+
+        # Cold-archived snapshot (time travel only): extract the same fragments from the rehydrated blob
+        if archive_id and "csvs" not in data and "subscriptions" not in data:
+            from app.services.archive import load_archived_payload
+            payload = load_archived_payload(session, snapshot_id, archive_id)
+            if payload and payload.get("data_json"):
+                data = json.loads(payload["data_json"])
+
+        facts = olm_facts(data)
+        installs = operator_installs_from_payload(data.get("csvs") or [], data.get("subscriptions") or [])
+        results[snapshot_id] = (facts["olm_collected"], facts["olm_auth_error"], installs)
+    return results
+
+def fleet_operator_installs(
+    session: Session,
+    package: str,
+    below: Optional[str] = None,
+    at_least: Optional[str] = None,
+    channel: Optional[str] = None,
+    target_time: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Installs of `package` across the fleet as of `target_time` (latest when None), optionally
+    limited to versions below / at least a given version or to one channel. One indexed query
+    over the resolved snapshots; snapshots that predate the inventory are read from their payload.
+    """
+    snapshot_ids = resolve_snapshot_ids(session, target_time)
+    if not snapshot_ids:
+        return []
+    below_key = version_sort_key(below) if below is not None else None
+    at_least_key = version_sort_key(at_least) if at_least is not None else None
+    stmt = (
+        select(OperatorInstall, Cluster.name, Cluster.environment, Cluster.datacenter)
+        .join(Cluster, Cluster.id == OperatorInstall.cluster_id)
+        .where(OperatorInstall.snapshot_id.in_(list(snapshot_ids.values())), OperatorInstall.package == package)
+    )
+    if below is not None:
+        stmt = stmt.where(OperatorInstall.version_key < below_key)
+    if at_least is not None:
+        stmt = stmt.where(OperatorInstall.version_key >= at_least_key)
+    if channel is not None:
+        stmt = stmt.where(OperatorInstall.channel == channel)
+
+    results = []
+    for row, name, environment, datacenter in session.exec(stmt).all():
+        item = install_as_dict(row)
+        item.update({"cluster_id": row.cluster_id, "cluster_name": name, "environment": environment, "datacenter": datacenter})
+        results.append(item)
+
+    legacy_ids = session.exec(
+        select(ClusterSnapshot.id)
+        .where(ClusterSnapshot.id.in_(list(snapshot_ids.values())), ClusterSnapshot.olm_collected == None)
+    ).all()
+    if legacy_ids:
+        cluster_of = {snapshot_id: cluster_id for cluster_id, snapshot_id in snapshot_ids.items()}
+        clusters = {c.id: c for c in session.exec(select(Cluster).where(Cluster.id.in_(list(cluster_of.values())))).all()}
+        for snapshot_id, (_, _, installs) in legacy_operator_installs(session, legacy_ids).items():
+            cluster = clusters.get(cluster_of[snapshot_id])
+            if cluster is None:
+                continue
+            for install in installs:
+                # Same filters as the SQL above; a version without a number never compares
+                key = version_sort_key(install["version"])
+                if install["package"] != package or (channel is not None and install["channel"] != channel):
+                    continue
+                if below is not None and (key is None or key >= below_key):
+                    continue
+                if at_least is not None and (key is None or key < at_least_key):
+                    continue
+                install.update({"cluster_id": cluster.id, "cluster_name": cluster.name, "environment": cluster.environment, "datacenter": cluster.datacenter})
+                results.append(install)
+
+    results.sort(key=lambda r: (version_sort_key(r["version"]) or "", r["cluster_name"]))
+    return results
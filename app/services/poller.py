@@ -1,11 +1,17 @@
 import json
 import logging
+import os
 from datetime import datetime
 from sqlmodel import Session, select
 from app.database import engine
-from app.models import Cluster, ClusterSnapshot, LicenseUsage, LicenseRule, MapidLicenseUsage
-from app.services.ocp import fetch_resources, parse_cpu, get_val, get_service_mesh_details, get_argocd_details
-from app.services.license import calculate_licenses, calculate_mapid_usage
+from app.models import Cluster, ClusterSnapshot, LicenseUsage, LicenseRule, MapidLicenseUsage, PollRun, ComplianceScore, epoch_seconds
+from app.services.ocp import fetch_resources, parse_cpu, get_val, get_service_mesh_details, get_argocd_details, extract_health_facts
+from app.services.license import calculate_licenses, calculate_mapid_usage, license_rules_fingerprint
+from app.services.writer import write, add_all
+from app.services.change_log import previous_license_baseline, build_change_events
+from app.services.unmapped import load_namespace_patterns, find_unmapped, replace_unmapped_index
+from app.services.operator_inventory import olm_facts, build_operator_installs
+from app.services.shared_cache import shared_cache
 
 logger = logging.getLogger(__name__)
 
@@ -22,11 +28,45 @@ POLL_RESOURCES = {
     # OLM Resources are optional, defined in config
 }
 
-def poll_all_clusters(progress_callback=None):
-    """Main entry point for the scheduler."""
+# One poll run at a time across all worker processes (scheduled + manual); maintenance jobs
+# back off while it is held. The TTL only matters if a process dies mid-run.
+POLL_LEASE_KEY = "poll:running"
+POLL_LEASE_SECONDS = 3 * 3600
+
+# Progress of every run is published here; SSE streams on any worker follow it
+POLL_EVENTS_CHANNEL = "poll"
+
+def is_poll_running() -> bool:
+    return shared_cache.get(POLL_LEASE_KEY) is not None
+
+def poll_all_clusters(progress_callback=None, trigger="scheduled") -> bool:
+    """Main entry point for the scheduler. Returns False if another process is already polling."""
+    if not shared_cache.add(POLL_LEASE_KEY, {"pid": os.getpid(), "trigger": trigger}, ttl=POLL_LEASE_SECONDS):
+        logger.info(f"Skipping {trigger} poll: another worker is already polling")
+        return False
+
+    def publish(event):
+        shared_cache.publish(POLL_EVENTS_CHANNEL, event)
+        if progress_callback:
+            progress_callback(event)
+
+    try:
+        _poll_all_clusters(publish, trigger)
+        publish({"type": "done"})
+    except Exception as e:
+        publish({"type": "error", "message": str(e)})
+        raise
+    finally:
+        shared_cache.delete(POLL_LEASE_KEY)
+    return True
+
+def _poll_all_clusters(progress_callback=None, trigger="scheduled"):
     logger.info("Starting background poll of all clusters...")
     run_timestamp = datetime.utcnow() # Unified timestamp for the entire run
     
+    # Register the run up front so every row written below can reference it
+    run_id = add_all([PollRun(started_at=run_timestamp, trigger=trigger)])[0].id
+
     with Session(engine) as session:
         from app.models import AppConfig
         clusters = session.exec(select(Cluster)).all()
@@ -52,6 +92,7 @@ def poll_all_clusters(progress_callback=None):
                 progress_callback({"type": "cluster_start", "cluster": cluster.name, "index": i + 1, "total": total})
             poll_cluster(
                 cluster.id, rules, progress_callback, run_timestamp, 
+                run_id=run_id,
                 default_include=default_include,
                 collect_olm=collect_olm,
                 run_compliance=run_compliance,
@@ -65,53 +106,142 @@ def poll_all_clusters(progress_callback=None):
             if progress_callback:
                 progress_callback({"type": "error", "cluster": cluster.name, "message": str(e)})
 
+    # Finalize run aggregates
+    try:
+        write(lambda session: refresh_run_aggregates(session, run_id, finished_at=datetime.utcnow()))
+    except Exception as e:
+        logger.error(f"Failed to finalize poll run {run_id}: {e}")
+
     # 4. Cleanup old snapshots
     try:
-        with Session(engine) as session:
-            cleanup_old_snapshots(session)
+        cleanup_old_snapshots()
     except Exception as e:
         logger.error(f"Failed to cleanup old snapshots: {e}")
 
-def cleanup_old_snapshots(session: Session):
-    """Deletes snapshots older than the configured retention period."""
+def cleanup_old_snapshots():
+    """
+    Deletes snapshots older than the configured retention period, then downsamples the
+    remaining history according to the retention tiers (batched, see retention service).
+    Settings are read up front in a short session: no read transaction stays open while
+    the batched maintenance steps run.
+    """
     from app.models import AppConfig
     from datetime import timedelta
-    
-    config = session.get(AppConfig, "SNAPSHOT_RETENTION_DAYS")
-    days = int(config.value) if config else 30
+    from app.services.retention import get_cleanup_settings, get_retention_tiers, purge_snapshots_before, downsample_snapshots, purge_rollup_before, DEFAULT_ROLLUP_RETENTION_DAYS
+    from app.services.archive import get_archive_settings, archive_snapshots_before, prune_orphan_archives
+
+    with Session(engine) as session:
+        config = session.get(AppConfig, "SNAPSHOT_RETENTION_DAYS")
+        days = int(config.value) if config else 30
+        settings = get_cleanup_settings(session)
+        # Daily rollups outlive raw usage (never less than the snapshot retention)
+        rollup_days = max(days, int((session.get(AppConfig, "MAPID_ROLLUP_RETENTION_DAYS") or AppConfig(value=str(DEFAULT_ROLLUP_RETENTION_DAYS))).value))
+        tiers = get_retention_tiers(session)
+        archive_settings = get_archive_settings(session)
     
     logger.info(f"Running automated cleanup (Retention: {days} days)...")
     cutoff = datetime.utcnow() - timedelta(days=days)
-    cutoff_str = cutoff.strftime("%Y-%m-%d %H:%M:%S")
-    
-    from sqlalchemy import text
-    from app.models import LicenseUsage, ComplianceScore, MapidLicenseUsage
 
-    # 1. Delete associated data
-    session.execute(text("DELETE FROM licenseusage WHERE timestamp < :cutoff"), {"cutoff": cutoff_str})
-    session.execute(text("DELETE FROM mapidlicenseusage WHERE timestamp < :cutoff"), {"cutoff": cutoff_str})
-    session.execute(text("DELETE FROM compliancescore WHERE timestamp < :cutoff"), {"cutoff": cutoff_str})
-
-    # 2. Snapshots
-    statement = select(ClusterSnapshot).where(ClusterSnapshot.timestamp < cutoff)
-    old_snapshots = session.exec(statement).all()
-    
-    count = 0
-    for snap in old_snapshots:
-        session.delete(snap)
-        count += 1
+    report = purge_snapshots_before(cutoff, batch_size=settings["batch_size"], pause_ms=settings["pause_ms"])
     
-    if count > 0:
-        session.commit()
-        logger.info(f"Automated cleanup deleted {count} old snapshots.")
+    if report["snapshots"] > 0:
+        logger.info(
+            f"Automated cleanup deleted {report['snapshots']} old snapshots, "
+            f"{report['licenseusage'] + report['mapidlicenseusage'] + report['compliancescore']} usage/compliance rows "
+            f"and {report['pollrun']} runs in {report['batches']} batches "
+            f"({report['payload_bytes'] / (1024 * 1024):.1f} MB payload, {report['freed_bytes'] / (1024 * 1024):.1f} MB freed pages, "
+            f"{report['duration_seconds']}s)."
+        )
     else:
         logger.info("No old snapshots to cleanup.")
 
+    purged_rollups = purge_rollup_before(datetime.utcnow() - timedelta(days=rollup_days))
+    if purged_rollups:
+        logger.info(f"Purged {purged_rollups} MAPID daily rollup rows older than {rollup_days} days.")
+
+    if tiers:
+        ds_report = downsample_snapshots(tiers, batch_size=settings["batch_size"], pause_ms=settings["pause_ms"])
+        if ds_report["snapshots"] > 0:
+            logger.info(
+                f"Downsampling ({', '.join(f'{r} after {d}d' for d, r in tiers)}) removed {ds_report['snapshots']} snapshots "
+                f"({ds_report['payload_bytes'] / (1024 * 1024):.1f} MB payload) in {ds_report['batches']} batches "
+                f"({ds_report['duration_seconds']}s)."
+            )
+        report["downsampled"] = ds_report
+
+    # Cold archive: move aged blobs out of SQLite, drop archives whose snapshots are all gone
+    if archive_settings["after_days"]:
+        ar_report = archive_snapshots_before(datetime.utcnow() - timedelta(days=archive_settings["after_days"]), pause_ms=settings["pause_ms"])
+        if ar_report["snapshots"] > 0:
+            logger.info(
+                f"Archived {ar_report['snapshots']} snapshots from {ar_report['runs']} runs "
+                f"({ar_report['raw_bytes'] / (1024 * 1024):.1f} MB -> {ar_report['compressed_bytes'] / (1024 * 1024):.1f} MB, "
+                f"{ar_report['duration_seconds']}s)."
+            )
+        report["archived"] = ar_report
+    pruned = prune_orphan_archives()
+    if pruned:
+        logger.info(f"Removed {pruned} archive files with no remaining snapshots.")
+    return report
+
+def refresh_run_aggregates(session: Session, run_id: int, finished_at: datetime = None):
+    """
+    Recomputes the precomputed totals of a PollRun from its snapshots.
+    Called when a run finishes and whenever snapshots are removed from it.
+    Does not commit; the caller owns the transaction.
+    """
+    from sqlmodel import func
+
+    run = session.get(PollRun, run_id)
+    if not run:
+        return None
+
+    totals = session.exec(
+        select(
+            func.count(ClusterSnapshot.id),
+            func.coalesce(func.sum(ClusterSnapshot.node_count), 0),
+            func.coalesce(func.sum(ClusterSnapshot.vcpu_count), 0.0),
+            func.coalesce(func.sum(ClusterSnapshot.status != "Success"), 0)
+        ).where(ClusterSnapshot.run_id == run_id)
+    ).one()
+
+    run.total_clusters = totals[0]
+    run.total_nodes = int(totals[1])
+    run.total_vcpu = float(totals[2])
+    run.status = "Partial/Failed" if totals[3] else "Success"
+    if finished_at:
+        run.finished_at = finished_at
+
+    components = ["Cluster"] # Cluster always collected
+
+    # Read from the stored OLM facts, never the payloads. Snapshots polled before those facts
+    # existed (NULL) keep what was detected when their run was first aggregated.
+    olm_collected, legacy = session.exec(
+        select(
+            func.max(ClusterSnapshot.olm_collected),
+            func.count(ClusterSnapshot.id) - func.count(ClusterSnapshot.olm_collected)
+        ).where(ClusterSnapshot.run_id == run_id)
+    ).one()
+    has_olm = bool(olm_collected)
+    if not has_olm and legacy and run.collected_components:
+        has_olm = "Operator" in json.loads(run.collected_components)
+    if has_olm:
+        components.append("Operator")
+
+    has_compliance = session.exec(select(ComplianceScore.id).where(ComplianceScore.run_id == run_id).limit(1)).first()
+    if has_compliance:
+        components.append("Compliance")
+
+    run.collected_components = json.dumps(components)
+    session.add(run)
+    return run
+
 def poll_cluster(
     cluster_id: int, 
     rules: list, 
     progress_callback=None, 
     run_timestamp=None, 
+    run_id=None,
     default_include=False,
     collect_olm=True,
     run_compliance=False,
@@ -126,6 +256,11 @@ def poll_cluster(
         cluster = session.get(Cluster, cluster_id)
         if not cluster:
             return
+        # Detach and end the read transaction now: fetching takes minutes and every write
+        # below goes through the writer thread
+        session.expunge(cluster)
+        ns_patterns = load_namespace_patterns(session)
+        session.rollback()
 
         logger.info(f"Polling cluster: {cluster.name}")
         snapshot_data = {}
@@ -307,19 +442,21 @@ def poll_cluster(
         # Save License Usage Record
         usage = LicenseUsage(
             cluster_id=cluster.id,
+            run_id=run_id,
             timestamp=run_timestamp.strftime("%Y-%m-%d %H:%M:%S"),
             node_count=lic_data["node_count"],
             total_vcpu=lic_data["total_vcpu"],
             license_count=lic_data["total_licenses"],
             details_json=json.dumps(lic_data["details"])
         )
-        session.add(usage)
+        rows = [usage]
 
         # 3b. Calculate and Save MAPID Usage
         mapid_data_list = calculate_mapid_usage(nodes, rules, default_include=default_include)
         for m_data in mapid_data_list:
             m_usage = MapidLicenseUsage(
                 cluster_id=cluster.id,
+                run_id=run_id,
                 timestamp=run_timestamp.strftime("%Y-%m-%d %H:%M:%S"),
                 mapid=m_data["mapid"],
                 lob=m_data["lob"],
@@ -327,11 +464,19 @@ def poll_cluster(
                 total_vcpu=m_data["total_vcpu"],
                 license_count=m_data["license_count"]
             )
-            session.add(m_usage)
+            rows.append(m_usage)
+
+        # 3c. Licensed-node changes since the previous successful poll (the trend diffs change log).
+        # Partial polls may have missed nodes, so they neither record changes nor serve as baseline.
+        if status == "Success":
+            baseline = previous_license_baseline(session, cluster.id)
+            if baseline is not None:
+                rows.extend(build_change_events(cluster.id, run_id, usage.timestamp, baseline, lic_data))
 
         # 4. Create ClusterSnapshot
         snapshot = ClusterSnapshot(
             cluster_id=cluster.id,
+            run_id=run_id,
             timestamp=run_timestamp,
             status=status,
             captured_name=cluster.name,          # Freeze name
@@ -343,13 +488,32 @@ def poll_cluster(
             machine_count=len(snapshot_data.get("machines", [])),
             license_count=lic_data["total_licenses"],
             licensed_node_count=lic_data["node_count"],
+            licensed_vcpu_count=lic_data["total_vcpu"],
+            license_rules_hash=license_rules_fingerprint(rules, default_include),
+            **extract_health_facts(cluster, snapshot_data, sm_data, argocd_data),
+            **olm_facts(snapshot_data),
             service_mesh_json=json.dumps(sm_data, default=str),
             argocd_json=json.dumps(argocd_data, default=str),
             data_json=json.dumps(snapshot_data, default=str) # default=str handles datetime objects in k8s responses
         )
-        session.add(snapshot)
-        
-        session.commit()
+        rows.append(snapshot)
+
+        # Usage rows and snapshot commit together through the single writer; a successful poll
+        # also replaces the cluster's unmapped-resource index and records its operator
+        # installs in the same transaction
+        if status == "Success":
+            unmapped = find_unmapped(cluster.id, epoch_seconds(run_timestamp), nodes, snapshot_data.get("projects", []), lic_data["details"], ns_patterns)
+            installs = build_operator_installs(cluster.id, snapshot_data)
+            def save(session):
+                session.add_all(rows)
+                session.flush()
+                replace_unmapped_index(session, cluster.id, snapshot.id, unmapped)
+                for install in installs:
+                    install.snapshot_id = snapshot.id
+                session.add_all(installs)
+            write(save)
+        else:
+            add_all(rows)
         logger.info(f"Snapshot saved for {cluster.name}")
 
         # 5. Run Compliance checks (if enabled)
@@ -364,6 +528,6 @@ def poll_cluster(
                 })
             from app.services.compliance import evaluate_cluster_compliance
             try:
-                evaluate_cluster_compliance(session, cluster, audit_rules, audit_bundles, run_timestamp=run_timestamp)
+                evaluate_cluster_compliance(session, cluster, audit_rules, audit_bundles, run_timestamp=run_timestamp, run_id=run_id)
             except Exception as e:
                 logger.error(f"Failed to run compliance for {cluster.name}: {e}")
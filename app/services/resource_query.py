@@ -0,0 +1,111 @@
+from typing import Any, List, Optional, Tuple
+
+# Upper bound of one page of a resource list
+MAX_RESOURCE_PAGE = 5000
+
+def get_path(item: Any, path: str) -> Any:
+    """Value at a dotted path ("metadata.labels.mapid"), None when any step is missing."""
+    value = item
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def parse_label_selector(selector: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Parses a Kubernetes equality-based selector ("env=prod,tier!=db,mapid,!legacy") into
+    (op, key, value) terms. Raises ValueError on malformed input.
+    """
+    terms = []
+    for raw in selector.split(","):
+        term = raw.strip()
+        if not term:
+            continue
+        if "!=" in term:
+            key, value = term.split("!=", 1)
+            op = "!="
+        elif "=" in term:
+            key, value = term.split("==", 1) if "==" in term else term.split("=", 1)
+            op = "="
+        elif term.startswith("!"):
+            key, value, op = term[1:], None, "!exists"
+        else:
+            key, value, op = term, None, "exists"
+        key = key.strip()
+        if not key:
+            raise ValueError(f"Invalid label selector term '{term}'")
+        terms.append((op, key, value.strip() if value is not None else None))
+    return terms
+
+def _matches_labels(item: dict, terms: list) -> bool:
+    labels = get_path(item, "metadata.labels") or {}
+    for op, key, value in terms:
+        if op == "=" and labels.get(key) != value:
+            return False
+        if op == "!=" and labels.get(key) == value:
+            return False
+        if op == "exists" and key not in labels:
+            return False
+        if op == "!exists" and key in labels:
+            return False
+    return True
+
+def _matches_text(item: dict, needle: str) -> bool:
+    labels = get_path(item, "metadata.labels")
+    values = [get_path(item, "metadata.name"), get_path(item, "metadata.namespace")]
+    values += list(labels.values()) if isinstance(labels, dict) else []
+    return any(needle in str(v).lower() for v in values if v is not None)
+
+def _sort_key(value: Any):
+    # Numbers before strings, so mixed columns never compare across types
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    return (1, str(value).lower())
+
+def project_fields(item: dict, fields: List[str]) -> dict:
+    """Copy of `item` holding only the given dotted paths (nested structure kept)."""
+    out = {}
+    for path in fields:
+        value = get_path(item, path)
+        if value is None:
+            continue
+        parts = path.split(".")
+        target = out
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return out
+
+def query_resources(
+    items: list,
+    q: Optional[str] = None,
+    label_terms: Optional[list] = None,
+    sort: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None
+) -> Tuple[list, int]:
+    """
+    Filters, sorts, pages and projects a resource list. `q` is a case-insensitive substring of
+    the name, namespace or a label value (what the UI's filter box searches); `sort` is a dotted path, "-" prefixed for descending (items without
+    the field go last either way). Returns the page and the number of matching items. The input
+    list is never modified.
+    """
+    if q:
+        needle = q.lower()
+        items = [i for i in items if _matches_text(i, needle)]
+    if label_terms:
+        items = [i for i in items if _matches_labels(i, label_terms)]
+    if sort:
+        path = sort.lstrip("-")
+        descending = sort.startswith("-")
+        present = [i for i in items if get_path(i, path) is not None]
+        missing = [i for i in items if get_path(i, path) is None]
+        items = sorted(present, key=lambda i: _sort_key(get_path(i, path)), reverse=descending) + missing
+
+    total = len(items)
+    page = items[offset:offset + limit] if limit is not None else items[offset:]
+    if fields:
+        page = [project_fields(i, fields) for i in page]
+    return page, total
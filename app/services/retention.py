@@ -0,0 +1,341 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam
+from sqlmodel import Session
+from app.database import engine
+from app.models import epoch_seconds
+from app.services.writer import write
+
+logger = logging.getLogger(__name__)
+
+# Defaults (overridable through AppConfig)
+DEFAULT_BATCH_SIZE = 200 # Snapshots deleted per transaction
+DEFAULT_BATCH_PAUSE_MS = 250 # Pause between batches so pollers/readers can grab the write lock
+
+CHILD_TABLES = ["licenseusage", "mapidlicenseusage", "compliancescore"]
+
+# A PollRun is kept while anything still references it: downsampling drops snapshots but
+# keeps the run's usage, compliance and change-log rows
+RUN_UNREFERENCED_SQL = " AND ".join(
+    f"NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.run_id = pollrun.id)"
+    for table in ["clustersnapshot", *CHILD_TABLES, "license_change_event"]
+)
+
+# Downsampling resolutions, coarsest last. Value is the prefix length of the stored
+# timestamp ("YYYY-MM-DD HH:MM:SS.ffffff") that identifies a bucket.
+RESOLUTIONS = {"raw": None, "hourly": 13, "daily": 10}
+
+# Tiers as "<age_days>:<resolution>" pairs, e.g. "7:hourly,30:daily" keeps everything for
+# 7 days, one snapshot per cluster per hour up to 30 days, then one per day until
+# SNAPSHOT_RETENTION_DAYS. Empty disables downsampling.
+DEFAULT_RETENTION_TIERS = ""
+
+# Daily MAPID rollups are tiny next to raw history and back year-long analytics views
+DEFAULT_ROLLUP_RETENTION_DAYS = 400
+
+def get_cleanup_settings(session: Session) -> dict:
+    """Reads batch size / throttle settings for retention cleanup."""
+    from app.models import AppConfig
+
+    batch_size = int((session.get(AppConfig, "SNAPSHOT_CLEANUP_BATCH_SIZE") or AppConfig(value=str(DEFAULT_BATCH_SIZE))).value)
+    pause_ms = int((session.get(AppConfig, "SNAPSHOT_CLEANUP_BATCH_PAUSE_MS") or AppConfig(value=str(DEFAULT_BATCH_PAUSE_MS))).value)
+    return {"batch_size": max(1, batch_size), "pause_ms": max(0, pause_ms)}
+
+def parse_retention_tiers(value: str) -> list:
+    """
+    Parses a tier spec ("7:hourly,30:daily") into [(age_days, resolution), ...] sorted by age.
+    Raises ValueError on malformed specs or resolutions that get finer with age.
+    """
+    tiers = []
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        age, _, resolution = part.partition(":")
+        resolution = resolution.strip().lower()
+        if resolution not in RESOLUTIONS or resolution == "raw":
+            raise ValueError(f"Unknown resolution '{resolution}' (expected hourly or daily)")
+        tiers.append((int(age), resolution))
+
+    tiers.sort()
+    order = list(RESOLUTIONS.keys())
+    for (age_a, res_a), (age_b, res_b) in zip(tiers, tiers[1:]):
+        if age_a == age_b or order.index(res_b) <= order.index(res_a):
+            raise ValueError("Each tier must be older and coarser than the previous one")
+    if tiers and tiers[0][0] < 1:
+        raise ValueError("Tier ages must be at least 1 day")
+    return tiers
+
+def get_retention_tiers(session: Session) -> list:
+    from app.models import AppConfig
+
+    value = (session.get(AppConfig, "SNAPSHOT_RETENTION_TIERS") or AppConfig(value=DEFAULT_RETENTION_TIERS)).value
+    try:
+        return parse_retention_tiers(value)
+    except ValueError as e:
+        logger.error(f"Invalid SNAPSHOT_RETENTION_TIERS '{value}': {e}")
+        return []
+
+def _bucket_floor(dt: datetime, resolution: str) -> datetime:
+    if resolution == "hourly":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _freelist_bytes(session: Session) -> int:
+    page_size = session.execute(text("PRAGMA page_size")).scalar() or 0
+    freelist = session.execute(text("PRAGMA freelist_count")).scalar() or 0
+    return page_size * freelist
+
+def _merge_counts(report: dict, counts: dict):
+    for key, value in counts.items():
+        report[key] += value
+
+def _delete_snapshot_ids(session: Session, ids: list, child_tables: list = CHILD_TABLES) -> dict:
+    """
+    Deletes a batch of snapshots and their operator installs, plus the rows of `child_tables`
+    (usage/compliance by default) of the same run and cluster. Returns the counts of the
+    batch (writer jobs may be replayed, so the caller merges them only once committed).
+    """
+    report = {"payload_bytes": 0, "operator_install": 0, "snapshots": 0, **{table: 0 for table in child_tables}}
+    # Payload size is computed by SQLite, the blobs never reach Python
+    size_stmt = text("""
+        SELECT COALESCE(SUM(COALESCE(length(data_json), 0) + COALESCE(length(service_mesh_json), 0) + COALESCE(length(argocd_json), 0)), 0)
+        FROM clustersnapshot WHERE id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    report["payload_bytes"] += session.execute(size_stmt, {"ids": ids}).scalar() or 0
+
+    for table in child_tables:
+        stmt = text(f"""
+            DELETE FROM {table}
+            WHERE run_id IS NOT NULL AND (run_id, cluster_id) IN (
+                SELECT run_id, cluster_id FROM clustersnapshot WHERE id IN :ids
+            )
+        """).bindparams(bindparam("ids", expanding=True))
+        report[table] += session.execute(stmt, {"ids": ids}).rowcount or 0
+
+    stmt = text("DELETE FROM operator_install WHERE snapshot_id IN :ids").bindparams(bindparam("ids", expanding=True))
+    report["operator_install"] += session.execute(stmt, {"ids": ids}).rowcount or 0
+
+    stmt = text("DELETE FROM clustersnapshot WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    report["snapshots"] += session.execute(stmt, {"ids": ids}).rowcount or 0
+    return report
+
+def delete_run_snapshots(session: Session, run_ids: list, cluster_id: int = None) -> dict:
+    """
+    Deletes the snapshots of the given runs (only one cluster's when `cluster_id` is set) with
+    everything keyed by them: usage, compliance and change-log rows and operator installs.
+    Runs nothing references any more are dropped, the rest get their totals refreshed, and
+    the MAPID rollup days of the deleted usage are rebuilt. Runs on the caller's session (no
+    commit). Returns the number of snapshots deleted and the clusters whose unmapped-resource
+    index pointed at one of them (rebuild_unmapped_index after the commit).
+    """
+    from app.services.poller import refresh_run_aggregates
+    from app.services.rollup import rebuild_mapid_rollup_days
+
+    if not run_ids:
+        return {"snapshots": 0, "reindex_cluster_ids": []}
+    scope = "run_id IN :ids" + (" AND cluster_id = :cid" if cluster_id is not None else "")
+    params = {"ids": list(run_ids), "cid": cluster_id}
+
+    def run(sql: str):
+        return session.execute(text(sql).bindparams(bindparam("ids", expanding=True)), params)
+
+    rollup_days = [day for day in run(f"SELECT DISTINCT ts_epoch / 86400 FROM mapidlicenseusage WHERE {scope}").scalars().all() if day is not None]
+    reindex_ids = run(f"SELECT DISTINCT cluster_id FROM unmapped_resource WHERE snapshot_id IN (SELECT id FROM clustersnapshot WHERE {scope})").scalars().all()
+
+    for table in [*CHILD_TABLES, "license_change_event"]:
+        run(f"DELETE FROM {table} WHERE {scope}")
+    run(f"DELETE FROM operator_install WHERE snapshot_id IN (SELECT id FROM clustersnapshot WHERE {scope})")
+    deleted = run(f"DELETE FROM clustersnapshot WHERE {scope}").rowcount or 0
+
+    for run_id in run_ids:
+        if session.execute(text("SELECT 1 FROM clustersnapshot WHERE run_id = :r LIMIT 1"), {"r": run_id}).first():
+            refresh_run_aggregates(session, run_id)
+        else:
+            session.execute(text(f"DELETE FROM pollrun WHERE id = :r AND {RUN_UNREFERENCED_SQL}"), {"r": run_id})
+
+    # Daily rollups of the affected days no longer match their raw rows
+    rebuild_mapid_rollup_days(session, rollup_days)
+    return {"snapshots": deleted, "reindex_cluster_ids": list(reindex_ids)}
+
+def purge_snapshots_before(cutoff: datetime, batch_size: int = DEFAULT_BATCH_SIZE, pause_ms: int = DEFAULT_BATCH_PAUSE_MS) -> dict:
+    """
+    Deletes everything older than `cutoff` in small batches, each its own writer job.
+    Only ids and lengths are selected, so snapshot blobs are never loaded. Each batch holds
+    the write lock briefly and the pause between batches lets pollers and readers interleave.
+    Returns a report of rows and bytes reclaimed.
+    """
+    start_time = time.time()
+    cutoff_str = cutoff.strftime("%Y-%m-%d %H:%M:%S") # PollRun.started_at
+    cutoff_epoch = epoch_seconds(cutoff) # Usage/compliance typed timestamps
+    cutoff_dt_str = cutoff.strftime("%Y-%m-%d %H:%M:%S.%f") # Snapshot datetime storage format
+
+    report = {
+        "snapshots": 0,
+        "licenseusage": 0,
+        "mapidlicenseusage": 0,
+        "compliancescore": 0,
+        "operator_install": 0,
+        "license_change_event": 0,
+        "pollrun": 0,
+        "batches": 0,
+        "payload_bytes": 0,
+        "freed_bytes": 0,
+        "duration_seconds": 0.0
+    }
+
+    with Session(engine) as session:
+        freelist_before = _freelist_bytes(session)
+
+    # 1. Snapshots (and their run-linked children), oldest first via the timestamp index
+    def snapshot_batch(session: Session) -> dict:
+        ids = session.execute(
+            text("SELECT id FROM clustersnapshot WHERE timestamp < :cutoff ORDER BY timestamp LIMIT :n"),
+            {"cutoff": cutoff_dt_str, "n": batch_size}
+        ).scalars().all()
+        return _delete_snapshot_ids(session, ids) if ids else None
+
+    while True:
+        counts = write(snapshot_batch)
+        if counts is None:
+            break
+        _merge_counts(report, counts)
+        report["batches"] += 1
+        if pause_ms:
+            time.sleep(pause_ms / 1000.0)
+
+    # 2. Orphaned children (live dashboard rows, legacy rows without run_id)
+    def aged_batch(table: str):
+        stmt = text(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE ts_epoch < :cutoff LIMIT :n)")
+        return lambda session: session.execute(stmt, {"cutoff": cutoff_epoch, "n": batch_size}).rowcount or 0
+
+    for table in CHILD_TABLES:
+        while True:
+            deleted = write(aged_batch(table))
+            report[table] += deleted
+            if deleted < batch_size:
+                break
+            report["batches"] += 1
+            if pause_ms:
+                time.sleep(pause_ms / 1000.0)
+
+    # 2b. License change log. Kept through downsampling (a change stays a change), aged out here.
+    while True:
+        deleted = write(aged_batch("license_change_event"))
+        report["license_change_event"] += deleted
+        if deleted < batch_size:
+            break
+        report["batches"] += 1
+        if pause_ms:
+            time.sleep(pause_ms / 1000.0)
+
+    # 3. Runs that no longer own any snapshot, usage, compliance or change-log row
+    report["pollrun"] = write(lambda session: session.execute(text(f"""
+        DELETE FROM pollrun
+        WHERE started_at < :cutoff AND finished_at IS NOT NULL
+          AND {RUN_UNREFERENCED_SQL}
+    """), {"cutoff": cutoff_str}).rowcount or 0)
+
+    with Session(engine) as session:
+        report["freed_bytes"] = max(0, _freelist_bytes(session) - freelist_before)
+
+    report["duration_seconds"] = round(time.time() - start_time, 2)
+    return report
+
+def purge_rollup_before(cutoff: datetime) -> int:
+    """Drops MAPID daily rollup rows of days entirely before `cutoff` (kept longer than raw usage)."""
+    day = epoch_seconds(cutoff) // 86400
+    return write(lambda session: session.execute(text("DELETE FROM mapid_daily_rollup WHERE day < :day"), {"day": day}).rowcount or 0)
+
+def downsample_snapshots(tiers: list, now: datetime = None, batch_size: int = DEFAULT_BATCH_SIZE, pause_ms: int = DEFAULT_BATCH_PAUSE_MS) -> dict:
+    """
+    Thins snapshots older than each tier's age down to one per cluster per bucket.
+    Survivor selection is deterministic: the last successful snapshot of the bucket (latest
+    timestamp, then highest id), falling back to the last snapshot of any status. Because the
+    latest of a day is also the latest of its last hour, re-running or coarsening an already
+    downsampled range picks the same survivors. Tier boundaries are aligned to whole buckets,
+    so partially elapsed hours/days are never thinned. Survivors are tagged with their
+    resolution. Only snapshots (payloads) are thinned: usage and compliance rows of the
+    dropped polls are kept, so daily max/avg analytics still see every poll, and so are
+    their runs. They age out with purge_snapshots_before like everything else.
+    """
+    start_time = time.time()
+    now = now or datetime.utcnow()
+
+    report = {
+        "snapshots": 0,
+        "operator_install": 0,
+        "pollrun": 0,
+        "batches": 0,
+        "payload_bytes": 0,
+        "duration_seconds": 0.0
+    }
+    touched_runs = set()
+
+    for i, (age_days, resolution) in enumerate(tiers):
+        key_len = RESOLUTIONS[resolution]
+        upper = _bucket_floor(now - timedelta(days=age_days), resolution)
+        # The next (coarser) tier owns everything older than its own boundary
+        lower = None
+        if i + 1 < len(tiers):
+            next_age, next_resolution = tiers[i + 1]
+            lower = _bucket_floor(now - timedelta(days=next_age), next_resolution)
+
+        window = "timestamp < :upper" + (" AND timestamp >= :lower" if lower else "")
+        params = {"upper": upper.strftime("%Y-%m-%d %H:%M:%S.%f")}
+        if lower:
+            params["lower"] = lower.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+        # Ids only; the whole doomed set of the window fits comfortably in memory
+        with Session(engine) as session:
+            doomed = session.execute(text(f"""
+                SELECT id, run_id FROM (
+                    SELECT id, run_id, ROW_NUMBER() OVER (
+                        PARTITION BY cluster_id, substr(timestamp, 1, {key_len})
+                        ORDER BY (status = 'Success') DESC, timestamp DESC, id DESC
+                    ) AS rn
+                    FROM clustersnapshot
+                    WHERE {window}
+                ) WHERE rn > 1
+            """), params).all()
+
+        for start in range(0, len(doomed), batch_size):
+            chunk = doomed[start:start + batch_size]
+            ids = [row.id for row in chunk]
+            _merge_counts(report, write(lambda session: _delete_snapshot_ids(session, ids, child_tables=[])))
+            touched_runs.update(row.run_id for row in chunk if row.run_id is not None)
+            report["batches"] += 1
+            if pause_ms:
+                time.sleep(pause_ms / 1000.0)
+
+        write(lambda session: session.execute(
+            text(f"UPDATE clustersnapshot SET resolution = :res WHERE {window} AND resolution != :res"),
+            {**params, "res": resolution}
+        ))
+
+    # Runs that lost snapshots: refresh totals of those that still have some. Runs left without
+    # snapshots keep their totals and stay while their usage rows reference them; only runs
+    # nothing references any more are dropped.
+    if touched_runs:
+        from app.services.poller import refresh_run_aggregates
+
+        def settle_runs(session: Session, run_ids: list) -> int:
+            dropped = 0
+            for run_id in run_ids:
+                remaining = session.execute(text("SELECT COUNT(*) FROM clustersnapshot WHERE run_id = :r"), {"r": run_id}).scalar()
+                if remaining:
+                    refresh_run_aggregates(session, run_id)
+                else:
+                    dropped += session.execute(
+                        text(f"DELETE FROM pollrun WHERE id = :r AND {RUN_UNREFERENCED_SQL}"), {"r": run_id}
+                    ).rowcount or 0
+            return dropped
+
+        touched = sorted(touched_runs)
+        for start in range(0, len(touched), batch_size):
+            chunk = touched[start:start + batch_size]
+            report["pollrun"] += write(lambda session: settle_runs(session, chunk))
+
+    report["duration_seconds"] = round(time.time() - start_time, 2)
+    return report
@@ -0,0 +1,78 @@
+import logging
+import time
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlmodel import Session
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Days re-aggregated per transaction by a full rebuild
+REBUILD_DAYS_PER_BATCH = 30
+
+# Day totals from the raw rows, joined back to each group's latest row for the "last" columns
+MAPID_ROLLUP_REBUILD_SQL = """
+    INSERT OR REPLACE INTO mapid_daily_rollup (
+        cluster_id, day, mapid, lob, samples, max_licenses, sum_licenses, max_nodes, sum_nodes,
+        max_vcpu, sum_vcpu, last_ts_epoch, last_licenses, last_nodes, last_vcpu
+    )
+    SELECT g.cluster_id, g.day, g.mapid, l.lob, g.samples, g.max_licenses, g.sum_licenses, g.max_nodes, g.sum_nodes,
+           g.max_vcpu, g.sum_vcpu, g.last_ts_epoch, l.license_count, l.node_count, l.total_vcpu
+    FROM (
+        SELECT cluster_id, ts_epoch / 86400 AS day, mapid, COUNT(*) AS samples,
+               MAX(license_count) AS max_licenses, SUM(license_count) AS sum_licenses,
+               MAX(node_count) AS max_nodes, SUM(node_count) AS sum_nodes,
+               MAX(total_vcpu) AS max_vcpu, SUM(total_vcpu) AS sum_vcpu,
+               MAX(ts_epoch) AS last_ts_epoch
+        FROM mapidlicenseusage
+        WHERE ts_epoch >= :lo AND ts_epoch < :hi
+        GROUP BY cluster_id, day, mapid
+    ) g
+    JOIN mapidlicenseusage l
+      ON l.cluster_id = g.cluster_id AND l.mapid = g.mapid AND l.ts_epoch = g.last_ts_epoch
+"""
+
+# Initial build only: fills days that have no rollup rows yet, never overwrites
+MAPID_ROLLUP_FILL_SQL = MAPID_ROLLUP_REBUILD_SQL.replace("INSERT OR REPLACE", "INSERT OR IGNORE", 1)
+
+def rebuild_mapid_rollup_days(session: Session, days: Iterable[int]) -> int:
+    """
+    Recomputes the rollup rows of the given UTC days from raw MapidLicenseUsage, e.g. after
+    raw rows of those days were deleted. Downsampling keeps every usage row, so the raw rows
+    are complete for any day that still has them. Runs on the caller's session (no commit).
+    """
+    rebuilt = 0
+    for day in sorted(set(days)):
+        session.execute(text("DELETE FROM mapid_daily_rollup WHERE day = :day"), {"day": day})
+        res = session.execute(text(MAPID_ROLLUP_REBUILD_SQL), {"lo": day * 86400, "hi": (day + 1) * 86400})
+        rebuilt += res.rowcount or 0
+    return rebuilt
+
+def rebuild_mapid_rollup(since_day: Optional[int] = None) -> dict:
+    """
+    Rebuilds the whole rollup (or the days from `since_day` on) from raw history, a batch of
+    days per transaction. Days with no raw rows left (older than the usage retention) keep
+    their rollup rows.
+    """
+    start_time = time.time()
+    with Session(engine) as session:
+        lo, hi = session.execute(text("SELECT MIN(ts_epoch) / 86400, MAX(ts_epoch) / 86400 FROM mapidlicenseusage")).one()
+
+    report = {"days": 0, "rows": 0, "duration_seconds": 0.0}
+    if lo is not None:
+        day = max(lo, since_day or lo)
+        while day <= hi:
+            batch = range(day, min(day + REBUILD_DAYS_PER_BATCH, hi + 1))
+            with Session(engine) as session:
+                raw_days = session.execute(
+                    text("SELECT DISTINCT ts_epoch / 86400 FROM mapidlicenseusage WHERE ts_epoch >= :lo AND ts_epoch < :hi"),
+                    {"lo": batch.start * 86400, "hi": batch.stop * 86400}
+                ).scalars().all()
+                report["rows"] += rebuild_mapid_rollup_days(session, raw_days)
+                session.commit()
+            report["days"] += len(raw_days)
+            day = batch.stop
+
+    report["duration_seconds"] = round(time.time() - start_time, 2)
+    logger.info(f"MAPID rollup rebuilt: {report['rows']} rows over {report['days']} days ({report['duration_seconds']}s).")
+    return report
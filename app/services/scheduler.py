@@ -11,7 +11,7 @@ scheduler = BackgroundScheduler()
 
 def get_scheduler_settings():
     """Reads scheduler settings from DB."""
-    settings = {"interval": 15, "enable_vacuum": True}
+    settings = {"interval": 15, "enable_vacuum": True, "incremental_vacuum_interval": 60}
     try:
         with Session(engine) as session:
             # Interval
@@ -21,6 +21,10 @@ def get_scheduler_settings():
             # Vacuum
             c_vac = session.get(AppConfig, "ENABLE_DB_VACUUM")
             if c_vac: settings["enable_vacuum"] = (c_vac.value.lower() == 'true')
+
+            # Incremental space reclamation
+            c_inc = session.get(AppConfig, "DB_INCREMENTAL_VACUUM_INTERVAL_MINUTES")
+            if c_inc: settings["incremental_vacuum_interval"] = int(c_inc.value)
     except Exception as e:
         logger.error(f"Error reading settings: {e}")
     
@@ -40,9 +44,10 @@ def start_scheduler():
         replace_existing=True
     )
     
-    # Add Maintenance Job
-    from app.services.maintenance import run_vacuum_task
+    # Add Maintenance Jobs
+    from app.services.maintenance import run_vacuum_task, run_incremental_vacuum_task, run_wal_checkpoint
     if settings['enable_vacuum']:
+        # Weekly: incremental reclaim, or the one-time conversion VACUUM for legacy databases
         scheduler.add_job(
             run_vacuum_task,
             'cron',
@@ -52,7 +57,45 @@ def start_scheduler():
             id='db_vacuum',
             replace_existing=True
         )
+        # Small slices between polls (skipped while a poll is running)
+        scheduler.add_job(
+            run_incremental_vacuum_task,
+            'interval',
+            minutes=settings['incremental_vacuum_interval'],
+            id='db_incremental_vacuum',
+            replace_existing=True
+        )
+
+    # Keep the WAL file from growing unbounded
+    scheduler.add_job(
+        run_wal_checkpoint,
+        'interval',
+        minutes=10,
+        id='db_wal_checkpoint',
+        replace_existing=True
+    )
     
+    # One-off: change log and MAPID usage for history polled before the poller recorded them (resumable)
+    from app.services.change_log import backfill_change_events
+    from app.services.mapid_backfill import backfill_mapid_usage
+    scheduler.add_job(
+        backfill_change_events,
+        id='license_change_backfill',
+        replace_existing=True
+    )
+    scheduler.add_job(
+        backfill_mapid_usage,
+        id='mapid_usage_backfill',
+        replace_existing=True
+    )
+    # One-off: unmapped-resource index for databases polled before the poller maintained it
+    from app.services.unmapped import ensure_unmapped_index
+    scheduler.add_job(
+        ensure_unmapped_index,
+        id='unmapped_index_build',
+        replace_existing=True
+    )
+
     if not scheduler.running:
         scheduler.start()
 
@@ -68,14 +111,21 @@ def refresh_jobs():
         # 2. Update Vacuum
         # Check if job exists
         job = scheduler.get_job('db_vacuum')
-        from app.services.maintenance import run_vacuum_task
+        inc_job = scheduler.get_job('db_incremental_vacuum')
+        from app.services.maintenance import run_vacuum_task, run_incremental_vacuum_task
         
         if settings['enable_vacuum']:
             if not job:
                 scheduler.add_job(run_vacuum_task, 'cron', day_of_week='sun', hour=0, minute=0, id='db_vacuum')
+            if not inc_job:
+                scheduler.add_job(run_incremental_vacuum_task, 'interval', minutes=settings['incremental_vacuum_interval'], id='db_incremental_vacuum')
+            else:
+                scheduler.reschedule_job('db_incremental_vacuum', trigger='interval', minutes=settings['incremental_vacuum_interval'])
         else:
             if job:
                 scheduler.remove_job('db_vacuum')
+            if inc_job:
+                scheduler.remove_job('db_incremental_vacuum')
                 
     except Exception as e:
          logger.error(f"Failed to refresh jobs: {e}")
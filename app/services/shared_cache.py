@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+def _default_path() -> str:
+    """Next to the main database file: database_v13.db -> database_v13.cache.db."""
+    if DATABASE_URL.startswith("sqlite:///") and DATABASE_URL != "sqlite:///:memory:":
+        root, _ = os.path.splitext(DATABASE_URL[len("sqlite:///"):])
+        return root + ".cache.db"
+    return "shared_cache.db"
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH") or _default_path()
+
+# Progress events are only replayed to live subscribers; older ones are dropped on purge
+EVENT_RETENTION_SECONDS = 3600
+PURGE_EVERY_WRITES = 500
+
+class SharedCache:
+    """
+    Key/value store shared by every worker process on the host, backed by its own SQLite file
+    (WAL, no external service). Values are JSON. Besides plain entries with an optional TTL it
+    offers atomic leases (`add`), counters and an append-only event channel, which is what the
+    dashboard cache, the live usage store and the poll manager need to stay coherent across
+    `uvicorn --workers N`.
+
+    It is a cache: the file may be deleted at any time and is rebuilt on demand.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def reopen(self, path: str):
+        """Points the cache at another file (tests); every thread reconnects on its next call."""
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF") # Losing the last writes on power loss is fine for a cache
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entry (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS cache_counter (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS cache_event (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_cache_event_channel_seq ON cache_event (channel, seq);
+            """)
+            self._local.conn = conn
+        return conn
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            self.purge()
+
+    # --- Entries ---
+
+    def get_with_time(self, key: str) -> Tuple[Any, Optional[float]]:
+        """Returns (value, updated_at); (None, None) when absent or expired."""
+        row = self._conn().execute(
+            "SELECT value, updated_at FROM cache_entry WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def get(self, key: str, default=None) -> Any:
+        value, updated_at = self.get_with_time(key)
+        return default if updated_at is None else value
+
+    def updated_at(self, key: str) -> Optional[float]:
+        """Cheap freshness check: lets a process reuse its parsed copy until another one writes."""
+        row = self._conn().execute(
+            "SELECT updated_at FROM cache_entry WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        for i in range(0, len(keys), 500): # Stay under SQLite's host-parameter limit
+            chunk = keys[i:i + 500]
+            rows = self._conn().execute(
+                f"SELECT key, value FROM cache_entry WHERE key IN ({','.join('?' * len(chunk))}) AND (expires_at IS NULL OR expires_at > ?)",
+                (*chunk, now)
+            ).fetchall()
+            found.update({key: json.loads(value) for key, value in rows})
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> float:
+        """Stores `value`, returning its updated_at stamp."""
+        return self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> Optional[float]:
+        if not items:
+            return None
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+            [(key, json.dumps(value, default=str), expires_at, now) for key, value in items.items()]
+        )
+        self._wrote()
+        return now
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        """Stores `value` only if `key` is absent or expired. Atomic across processes (a lease)."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache_entry WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache_entry (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + ttl, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    # --- Counters ---
+
+    def incr(self, name: str) -> int:
+        return self._conn().execute(
+            "INSERT INTO cache_counter (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value",
+            (name,)
+        ).fetchone()[0]
+
+    def counter(self, name: str) -> int:
+        row = self._conn().execute("SELECT value FROM cache_counter WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    # --- Event channel ---
+
+    def publish(self, channel: str, payload: Any) -> int:
+        seq = self._conn().execute(
+            "INSERT INTO cache_event (channel, payload, created_at) VALUES (?, ?, ?)",
+            (channel, json.dumps(payload, default=str), time.time())
+        ).lastrowid
+        self._wrote()
+        return seq
+
+    def last_seq(self, channel: str) -> int:
+        row = self._conn().execute("SELECT MAX(seq) FROM cache_event WHERE channel = ?", (channel,)).fetchone()
+        return row[0] or 0
+
+    def events_since(self, channel: str, seq: int) -> List[Tuple[int, Any]]:
+        rows = self._conn().execute(
+            "SELECT seq, payload FROM cache_event WHERE channel = ? AND seq > ? ORDER BY seq", (channel, seq)
+        ).fetchall()
+        return [(s, json.loads(p)) for s, p in rows]
+
+    def purge(self):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM cache_event WHERE created_at < ?", (now - EVENT_RETENTION_SECONDS,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache purge failed: {e}")
+
+shared_cache = SharedCache(SHARED_CACHE_PATH)
@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import defer
+from sqlmodel import Session, select
+
+logger = logging.getLogger(__name__)
+
+# A poll run touches every cluster over several minutes, so a time-travel target resolves to
+# the latest successful snapshot up to this many seconds AFTER the requested time. One policy
+# for every endpoint (summary, details, resources, operator matrix).
+SNAPSHOT_GRACE_SECONDS = 600
+
+def as_of_cutoff(target_time: Optional[datetime]) -> Optional[str]:
+    """Upper timestamp bound for `target_time`, in the stored "%Y-%m-%d %H:%M:%S.%f" format."""
+    if target_time is None:
+        return None
+    return (target_time + timedelta(seconds=SNAPSHOT_GRACE_SECONDS)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _as_of_statement(template: str, target_time: Optional[datetime], cluster_ids: Optional[List[int]]):
+    """
+    Fills `{best_id}` in a "SELECT ... FROM cluster c ..." template with the correlated lookup
+    of the cluster's best snapshot id, and binds the cutoff / cluster filter.
+    """
+    cutoff = as_of_cutoff(target_time)
+    best_id = f"""(SELECT s.id FROM clustersnapshot s
+                WHERE s.cluster_id = c.id AND s.status = 'Success'
+                {"AND s.timestamp <= :cutoff" if cutoff else ""}
+                ORDER BY s.timestamp DESC, s.id DESC
+                LIMIT 1)"""
+    sql = template.format(best_id=best_id)
+    if cluster_ids is not None:
+        sql += " WHERE c.id IN :cluster_ids"
+    stmt = text(sql)
+    params = {}
+    if cutoff:
+        params["cutoff"] = cutoff
+    if cluster_ids is not None:
+        stmt = stmt.bindparams(bindparam("cluster_ids", expanding=True))
+        params["cluster_ids"] = list(cluster_ids)
+    return stmt, params
+
+def resolve_snapshot_ids(session: Session, target_time: Optional[datetime] = None, cluster_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """
+    Returns {cluster_id: snapshot_id} of the best successful snapshot per cluster as of
+    `target_time` (latest when None), in one statement. Best = newest timestamp within the
+    grace window, ties broken by highest id. Clusters without a match are absent.
+
+    Implemented as a correlated LIMIT 1 lookup per cluster row rather than a window over all
+    snapshots: each lookup is a short reverse walk of the (cluster_id, ...) index, so the cost
+    stays proportional to the cluster count instead of the retained history.
+    """
+    if cluster_ids is not None and not cluster_ids:
+        return {}
+    stmt, params = _as_of_statement("SELECT c.id AS cluster_id, {best_id} AS snapshot_id FROM cluster c", target_time, cluster_ids)
+    rows = session.execute(stmt, params).all()
+    return {cluster_id: snapshot_id for cluster_id, snapshot_id in rows if snapshot_id is not None}
+
+# Scalar columns served by load_snapshot_facts (never the JSON blobs)
+FACT_COLUMNS = [
+    "id", "cluster_id", "timestamp", "captured_name", "captured_unique_id",
+    "node_count", "vcpu_count", "license_count", "licensed_node_count", "licensed_vcpu_count",
+    "current_version", "desired_version", "upgrade_percentage", "upgrade_message",
+    "degraded_operator_count", "console_url", "has_service_mesh", "has_argocd", "license_rules_hash"
+]
+
+def load_snapshot_facts(session: Session, target_time: Optional[datetime] = None, cluster_ids: Optional[List[int]] = None) -> dict:
+    """
+    Returns {cluster_id: row} with the metric and health-fact columns of each cluster's as-of
+    snapshot, in one indexed statement and without touching data_json. Rows whose
+    current_version is NULL predate fact extraction; callers fall back to the payload for those.
+    """
+    if cluster_ids is not None and not cluster_ids:
+        return {}
+    columns = ", ".join(f"s.{col}" for col in FACT_COLUMNS)
+    stmt, params = _as_of_statement(
+        f"SELECT {columns} FROM cluster c JOIN clustersnapshot s ON s.id = {{best_id}}", target_time, cluster_ids
+    )
+    return {row.cluster_id: row for row in session.execute(stmt, params).all()}
+
+def load_snapshots_as_of(session: Session, target_time: Optional[datetime] = None, cluster_ids: Optional[List[int]] = None) -> Dict[int, "ClusterSnapshot"]:
+    """
+    Resolves and loads the as-of snapshot of every (or the given) cluster: one statement to
+    pick the ids, one to fetch the rows. The JSON blobs are deferred (each loads on first
+    access), so the fleet's payloads are never fetched in one result set; callers that read
+    payloads should use iter_snapshots_as_of. Cold-archived snapshots come back rehydrated.
+    """
+    from app.models import ClusterSnapshot
+    from app.services.archive import BLOB_COLUMNS, rehydrate_snapshot
+
+    ids = resolve_snapshot_ids(session, target_time, cluster_ids)
+    if not ids:
+        return {}
+    stmt = select(ClusterSnapshot).where(ClusterSnapshot.id.in_(list(ids.values()))).options(
+        *(defer(getattr(ClusterSnapshot, col)) for col in BLOB_COLUMNS)
+    )
+    return {snap.cluster_id: rehydrate_snapshot(session, snap) for snap in session.exec(stmt).all()}
+
+def iter_snapshots_as_of(session: Session, target_time: Optional[datetime] = None, cluster_ids: Optional[List[int]] = None) -> Iterator[Tuple[int, "ClusterSnapshot"]]:
+    """
+    Yields (cluster_id, snapshot) for the as-of snapshot of every (or the given) cluster, one
+    full row at a time: each snapshot is loaded (rehydrated when archived) just before it is
+    yielded and expunged once the caller moves on, so only one payload is held at once.
+    """
+    from app.models import ClusterSnapshot
+    from app.services.archive import rehydrate_snapshot
+
+    for cluster_id, snapshot_id in resolve_snapshot_ids(session, target_time, cluster_ids).items():
+        snap = rehydrate_snapshot(session, session.get(ClusterSnapshot, snapshot_id))
+        if snap is None:
+            continue
+        yield cluster_id, snap
+        if snap in session:
+            session.expunge(snap)
+
+# A time-travel target this far behind the grace window can no longer gain snapshots (no poll
+# run lasts that long), so responses for it are final unless snapshots get deleted
+SNAPSHOT_SETTLED_SECONDS = 3600
+
+def parse_snapshot_time(value: Optional[str]) -> Optional[datetime]:
+    """Parses a `snapshot_time` query value ("T" or space separated, optional "Z" / fraction). None if invalid."""
+    if not value:
+        return None
+    clean_ts = value.replace("T", " ").replace("Z", "").split(".")[0]
+    try:
+        return datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+def snapshot_validator(session: Session, snapshot_time: Optional[str], cluster_ids: Optional[List[int]] = None):
+    """
+    (parts, immutable) identifying what an as-of response reads: each cluster's resolved
+    snapshot id plus the cluster attributes responses echo, in one indexed statement. None for
+    live (or unparseable) requests. `immutable` once the target time has settled.
+    """
+    target_time = parse_snapshot_time(snapshot_time)
+    if target_time is None:
+        return None
+    stmt, params = _as_of_statement(
+        "SELECT c.id, c.name, c.api_url, c.environment, c.datacenter, {best_id} AS snapshot_id FROM cluster c",
+        target_time, cluster_ids
+    )
+    parts = sorted(tuple(row) for row in session.execute(stmt, params).all())
+    settled = target_time + timedelta(seconds=SNAPSHOT_GRACE_SECONDS + SNAPSHOT_SETTLED_SECONDS) < datetime.utcnow()
+    return parts, settled
+
+# Budget for decoded snapshot payloads (estimated Python object size, per worker)
+PARSED_SNAPSHOT_CACHE_MB = int(os.getenv("PARSED_SNAPSHOT_CACHE_MB", "128"))
+# Decoded dicts/lists/strs take several times the bytes of their JSON text (measured 4.9-5.8x
+# on node/project payloads); entries are charged JSON length times this factor
+PARSED_SNAPSHOT_EXPANSION = float(os.getenv("PARSED_SNAPSHOT_EXPANSION", "6"))
+
+class ParsedSnapshotCache:
+    """
+    Per-process LRU of decoded snapshot payloads. Snapshots are immutable once written, so an
+    entry never needs invalidation; the key carries the timestamp as well as the id so a reused
+    rowid (after deleting the newest run) can never serve another snapshot's payload.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # (snapshot_id, timestamp) -> (size, payload)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, payload: dict, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (size, payload)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None
+        }
+
+parsed_snapshots = ParsedSnapshotCache(PARSED_SNAPSHOT_CACHE_MB * 1024 * 1024)
+
+def load_snapshot_payload(session: Session, cluster_id: int, target_time: Optional[datetime] = None) -> Optional[dict]:
+    """
+    Decoded payload of the cluster's as-of snapshot: data_json with the service_mesh / argocd
+    blobs merged in. Repeat drill-downs on the same snapshot skip both the blob read and the
+    JSON decode. The returned dict is shared between callers and must be treated as read-only.
+    Returns None when there is no snapshot or it has no data.
+    """
+    from app.models import ClusterSnapshot
+    from app.services.archive import rehydrate_snapshot
+
+    stmt, params = _as_of_statement(
+        "SELECT s.id, s.timestamp FROM cluster c JOIN clustersnapshot s ON s.id = {best_id}", target_time, [cluster_id]
+    )
+    row = session.execute(stmt, params).first()
+    if row is None:
+        return None
+    key = (row[0], str(row[1]))
+    payload = parsed_snapshots.get(key)
+    if payload is not None:
+        return payload
+
+    snap = rehydrate_snapshot(session, session.get(ClusterSnapshot, row[0]))
+    if not snap or not snap.data_json:
+        return None
+    payload = json.loads(snap.data_json)
+    size = len(snap.data_json)
+    for field, blob in (("service_mesh", snap.service_mesh_json), ("argocd", snap.argocd_json)):
+        if blob:
+            try:
+                payload[field] = json.loads(blob)
+                size += len(blob)
+            except Exception:
+                pass
+    parsed_snapshots.put(key, payload, int(size * PARSED_SNAPSHOT_EXPANSION))
+    return payload
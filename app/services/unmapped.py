@@ -0,0 +1,132 @@
+import json
+import logging
+import re
+from typing import Iterable, List, Optional
+from sqlalchemy import text
+from sqlmodel import Session, select
+from app.database import engine
+from app.models import AppConfig, Cluster, ClusterSnapshot, LicenseRule, NamespaceExclusionRule, UnmappedResource, epoch_seconds
+from app.services.license import calculate_licenses
+from app.services.writer import write
+
+logger = logging.getLogger(__name__)
+
+# AppConfig: set once the index was built from the snapshots polled before it existed
+UNMAPPED_INDEX_BUILT_KEY = "UNMAPPED_INDEX_BUILT"
+
+def compile_namespace_rules(rules: Iterable[NamespaceExclusionRule]) -> List[re.Pattern]:
+    """Compiles the active exclusion patterns once; invalid regexes are logged and skipped."""
+    patterns = []
+    for rule in rules:
+        if not rule.is_active:
+            continue
+        try:
+            patterns.append(re.compile(rule.match_pattern))
+        except re.error as e:
+            logger.warning(f"Skipping namespace exclusion rule '{rule.name}' (bad pattern {rule.match_pattern!r}): {e}")
+    return patterns
+
+def load_namespace_patterns(session: Session) -> List[re.Pattern]:
+    return compile_namespace_rules(session.exec(select(NamespaceExclusionRule).where(NamespaceExclusionRule.is_active == True)).all())
+
+def is_excluded(name: str, patterns: List[re.Pattern]) -> bool:
+    return any(p.search(name) for p in patterns)
+
+def _missing_mapid(obj: dict) -> bool:
+    labels = (obj.get("metadata") or {}).get("labels") or {}
+    return labels.get("mapid", "Unmapped") in ("Unmapped", "")
+
+def find_unmapped(cluster_id: int, ts_epoch: int, nodes: list, projects: list, lic_details: list, patterns: List[re.Pattern]) -> List[UnmappedResource]:
+    """
+    Index rows for one poll: licensed (INCLUDED) nodes and projects without a MAPID label.
+    Every unmapped project is kept, flagged `excluded` when a namespace rule matches, so rule
+    changes only flip flags instead of re-reading snapshots.
+    """
+    by_name = {n.get("metadata", {}).get("name"): n for n in nodes}
+    rows = []
+    for detail in lic_details:
+        node = by_name.get(detail["name"]) if detail.get("status") == "INCLUDED" else None
+        if node is not None and _missing_mapid(node):
+            rows.append(UnmappedResource(cluster_id=cluster_id, ts_epoch=ts_epoch, kind="Node", name=detail["name"]))
+    for project in projects:
+        name = project.get("metadata", {}).get("name")
+        if name and _missing_mapid(project):
+            rows.append(UnmappedResource(cluster_id=cluster_id, ts_epoch=ts_epoch, kind="Project", name=name,
+                                         excluded=is_excluded(name, patterns)))
+    return rows
+
+def replace_unmapped_index(session: Session, cluster_id: int, snapshot_id: Optional[int], rows: List[UnmappedResource]):
+    """Swaps the cluster's index rows for those of `snapshot_id` (caller's transaction, no commit)."""
+    session.execute(text("DELETE FROM unmapped_resource WHERE cluster_id = :cid"), {"cid": cluster_id})
+    for row in rows:
+        row.snapshot_id = snapshot_id
+    session.add_all(rows)
+
+def refresh_namespace_exclusions() -> int:
+    """
+    Re-applies the committed namespace rules to the indexed projects: one set-based UPDATE
+    through the writer, matching names with the compiled patterns through a SQL function.
+    Called by the rule endpoints after they commit; returns the number of flags that changed.
+    """
+    def job(session: Session) -> int:
+        patterns = load_namespace_patterns(session)
+        dbapi_conn = session.connection().connection.driver_connection
+        dbapi_conn.create_function("ns_excluded", 1, lambda name: int(is_excluded(name or "", patterns)), deterministic=True)
+        return session.execute(text(
+            "UPDATE unmapped_resource SET excluded = ns_excluded(name) "
+            "WHERE kind = 'Project' AND excluded IS NOT ns_excluded(name)"
+        )).rowcount
+    return write(job)
+
+def unmapped_from_snapshot(session: Session, snapshot: ClusterSnapshot, rules: list, default_include: bool, patterns: List[re.Pattern]) -> Optional[List[UnmappedResource]]:
+    """Index rows for a stored snapshot (archived payloads are rehydrated). None if it has no data."""
+    from app.services.archive import rehydrate_snapshot
+
+    snap = rehydrate_snapshot(session, snapshot)
+    if not snap or not snap.data_json:
+        return None
+    data = json.loads(snap.data_json)
+    nodes = data.get("nodes", [])
+    lic_data = calculate_licenses(nodes, rules, default_include)
+    return find_unmapped(snap.cluster_id, epoch_seconds(str(snap.timestamp)), nodes, data.get("projects", []), lic_data["details"], patterns)
+
+def rebuild_unmapped_index(cluster_ids: Optional[List[int]] = None) -> dict:
+    """
+    Rebuilds the index from each cluster's latest successful snapshot (all clusters when
+    `cluster_ids` is None): one payload parse per cluster, written per cluster through the writer.
+    """
+    from app.services.snapshots import resolve_snapshot_ids
+
+    report = {"clusters": 0, "rows": 0, "failed": 0}
+    with Session(engine) as session:
+        rules = session.exec(select(LicenseRule).where(LicenseRule.is_active == True).order_by(LicenseRule.order, LicenseRule.id)).all()
+        default_include = (session.get(AppConfig, "LICENSE_DEFAULT_INCLUDE") or AppConfig(value="False")).value.lower() == "true"
+        patterns = load_namespace_patterns(session)
+        if cluster_ids is None:
+            cluster_ids = session.exec(select(Cluster.id)).all()
+        latest_ids = resolve_snapshot_ids(session, None, cluster_ids)
+
+    for cid in cluster_ids:
+        snapshot_id = latest_ids.get(cid)
+        try:
+            rows = []
+            if snapshot_id is not None:
+                with Session(engine) as session:
+                    rows = unmapped_from_snapshot(session, session.get(ClusterSnapshot, snapshot_id), rules, default_include, patterns) or []
+            write(lambda s, cid=cid, sid=snapshot_id, rows=rows: replace_unmapped_index(s, cid, sid, rows))
+            report["clusters"] += 1
+            report["rows"] += len(rows)
+        except Exception as e:
+            report["failed"] += 1
+            logger.error(f"Error indexing unmapped resources of cluster {cid}: {e}")
+    return report
+
+def ensure_unmapped_index() -> dict:
+    """One-off: builds the index for databases polled before it existed."""
+    with Session(engine) as session:
+        if session.get(AppConfig, UNMAPPED_INDEX_BUILT_KEY):
+            return {"status": "skipped"}
+    report = rebuild_unmapped_index()
+    write(lambda s: s.merge(AppConfig(key=UNMAPPED_INDEX_BUILT_KEY, value="True")))
+    logger.info(f"Unmapped resource index built: {report['rows']} rows across {report['clusters']} clusters.")
+    return report
@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from sqlalchemy import event, inspect
+from sqlmodel import Session
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of jobs grouped into one transaction
+DEFAULT_BATCH_MAX = 64
+
+class DbWriter:
+    """
+    Single writer thread for SQLite. Callers submit write jobs (callables taking a Session);
+    the thread drains whatever is queued into one transaction and commits once, so concurrent
+    pollers, audits and request handlers never contend for the write lock. A job's return value
+    is delivered through a Future after the commit. Sessions use expire_on_commit=False, so
+    returned ORM objects stay readable (ids included) after the commit.
+
+    Every application write goes through here; bulk work (retention, archiving, run deletion)
+    is submitted as one job per batch so it interleaves with polls. Exempt are startup
+    migrations (no writer yet) and VACUUM / incremental_vacuum, which cannot run inside the
+    job's ORM transaction and only take the lock while no poll is running.
+    """
+
+    def __init__(self, batch_max: int = DEFAULT_BATCH_MAX):
+        self.batch_max = batch_max
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # Metrics
+        self._latencies = deque(maxlen=500) # Commit latency (ms) of recent transactions
+        self.commits = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.max_batch = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+            self._thread.start()
+            logger.info("DB writer thread started.")
+
+    def submit(self, fn) -> Future:
+        """
+        Queues `fn(session)`. Jobs must be idempotent and touch nothing outside the session
+        (no files, caches or caller state): if the grouped transaction fails, every job of the
+        group is rolled back and replayed alone. Session-level listeners such as the MAPID
+        rollup's after_insert rely on this, as they write through the same transaction.
+        Return what the caller needs and act on it once the Future resolves.
+        """
+        if self._thread is threading.current_thread():
+            raise RuntimeError("Write jobs must not submit nested write jobs")
+        self.start()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn, timeout: float = None):
+        """Submits a job and blocks until it is committed. Re-raises the job's exception."""
+        return self.submit(fn).result(timeout)
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Group whatever queued up meanwhile; never wait for more (no added latency)
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._commit(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    self._fail(batch[0][1], e)
+                    continue
+                # One bad job must not fail the group: replay each in its own transaction
+                logger.warning(f"Grouped commit of {len(batch)} jobs failed ({e}); retrying individually.")
+                for job in batch:
+                    try:
+                        self._commit([job])
+                    except Exception as job_error:
+                        self._fail(job[1], job_error)
+
+    def _commit(self, batch: list):
+        with Session(engine, expire_on_commit=False) as session:
+            added = []
+            event.listen(session, "transient_to_pending", lambda s, obj: added.append((obj, _unset_keys(obj))))
+            try:
+                results = [fn(session) for fn, _ in batch]
+                start = time.perf_counter()
+                session.commit()
+            except Exception:
+                session.rollback()
+                # Keys generated by the rolled-back flush may be taken by the time a job is
+                # replayed with the same objects (e.g. add_all's rows): let them be generated again
+                for obj, keys in added:
+                    for key in keys:
+                        setattr(obj, key, None)
+                raise
+            self._latencies.append((time.perf_counter() - start) * 1000)
+        self.commits += 1
+        self.jobs += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _fail(self, future: Future, error: Exception):
+        self.failed_jobs += 1
+        logger.error(f"Write job failed: {error}")
+        future.set_exception(error)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2) if latencies else None
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "queue_depth": self._queue.qsize(),
+            "commits": self.commits,
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "avg_batch": round(self.jobs / self.commits, 2) if self.commits else 0,
+            "max_batch": self.max_batch,
+            "commit_latency_ms": {
+                "last": round(self._latencies[-1], 2) if self._latencies else None,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": round(latencies[-1], 2) if latencies else None
+            }
+        }
+
+def _unset_keys(obj) -> list:
+    """Primary key attributes of a new ORM object that the database will generate."""
+    mapper = inspect(obj).mapper
+    keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+    return [key for key in keys if getattr(obj, key) is None]
+
+writer = DbWriter()
+
+def write(fn, timeout: float = None):
+    """
+    Runs `fn(session)` on the writer thread inside a grouped transaction and returns its result.
+    `fn` may be replayed, so it must be idempotent and free of side effects outside the session
+    (see DbWriter.submit).
+    """
+    return writer.run(fn, timeout)
+
+def add_all(rows: list, timeout: float = None) -> list:
+    """Inserts ORM rows through the writer; returns them with primary keys populated."""
+    def job(session):
+        session.add_all(rows)
+        session.flush()
+        return rows
+    return writer.run(job, timeout)
@@ -432,6 +432,32 @@ function refreshCurrentView() {
 
 
 
+let _summaryRefreshStream = null;
+let _summaryRefreshBackoffMs = 0;
+let _summaryRefreshNotBefore = 0;
+
+function followSummaryRefresh() {
+    // Reload the summary once the background refresh started by the server has finished.
+    // If the reloaded summary is refreshing again (TTL shorter than a refresh), wait before
+    // following the next one, doubling the wait each time, instead of reloading in a loop.
+    if (_summaryRefreshStream || Date.now() < _summaryRefreshNotBefore) return;
+    _summaryRefreshStream = new EventSource('/api/dashboard/summary/stream');
+    _summaryRefreshStream.onmessage = (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.type === 'done') {
+            _summaryRefreshStream.close();
+            _summaryRefreshStream = null;
+            _summaryRefreshBackoffMs = Math.min(Math.max(_summaryRefreshBackoffMs * 2, 30000), 600000);
+            _summaryRefreshNotBefore = Date.now() + _summaryRefreshBackoffMs;
+            loadSummary();
+        }
+    };
+    _summaryRefreshStream.onerror = () => {
+        _summaryRefreshStream.close();
+        _summaryRefreshStream = null;
+    };
+}
+
 async function loadSummary(forceRefresh = false) {
 
     const summaryDiv = document.getElementById('dashboard-summary');
@@ -506,6 +532,15 @@ async function loadSummary(forceRefresh = false) {
 
         window._dashboardTimestamp = data.timestamp;
 
+        // Stale-while-revalidate: the server answered from its last good summary and is refreshing
+        if (data.refreshing && !window.currentSnapshotTime) {
+            followSummaryRefresh();
+        } else if (!data.refreshing) {
+            // Fresh summary: the next refresh is followed right away again
+            _summaryRefreshBackoffMs = 0;
+            _summaryRefreshNotBefore = 0;
+        }
+
 
 
         // Dynamically update Sidebar Service Mesh indicators
@@ -1079,7 +1114,7 @@ function renderClusterRows(clusters) {
 
                         style="cursor:pointer;" 
 
-                        onclick="showLicenseDetails(${c.id}, ${licenseInfo.usage_id || 'null'})"
+                        onclick="showLicenseDetails(${c.id}, ${licenseInfo.usage_id ? `'${licenseInfo.usage_id}'` : 'null'})"
 
                         title="View License Breakdown">
 
@@ -1463,7 +1498,69 @@ function filterClusters() {
 
 
 
-async function loadResource(clusterId, resourceType, clusterName) {
+// First page of a resource list; the full list is fetched on demand
+
+const RESOURCE_PAGE_SIZE = 500;
+
+
+
+// Fields each resource table renders; list requests ask the server for only these
+
+const RESOURCE_TABLE_FIELDS = {
+
+    nodes: ['metadata.name', 'metadata.labels', 'metadata.creationTimestamp', 'status.conditions', '__capacity', '__metrics'],
+
+    machines: ['metadata.name', 'metadata.namespace', 'metadata.labels', 'metadata.creationTimestamp', 'status.phase', '__enriched',
+
+        'spec.providerSpec.value.subnet', 'spec.providerSpec.value.network'],
+
+    machinesets: ['metadata.name', 'metadata.namespace', 'metadata.labels', 'metadata.creationTimestamp', 'spec.replicas', 'status.availableReplicas'],
+
+    machineautoscalers: ['metadata.name', 'metadata.creationTimestamp', 'spec.scaleTargetRef.name', 'spec.minReplicas', 'spec.maxReplicas'],
+
+    projects: ['metadata.name', 'metadata.labels', 'metadata.annotations', 'metadata.creationTimestamp', 'status.phase']
+
+};
+
+const DEFAULT_RESOURCE_FIELDS = ['metadata.name', 'metadata.namespace', 'metadata.creationTimestamp'];
+
+
+
+function resourceListUrl(clusterId, resourceType, { q = '', paged = true } = {}) {
+
+    const params = new URLSearchParams();
+
+    if (window.currentSnapshotTime) {
+
+        params.append('snapshot_time', window.currentSnapshotTime);
+
+    }
+
+    if (q) params.append('q', q);
+
+    params.append('fields', (RESOURCE_TABLE_FIELDS[resourceType] || DEFAULT_RESOURCE_FIELDS).join(','));
+
+    if (paged) {
+
+        params.append('sort', 'metadata.name');
+
+        params.append('limit', RESOURCE_PAGE_SIZE);
+
+    }
+
+    return `/api/dashboard/${clusterId}/resources/${resourceType}?${params.toString()}`;
+
+}
+
+
+
+let _resourceLoadSeq = 0;
+
+
+
+// q === null: a fresh page load; a string: the filter box asked the server to filter
+
+async function loadResource(clusterId, resourceType, clusterName, loadAll = false, q = null) {
 
     const contentDiv = document.getElementById('dashboard-content');
 
@@ -1497,21 +1594,19 @@ async function loadResource(clusterId, resourceType, clusterName) {
 
 
 
-    contentDiv.innerHTML = '<div class="card" style="text-align:center; padding: 2rem;"><i class="fas fa-circle-notch fa-spin"></i> Loading...</div>';
-
+    if (q === null) {
 
+        contentDiv.innerHTML = '<div class="card" style="text-align:center; padding: 2rem;"><i class="fas fa-circle-notch fa-spin"></i> Loading...</div>';
 
-    try {
+    }
 
-        let url = `/api/dashboard/${clusterId}/resources/${resourceType}`;
 
-        if (window.currentSnapshotTime) {
 
-            url += `?snapshot_time=${window.currentSnapshotTime}`;
+    const seq = ++_resourceLoadSeq;
 
-        }
+    try {
 
-        const response = await fetch(url);
+        const response = await fetch(resourceListUrl(clusterId, resourceType, { q: q || '', paged: !loadAll }));
 
         if (!response.ok) {
 
@@ -1519,7 +1614,13 @@ async function loadResource(clusterId, resourceType, clusterName) {
 
         }
 
-        const data = await response.json();
+        const body = await response.json();
+
+        if (seq !== _resourceLoadSeq) return; // A newer load (e.g. the next keystroke) superseded this one
+
+        const data = loadAll ? body : body.items;
+
+        const total = loadAll ? data.length : body.total;
 
         // Store data globally for filtering ? Or just pass to render
 
@@ -1531,8 +1632,50 @@ async function loadResource(clusterId, resourceType, clusterName) {
 
         window.currentClusterId = clusterId; // Track cluster id for modal actions
 
+        // Once a list is paged, filtering and export go through the server so nothing past the page is missed
+
+        window.currentResourceQuery = {
+
+            clusterId, resourceType, loadAll, q: q || '', total, loaded: data.length,
+
+            serverSide: !!q || total > data.length
+
+        };
+
         renderTable(resourceType, data);
 
+        if (q !== null) {
+
+            // Re-rendered under the user's cursor: keep typing where they were
+
+            const filterField = document.getElementById('resource-filter');
+
+            if (filterField) {
+
+                filterField.value = q;
+
+                filterField.focus();
+
+                filterField.setSelectionRange(q.length, q.length);
+
+            }
+
+        }
+
+        if (total > data.length) {
+
+            const notice = document.createElement('div');
+
+            notice.className = 'card';
+
+            notice.innerHTML = `<i class="fas fa-info-circle"></i> Showing the first ${data.length} of ${total} ${resourceType} (sorted by name).
+
+                <button class="btn btn-secondary btn-sm" onclick="loadResource(${clusterId}, '${resourceType}', null, true, window.currentResourceQuery.q || null)">Load all</button>`;
+
+            contentDiv.prepend(notice);
+
+        }
+
     } catch (error) {
 
         contentDiv.innerHTML = `<div class="card" style="color: var(--danger-color);"><i class="fas fa-exclamation-triangle"></i> ${error.message}</div>`;
@@ -2860,21 +3003,7 @@ function filterBreakdownTable() {
 
 
 
-function renderTable(resourceType, data) {
-
-    const contentDiv = document.getElementById('dashboard-content');
-
-
-
-    if (!data || data.length === 0) {
-
-        contentDiv.innerHTML = '<div class="card">No resources found.</div>';
-
-        return;
-
-    }
-
-
+function resourceColumns(resourceType) {
 
     // Determine columns based on resource type
 
@@ -3052,7 +3181,33 @@ function renderTable(resourceType, data) {
 
     }
 
+    return columns;
+
+}
+
+
+
+function renderTable(resourceType, data) {
+
+    const contentDiv = document.getElementById('dashboard-content');
+
+
+
+    // An empty server-filtered result keeps the table (and its filter box) on screen
+
+    const filtered = window.currentResourceQuery && window.currentResourceQuery.q;
+
+    if ((!data || data.length === 0) && !filtered) {
+
+        contentDiv.innerHTML = '<div class="card">No resources found.</div>';
+
+        return;
+
+    }
+
+
 
+    const columns = resourceColumns(resourceType);
 
 
 
@@ -3096,13 +3251,13 @@ function renderTable(resourceType, data) {
 
                 <div style="display:flex; gap:0.5rem;">
 
-                    <button class="btn btn-secondary" title="Export to Excel" onclick="exportTable('${resourceType}', 'excel')">
+                    <button class="btn btn-secondary" title="Export to Excel" onclick="exportResourceTable('${resourceType}', 'excel')">
 
                         <i class="fas fa-file-excel"></i>
 
                     </button>
 
-                    <button class="btn btn-secondary" title="Export to CSV" onclick="exportTable('${resourceType}', 'csv')">
+                    <button class="btn btn-secondary" title="Export to CSV" onclick="exportResourceTable('${resourceType}', 'csv')">
 
                         <i class="fas fa-file-csv"></i>
 
@@ -3110,7 +3265,7 @@ function renderTable(resourceType, data) {
 
                 </div>
 
-                <span class="badge badge-blue">${data.length} items</span>
+                <span class="badge badge-blue">${window.currentResourceQuery && window.currentResourceQuery.total > data.length ? `${data.length} of ${window.currentResourceQuery.total}` : data.length} items</span>
 
             </div>
 
@@ -3385,12 +3540,36 @@ function sortTable(tableId, colIndex) {
 
 
 
+let _resourceFilterTimer = null;
+
+
+
 function filterTable() {
 
     const filterField = document.getElementById('resource-filter');
 
     if (!filterField) return;
 
+    // Paged list: the rendered rows are only a page, so the server filters the whole list
+
+    const state = window.currentResourceQuery;
+
+    if (state && state.serverSide && state.resourceType === window.currentResourceType) {
+
+        clearTimeout(_resourceFilterTimer);
+
+        _resourceFilterTimer = setTimeout(() => {
+
+            const q = filterField.value.trim();
+
+            if (q !== state.q) loadResource(state.clusterId, state.resourceType, null, state.loadAll, q);
+
+        }, 300);
+
+        return;
+
+    }
+
     const filter = filterField.value.toLowerCase();
 
     const table = document.getElementById('resource-table');
@@ -3661,9 +3840,12 @@ async function showLicenseDetails(clusterId, usageId) {
 
 
 
+// Points per trend series; the server aggregates longer windows into coarser buckets
+const TREND_MAX_POINTS = 500;
+
 async function loadClusterTrends(clusterId) {
 
-    const url = `/api/dashboard/trends?cluster_id=${clusterId}&days=30`;
+    const url = `/api/dashboard/trends?cluster_id=${clusterId}&days=30&max_points=${TREND_MAX_POINTS}`;
 
     try {
 
@@ -3905,7 +4087,13 @@ function exportTable(filename, format, tableId = null) {
 
     });
 
+    writeWorkbook(wb, filename, format);
+
+}
+
+
 
+function writeWorkbook(wb, filename, format) {
 
     const timestamp = new Date().toISOString().split('T')[0];
 
@@ -3927,6 +4115,52 @@ function exportTable(filename, format, tableId = null) {
 
 
 
+// Resource lists may be paged: export the whole (filtered) list, not just the rendered page
+
+async function exportResourceTable(resourceType, format) {
+
+    const state = window.currentResourceQuery;
+
+    if (!state || state.resourceType !== resourceType || state.total <= state.loaded) {
+
+        exportTable(resourceType, format);
+
+        return;
+
+    }
+
+    try {
+
+        const response = await fetch(resourceListUrl(state.clusterId, resourceType, { q: state.q, paged: false }));
+
+        if (!response.ok) throw new Error(`Error fetching resources: ${response.statusText}`);
+
+        const data = await response.json();
+
+        const columns = resourceColumns(resourceType);
+
+        const table = document.createElement('table');
+
+        table.innerHTML = `
+
+            <thead><tr>${columns.map(col => `<th>${col.header}</th>`).join('')}</tr></thead>
+
+            <tbody>${data.map(item => `<tr>${columns.map(col => `<td>${getValue(item, col.path)}</td>`).join('')}</tr>`).join('')}</tbody>
+
+        `;
+
+        writeWorkbook(XLSX.utils.table_to_book(table, { sheet: "Data" }), resourceType, format);
+
+    } catch (error) {
+
+        alert(`Export failed: ${error.message}`);
+
+    }
+
+}
+
+
+
 async function showClusterDetails(clusterId, clusterName) {
 
     const modal = document.getElementById('details-modal');
@@ -4863,7 +5097,7 @@ async function loadTrendsData() {
 
     const daysSelect = document.getElementById('trends-days');
     const days = daysSelect.value;
-    let url = `/api/dashboard/trends?days=${days === 'custom' ? 30 : days}`; // Default to 30 if custom but param handles overwrite
+    let url = `/api/dashboard/trends?days=${days === 'custom' ? 30 : days}&max_points=${TREND_MAX_POINTS}`; // Default to 30 if custom but param handles overwrite
 
     if (days === 'custom') {
         const customDate = document.getElementById('trends-custom-date').value;
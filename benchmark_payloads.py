@@ -0,0 +1,104 @@
+"""
+Encode time and bytes on the wire for representative API payloads: FastAPI's default
+jsonable_encoder + json.dumps path vs app.services.encoding.dumps, raw vs gzip.
+
+    python benchmark_payloads.py [--clusters 60] [--projects 5000] [--repeat 5]
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from app.services.encoding import dumps, orjson, GZIP_LEVEL
+
+def summary_payload(clusters):
+    return {"timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), "global_stats": {"total_nodes": clusters * 40}, "clusters": [{
+        "id": i, "name": f"ocp-{i:03d}", "environment": random.choice(["DEV", "UAT", "PROD"]), "datacenter": "Azure",
+        "status": "Online", "node_count": 40, "vcpu_count": 640.0, "licensed_node_count": 32, "license_count": 160,
+        "version": "4.14.12", "console_url": f"https://console-openshift-console.apps.ocp-{i:03d}.example.com",
+        "upgrade_status": {"percentage": 100, "message": "Cluster version is 4.14.12"}, "degraded_operators": 0
+    } for i in range(clusters)]}
+
+def matrix_payload(clusters, operators=80):
+    return {"clusters": [{"id": i, "name": f"ocp-{i:03d}", "environment": "PROD", "datacenter": "HCI", "has_data": True, "data_collected": True}
+                         for i in range(clusters)],
+            "operators": {f"operator-{o}": {"display_name": f"Operator {o}", "provider": "Red Hat", "installations": {
+                str(i): {"version": f"1.{o % 9}.{i % 5}", "channel": "stable", "status": "Succeeded", "namespace": "openshift-operators"}
+                for i in range(clusters) if (i + o) % 3
+            }} for o in range(operators)}}
+
+def projects_payload(count):
+    created = datetime(2023, 1, 1)
+    return [{"metadata": {"name": f"team-{i:05d}", "uid": f"{i:08x}-0000-4000-8000-000000000000",
+                          "creationTimestamp": created + timedelta(hours=i),
+                          "labels": {"mapid": f"M{i % 300}", "lob": "RETAIL", "kubernetes.io/metadata.name": f"team-{i:05d}"},
+                          "annotations": {"openshift.io/requester": f"user{i % 97}", "openshift.io/sa.scc.uid-range": "1000660000/10000"}},
+             "status": {"phase": "Active"}} for i in range(count)]
+
+def trends_payload(points=500):
+    start = datetime(2024, 1, 1)
+    return [{"timestamp": (start + timedelta(hours=i)).strftime("%Y-%m-%d %H:%M:%S"), "node_count": 40 + i % 3,
+             "vcpu_count": 640.0 + i % 7, "license_count": 160 + i % 5, "resolution": "hourly"} for i in range(points)]
+
+def report_rows(clusters, nodes=40):
+    return [[{"Cluster Name": f"ocp-{c:03d}", "Environment": "PROD", "Datacenter": "HCI", "Node Name": f"worker-{n}",
+              "Node vCPU": 16.0, "Node Memory (GB)": 64.0, "Node MAPID": f"M{n % 30}", "LOB": "RETAIL",
+              "Licenses Consumed": 8, "License Status": "INCLUDED"} for n in range(nodes)] for c in range(clusters)]
+
+def default_path(value) -> bytes:
+    # What JSONResponse does with an endpoint's return value
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def timed(fn, value, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(value)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return body, best * 1000
+
+def streamed_bytes(chunks):
+    """Bytes on the wire for a gzip stream flushed after every chunk (what a streaming middleware sends)."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    total = 0
+    for chunk in chunks:
+        total += len(compressor.compress(chunk)) + len(compressor.flush(zlib.Z_SYNC_FLUSH))
+    return total + len(compressor.flush())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clusters", type=int, default=60)
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    random.seed(1)
+
+    payloads = {
+        "summary": summary_payload(args.clusters),
+        "operator matrix": matrix_payload(args.clusters),
+        f"projects ({args.projects})": projects_payload(args.projects),
+        "trends (500 pts)": trends_payload(),
+    }
+    print(f"fast encoder: {'orjson' if orjson else 'stdlib json'}, gzip level {GZIP_LEVEL}\n")
+    print(f"{'payload':<20} {'default ms':>10} {'fast ms':>8} {'raw KB':>8} {'gzip KB':>8} {'gzip ms':>8}")
+    for name, value in payloads.items():
+        slow_body, slow_ms = timed(default_path, value, args.repeat)
+        fast_body, fast_ms = timed(dumps, value, args.repeat)
+        assert json.loads(slow_body) == json.loads(fast_body), name
+        zipped, gzip_ms = timed(lambda b: gzip.compress(b, GZIP_LEVEL), fast_body, args.repeat)
+        print(f"{name:<20} {slow_ms:>10.2f} {fast_ms:>8.2f} {len(fast_body) / 1024:>8.1f} {len(zipped) / 1024:>8.1f} {gzip_ms:>8.2f}")
+
+    rows = report_rows(args.clusters)
+    per_row = [("," + json.dumps(r)).encode() for cluster in rows for r in cluster]
+    per_cluster = [("," + dumps(cluster)[1:-1].decode()).encode() for cluster in rows]
+    print(f"\nstreamed report ({sum(len(c) for c in rows)} rows): {sum(len(c) for c in per_row) / 1024:.1f} KB raw")
+    print(f"  gzip, chunk per row:     {streamed_bytes(per_row) / 1024:.1f} KB ({len(per_row)} chunks)")
+    print(f"  gzip, chunk per cluster: {streamed_bytes(per_cluster) / 1024:.1f} KB ({len(per_cluster)} chunks)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import pytest
+from app.services.cache import response_cache, generation
+from app.services.shared_cache import shared_cache
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    # The response cache is module-global: entries must not leak from one test (or engine) to the next
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+@pytest.fixture(autouse=True)
+def isolated_shared_cache(tmp_path, monkeypatch):
+    # Leases, the data generation counter and cached payloads live in the shared cache file:
+    # each test gets its own instead of the one next to the real database
+    default_path = shared_cache.path
+    shared_cache.reopen(str(tmp_path / "shared.cache.db"))
+    monkeypatch.setattr(generation, "_last", (0, float("-inf")))
+    yield
+    shared_cache.reopen(default_path)
@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from sqlmodel import Session, SQLModel, create_engine, select, text
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.models import Cluster, ClusterSnapshot, PollRun, SnapshotArchive
+import app.services.archive as archive
+import app.services.writer as writer_module
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def test_archive_and_rehydrate(monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive, "CACHE_DIR", str(tmp_path / "cache"))
+
+    old = datetime.utcnow() - timedelta(days=40)
+    with Session(engine) as session:
+        session.add_all([Cluster(name="c1", api_url="https://x", token="t"), Cluster(name="c2", api_url="https://y", token="t")])
+        run = PollRun(started_at=old, finished_at=old)
+        recent_run = PollRun(started_at=datetime.utcnow())
+        session.add_all([run, recent_run])
+        session.commit()
+        for cid in (1, 2):
+            session.add(ClusterSnapshot(cluster_id=cid, run_id=run.id, timestamp=old, node_count=cid,
+                                        data_json=json.dumps({"nodes": [f"n{cid}"]}), argocd_json=json.dumps({"is_active": True})))
+        session.add(ClusterSnapshot(cluster_id=1, run_id=recent_run.id, timestamp=datetime.utcnow(), data_json="{}"))
+        session.commit()
+
+    report = archive.archive_snapshots_before(datetime.utcnow() - timedelta(days=30), pause_ms=0)
+    assert report["runs"] == 1 and report["snapshots"] == 2
+
+    with Session(engine) as session:
+        archived = session.exec(select(ClusterSnapshot).where(ClusterSnapshot.archive_id != None)).all()
+        assert len(archived) == 2
+        # Index row keeps the metrics, blobs are gone from SQLite
+        assert all(s.data_json is None and s.node_count for s in archived)
+        archive_file = tmp_path / session.exec(select(SnapshotArchive)).one().path
+        assert archive_file.exists()
+
+        snap_id = archived[1].id
+        snap = archive.rehydrate_snapshot(session, archived[1])
+        assert json.loads(snap.data_json) == {"nodes": ["n2"]}
+        assert json.loads(snap.argocd_json)["is_active"] is True
+        session.commit()
+        # Every member of the run was extracted into the cache in one pass
+        assert len(os.listdir(tmp_path / "cache")) == 2
+
+    with Session(engine) as session:
+        # Rehydrated blobs never flow back into the hot table
+        assert session.get(ClusterSnapshot, snap_id).data_json is None
+
+        for s in session.exec(select(ClusterSnapshot).where(ClusterSnapshot.archive_id != None)).all():
+            session.delete(s)
+        session.commit()
+
+    assert archive.prune_orphan_archives() == 1
+    assert not archive_file.exists()
+
+def test_failed_commit_leaves_no_archive_file(monkeypatch, tmp_path):
+    broken = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(broken)
+    monkeypatch.setattr(archive, "engine", broken)
+    monkeypatch.setattr(writer_module, "engine", broken)
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+
+    old = datetime.utcnow() - timedelta(days=40)
+    with Session(broken) as session:
+        session.add(Cluster(name="c1", api_url="https://x", token="t"))
+        run = PollRun(started_at=old, finished_at=old)
+        session.add(run)
+        session.commit()
+        session.add(ClusterSnapshot(cluster_id=1, run_id=run.id, timestamp=old, data_json=json.dumps({"nodes": ["n1"]})))
+        session.commit()
+        # The file is written before the index row; make that insert fail
+        session.execute(text("DROP TABLE snapshotarchive"))
+        session.commit()
+
+    report = archive.archive_snapshots_before(datetime.utcnow() - timedelta(days=30), pause_ms=0)
+    assert report["runs"] == 0
+    assert os.listdir(tmp_path) == []
+    with Session(broken) as session:
+        assert session.exec(select(ClusterSnapshot)).one().data_json is not None
@@ -0,0 +1,109 @@
+import sys
+import os
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, PollRun, LicenseChangeEvent
+import app.services.poller as poller
+import app.services.change_log as change_log
+import app.services.writer as writer_module
+from app.services.cache import response_cache
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def node(name, cpu):
+    return {"metadata": {"name": name, "labels": {}}, "status": {"capacity": {"cpu": str(cpu)}}}
+
+def poll(monkeypatch, cluster_id, nodes, started_at):
+    monkeypatch.setattr(poller, "fetch_resources", lambda cluster, api_version, kind, **kw: nodes if kind == "Node" else [])
+    with Session(engine) as session:
+        run = PollRun(started_at=started_at)
+        session.add(run)
+        session.commit()
+        run_id = run.id
+    poller.poll_cluster(cluster_id, rules=[], run_timestamp=started_at, run_id=run_id, default_include=True, collect_olm=False)
+
+def test_changes_are_recorded_at_poll_time_and_backfilled(monkeypatch):
+    monkeypatch.setattr(poller, "engine", engine)
+    monkeypatch.setattr(change_log, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    monkeypatch.setattr(poller, "get_service_mesh_details", lambda cluster: {})
+    monkeypatch.setattr(poller, "get_argocd_details", lambda cluster: {})
+
+    with Session(engine) as session:
+        cluster = Cluster(name="diffs", api_url="https://x", token="t")
+        session.add(cluster)
+        session.commit()
+        cid = cluster.id
+
+    now = datetime.utcnow().replace(microsecond=0)
+    poll(monkeypatch, cid, [node("a", 4), node("b", 8)], now - timedelta(hours=3))
+    poll(monkeypatch, cid, [node("a", 4), node("b", 16), node("c", 2)], now - timedelta(hours=2))
+    poll(monkeypatch, cid, [node("b", 16), node("c", 2)], now - timedelta(hours=1))
+
+    def recorded():
+        with Session(engine) as session:
+            events = session.exec(select(LicenseChangeEvent).order_by(LicenseChangeEvent.ts_epoch, LicenseChangeEvent.node_name)).all()
+            return [(e.change_type, e.node_name, e.vcpu, e.prev_vcpu, e.license_diff) for e in events]
+
+    expected = [
+        ("MODIFIED", "b", 16.0, 8.0, 2),
+        ("ADDED", "c", 2.0, None, 1),
+        ("REMOVED", "a", 4.0, None, -1),
+    ]
+    # The first poll has nothing to compare against
+    assert recorded() == expected
+
+    response_cache.clear()
+    response = client.get(f"/api/dashboard/trends/diffs?cluster_id={cid}&days=1")
+    assert response.status_code == 200
+    rows = response.json()
+    assert [(r["type"], r["diff"]) for r in rows] == [("REMOVED", -1), ("ADDED", 1), ("MODIFIED", 2)]
+    assert rows[2]["detail"] == "Node b vCPU 8 -> 16 (Licensed)"
+    assert sum(r["diff"] for r in rows) == 2 # Per-change deltas add up to the net license change
+
+    # Backfill rebuilds the same log from the recorded breakdowns, and resumes after the last cluster
+    with Session(engine) as session:
+        for event in session.exec(select(LicenseChangeEvent)).all():
+            session.delete(event)
+        session.commit()
+    report = change_log.backfill_change_events()
+    assert report["clusters"] == 1 and report["events"] == 3
+    assert recorded() == expected
+    assert change_log.backfill_change_events()["clusters"] == 0
+
+def test_unexplained_count_change_is_reported_without_node():
+    prev = [{"name": "a", "status": "INCLUDED", "vcpu": 4, "licenses": 1}]
+    curr = [{"name": "a", "status": "INCLUDED", "vcpu": 4, "licenses": 1}, {"name": "x", "status": "EXCLUDED", "vcpu": 0, "licenses": 0}]
+    assert change_log.diff_license_details(prev, curr, 0) == []
+    assert change_log.diff_license_details(prev, curr, 2) == [
+        {"change_type": "MODIFIED", "node_name": None, "vcpu": None, "prev_vcpu": None, "license_diff": 2}
+    ]
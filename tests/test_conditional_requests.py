@@ -0,0 +1,103 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot, ComplianceScore
+import app.routers.dashboard as dashboard
+from app.services.cache import response_cache, etag_matches
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def fmt(ts):
+    return ts.strftime("%Y-%m-%dT%H:%M:%S")
+
+def test_historical_snapshot_reads_revalidate_to_304(monkeypatch):
+    old = datetime.utcnow().replace(microsecond=0) - timedelta(days=2)
+    with Session(engine) as session:
+        cluster = Cluster(name="etag", api_url="https://x", token="t")
+        session.add(cluster)
+        session.commit()
+        cid = cluster.id
+        session.add(ClusterSnapshot(cluster_id=cid, timestamp=old, status="Success",
+                                    data_json=json.dumps({"projects": [{"metadata": {"name": "p1"}}]})))
+        session.commit()
+    response_cache.clear()
+    url = f"/api/dashboard/{cid}/resources/projects?snapshot_time={fmt(old)}"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert "immutable" in first.headers["cache-control"]
+
+    # The endpoint does not run for a matching validator
+    monkeypatch.setattr(dashboard, "load_snapshot_payload", lambda *a, **kw: 1 / 0)
+    second = client.get(url, headers={"If-None-Match": etag})
+    assert second.status_code == 304 and second.content == b""
+    assert second.headers["etag"] == etag
+    monkeypatch.undo()
+    # Other parameters are another representation
+    assert client.get(url + "&limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+    # A different snapshot resolving for the same time is a different entity
+    with Session(engine) as session:
+        session.add(ClusterSnapshot(cluster_id=cid, timestamp=old + timedelta(minutes=1), status="Success",
+                                    data_json=json.dumps({"projects": []})))
+        session.commit()
+    third = client.get(url, headers={"If-None-Match": etag})
+    assert third.status_code == 200 and third.json() == []
+    assert third.headers["etag"] != etag
+
+    # Live reads and recent targets
+    monkeypatch.setattr(dashboard, "fetch_resources", lambda *a, **kw: [])
+    assert "etag" not in client.get(f"/api/dashboard/{cid}/resources/projects").headers
+    recent = client.get(f"/api/operators/matrix?snapshot_time={fmt(datetime.utcnow())}")
+    assert recent.headers["cache-control"] == "private, no-cache" and "etag" in recent.headers
+
+def test_score_details_are_immutable():
+    with Session(engine) as session:
+        score = ComplianceScore(cluster_id=1, timestamp=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), score=90.0, passed_count=9, total_count=10,
+                                results_json=json.dumps([{"rule_name": "r", "status": "PASS"}]))
+        session.add(score)
+        session.commit()
+        score_id = score.id
+
+    first = client.get(f"/api/audit/scores/{score_id}")
+    assert first.status_code == 200 and "immutable" in first.headers["cache-control"]
+    assert client.get(f"/api/audit/scores/{score_id}", headers={"If-None-Match": f'W/{first.headers["etag"]}'}).status_code == 304
+    assert client.get("/api/audit/scores/999999", headers={"If-None-Match": "*"}).status_code == 404
+
+def test_if_none_match_parsing():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('*', '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
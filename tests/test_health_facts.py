@@ -0,0 +1,113 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot
+from app.services.ocp import extract_health_facts
+from app.services.license import license_rules_fingerprint
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def co(name, degraded="False", available="True"):
+    return {"metadata": {"name": name}, "status": {"conditions": [
+        {"type": "Degraded", "status": degraded}, {"type": "Available", "status": available}
+    ]}}
+
+SNAPSHOT_DATA = {
+    "nodes": [{"metadata": {"name": "n1", "labels": {}}, "status": {"capacity": {"cpu": "8"}}}],
+    "clusterversions": [{
+        "metadata": {"name": "version"},
+        "status": {
+            "desired": {"version": "4.15.2"},
+            "history": [{"state": "Partial", "version": "4.15.2"}, {"state": "Completed", "version": "4.14.9"}],
+            "conditions": [{"type": "Progressing", "status": "True", "message": "Working towards 4.15.2: 40 of 100 done (40% complete)"}]
+        }
+    }],
+    "routes": [{"metadata": {"name": "console", "namespace": "openshift-console"}, "spec": {"host": "console.apps.example"}}],
+    "clusteroperators": [co("dns"), co("ingress", degraded="True"), co("etcd", available="False")]
+}
+
+def test_extract_health_facts():
+    cluster = Cluster(id=1, name="c1", api_url="https://x", token="t")
+    facts = extract_health_facts(cluster, SNAPSHOT_DATA, {"is_active": True}, {})
+    assert facts == {
+        "current_version": "4.14.9",
+        "desired_version": "4.15.2",
+        "upgrade_percentage": 40,
+        "upgrade_message": "Working towards 4.15.2: 40 of 100 done (40% complete)",
+        "degraded_operator_count": 2,
+        "console_url": "https://console.apps.example",
+        "has_service_mesh": True,
+        "has_argocd": False
+    }
+
+def test_fast_summary_reads_facts_without_parsing_payload():
+    cluster = Cluster(name="facts", api_url="https://x", token="t")
+    legacy = Cluster(name="legacy", api_url="https://y", token="t")
+    stale = Cluster(name="stale", api_url="https://z", token="t")
+    with Session(engine) as session:
+        session.add_all([cluster, legacy, stale])
+        session.commit()
+        facts = extract_health_facts(cluster, SNAPSHOT_DATA, {"is_active": True}, {"is_active": True})
+        # Unparseable payload: the facts path must never touch it
+        session.add(ClusterSnapshot(cluster_id=cluster.id, timestamp=datetime.utcnow(), node_count=1, vcpu_count=8.0,
+                                    license_count=4, licensed_node_count=1, licensed_vcpu_count=8.0,
+                                    license_rules_hash=license_rules_fingerprint([], False), data_json="<not json>", **facts))
+        # Counts stored under other license rules: recalculated from the payload with the current ones
+        session.add(ClusterSnapshot(cluster_id=stale.id, timestamp=datetime.utcnow(), node_count=1, vcpu_count=8.0,
+                                    license_count=99, licensed_node_count=1, licensed_vcpu_count=8.0,
+                                    license_rules_hash="rules-before-an-edit", data_json=json.dumps(SNAPSHOT_DATA), **facts))
+        # Snapshot taken before fact extraction existed: served from its payload
+        session.add(ClusterSnapshot(cluster_id=legacy.id, timestamp=datetime.utcnow() - timedelta(hours=1),
+                                    data_json=json.dumps(SNAPSHOT_DATA), argocd_json=json.dumps({"is_active": True})))
+        session.commit()
+
+    data = client.get("/api/dashboard/summary?mode=fast").json()
+    rows = {c["name"]: c for c in data["clusters"]}
+
+    stats = rows["facts"]["stats"]
+    assert rows["facts"]["status"] == "yellow"
+    assert stats["version"] == "4.14.9" and stats["console_url"] == "https://console.apps.example"
+    assert stats["upgrade_status"]["percentage"] == 40 and stats["upgrade_status"]["target_version"] == "4.15.2"
+    assert stats["degraded_operator_count"] == 2
+    assert stats["has_service_mesh"] and stats["has_argocd"]
+    assert rows["facts"]["license_info"]["count"] == 4 and rows["facts"]["licensed_vcpu_count"] == 8.0
+
+    assert rows["stale"]["license_info"]["count"] == 0 and rows["stale"]["licensed_node_count"] == 0 # Excluded by default
+    assert rows["stale"]["stats"]["version"] == "4.14.9"
+
+    assert rows["legacy"]["status"] == "yellow"
+    assert rows["legacy"]["stats"]["version"] == "4.14.9" and rows["legacy"]["stats"]["has_argocd"] is True
+
+    simple = {c["name"]: c for c in client.get("/api/dashboard/simple-clusters").json()}
+    assert simple["facts"]["has_service_mesh"] and simple["legacy"]["has_argocd"]
@@ -0,0 +1,174 @@
+import sys
+import os
+import json
+import time
+import threading
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select, func
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, LicenseUsage
+import app.routers.dashboard as dashboard
+import app.services.writer as writer_module
+from app.services.shared_cache import shared_cache
+from app.services.singleflight import SingleFlight
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def test_single_flight_shares_result_and_errors():
+    flight = SingleFlight()
+    gate = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        gate.wait(5)
+        return {"value": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{"value": 42}] * 5
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+    # Done calls are not cached; failures propagate to the caller
+    def boom():
+        raise RuntimeError("apiserver down")
+    try:
+        flight.do("k", boom)
+        assert False, "expected the error"
+    except RuntimeError:
+        pass
+    assert flight.do("k", lambda: 1) == 1
+
+def test_concurrent_live_refreshes_fan_out_once(monkeypatch):
+    with Session(engine) as session:
+        session.add_all([Cluster(name=f"c{i}", api_url=f"https://c{i}", token="t") for i in range(3)])
+        session.commit()
+
+    fetches = []
+    def fake_fetch(cluster, api_version, kind, **kwargs):
+        fetches.append(cluster.name)
+        time.sleep(0.3)
+        return [{"metadata": {"name": "n1", "labels": {}}, "status": {"capacity": {"cpu": "4"}}}]
+    def no_client(cluster):
+        raise RuntimeError("no operators in tests")
+
+    monkeypatch.setattr(dashboard, "fetch_resources", fake_fetch)
+    monkeypatch.setattr(dashboard, "get_cluster_stats", lambda cluster, nodes=None: {"node_count": len(nodes), "vcpu_count": 4})
+    monkeypatch.setattr(dashboard, "get_dynamic_client", no_client)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    shared_cache.delete(dashboard.DashboardCache.KEY)
+    shared_cache.delete(dashboard.LIVE_REFRESH_LEASE_KEY)
+
+    responses = []
+    def browser():
+        responses.append(client.get("/api/dashboard/summary?refresh=true").json())
+    threads = [threading.Thread(target=browser) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(fetches) == ["c0", "c1", "c2"] # One fleet scan for six callers
+    assert len(responses) == 6 and all(r == responses[0] for r in responses)
+    assert responses[0]["global_stats"]["total_nodes"] == 3
+    assert shared_cache.get(dashboard.LIVE_REFRESH_LEASE_KEY) is None
+
+    # The next caller within the TTL is served from the shared cache
+    assert client.get("/api/dashboard/summary").json() == responses[0]
+    assert len(fetches) == 3
+
+    # Live refreshes write no usage history; their breakdowns resolve from the live-usage store
+    with Session(engine) as session:
+        assert session.exec(select(func.count(LicenseUsage.id))).one() == 0
+    entry = responses[0]["clusters"][0]
+    usage_id = entry["license_info"]["usage_id"]
+    assert usage_id.startswith("live-")
+    details = client.get(f"/api/dashboard/{entry['id']}/license-details/{usage_id}").json()
+    assert details["node_count"] == entry["licensed_node_count"] and len(details["details"]) == 1
+
+def test_expired_summary_is_served_stale_and_merged_per_cluster(monkeypatch):
+    from app.models import AppConfig
+    with Session(engine) as session:
+        session.add(AppConfig(key="DASHBOARD_CACHE_TTL_MINUTES", value="0"))
+        session.commit()
+    node_count = {"value": 1}
+    gate = threading.Event()
+    def fake_fetch(cluster, api_version, kind, **kwargs):
+        if node_count["value"] == 2:
+            gate.wait(5) # Held until the stream below is subscribed
+            if cluster.name == "c2":
+                time.sleep(2.0) # Slower than the refresh deadline below
+        return [{"metadata": {"name": f"n{i}", "labels": {}}, "status": {"capacity": {"cpu": "4"}}} for i in range(node_count["value"])]
+
+    monkeypatch.setattr(dashboard, "fetch_resources", fake_fetch)
+    monkeypatch.setattr(dashboard, "get_cluster_stats", lambda cluster, nodes=None: {"node_count": len(nodes), "vcpu_count": 4})
+    monkeypatch.setattr(dashboard, "get_dynamic_client", lambda cluster: (_ for _ in ()).throw(RuntimeError("no operators")))
+    monkeypatch.setattr(writer_module, "engine", engine)
+    before = client.get("/api/dashboard/summary?refresh=true").json() # Last good payload: 1 node each
+
+    node_count["value"] = 2
+    monkeypatch.setattr(dashboard, "LIVE_REFRESH_TIMEOUT_SECONDS", 1.0)
+
+    started = time.monotonic()
+    stale = client.get("/api/dashboard/summary").json()
+    assert time.monotonic() - started < 0.3 # Not waiting on the slowest cluster
+    assert stale["stale"] and stale["refreshing"] and stale["age_seconds"] is not None
+    assert stale["clusters"] == before["clusters"]
+
+    # Subscribe while the refresh is still in flight, then let the clusters answer
+    subscribed = threading.Event()
+    def last_seq(channel):
+        seq = type(shared_cache).last_seq(shared_cache, channel)
+        subscribed.set()
+        return seq
+    monkeypatch.setattr(shared_cache, "last_seq", last_seq)
+    stream = []
+    reader = threading.Thread(target=lambda: stream.append(client.get("/api/dashboard/summary/stream").text))
+    reader.start()
+    assert subscribed.wait(5) and dashboard.live_refresh.in_flight("summary")
+    gate.set()
+    reader.join(10)
+
+    events = [json.loads(line[len("data: "):]) for line in stream[0].splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["cluster"] * 3 + ["done"]
+    streamed = {e["cluster"]["name"]: e["cluster"] for e in events[:-1]}
+    assert streamed["c0"]["stats"]["node_count"] == 2 and streamed["c2"]["stale"]
+
+    refreshed = {c["name"]: c for c in dashboard.dashboard_cache.data["clusters"]}
+    assert refreshed["c0"]["stats"]["node_count"] == 2 and refreshed["c1"]["stats"]["node_count"] == 2
+    # The timed-out cluster keeps its last good entry instead of blanking the payload
+    assert refreshed["c2"]["stale"] and refreshed["c2"]["stats"]["node_count"] == 1
+    assert dashboard.dashboard_cache.data["global_stats"]["total_nodes"] == 5
@@ -0,0 +1,91 @@
+import sys
+import os
+from sqlmodel import Session, SQLModel, create_engine, text
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+import app.database as database
+import app.services.maintenance as maintenance
+import app.services.writer as writer_module
+from app.models import AppConfig
+from app.services.poller import POLL_LEASE_KEY
+from app.services.shared_cache import shared_cache
+
+def file_engine(monkeypatch, tmp_path, name):
+    path = tmp_path / name
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    monkeypatch.setattr(maintenance, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    monkeypatch.setattr(maintenance, "DATABASE_URL", f"sqlite:///{path}")
+    return engine
+
+def churn(engine, rows=400):
+    """Writes ~rows * 4 KB and deletes it again, leaving free pages behind."""
+    with Session(engine) as session:
+        session.add_all([AppConfig(key=f"blob-{i}", value="x" * 4000) for i in range(rows)])
+        session.commit()
+        session.execute(text("DELETE FROM appconfig WHERE key LIKE 'blob-%'"))
+        session.add(AppConfig(key="DB_VACUUM_SLICE_PAUSE_MS", value="0"))
+        session.commit()
+
+def test_new_database_reclaims_free_pages_incrementally(monkeypatch, tmp_path):
+    engine = file_engine(monkeypatch, tmp_path, "fresh.db")
+    monkeypatch.setattr(database, "engine", engine)
+    database.create_db_and_tables()
+    assert maintenance.get_auto_vacuum_mode() == "INCREMENTAL"
+
+    churn(engine)
+    before = maintenance.get_space_stats()
+    assert before["freelist_pages"] > 300
+
+    result = maintenance.run_incremental_vacuum_task(max_seconds=30)
+    after = maintenance.get_space_stats()
+    assert result["freelist_pages_remaining"] == 0 and after["freelist_pages"] == 0
+    assert after["page_count"] < before["page_count"] and result["reclaimed_bytes"] > 0
+    assert maintenance.get_last_reclaim()["mode"] == "incremental"
+    engine.dispose()
+
+def test_full_vacuum_converts_once(monkeypatch, tmp_path):
+    engine = file_engine(monkeypatch, tmp_path, "legacy.db")
+    SQLModel.metadata.create_all(engine)
+    churn(engine)
+    assert maintenance.get_auto_vacuum_mode() == "NONE"
+    # Incremental slices are a no-op until the database has been converted
+    assert maintenance.run_incremental_vacuum_task() is None
+
+    maintenance.run_vacuum_task()
+    converted = maintenance.get_space_stats()
+    assert converted["auto_vacuum"] == "INCREMENTAL" and converted["freelist_pages"] == 0
+    assert maintenance.get_last_reclaim()["mode"] == "full"
+
+    # Later runs take the incremental path and leave the mode alone
+    result = maintenance.run_vacuum_task()
+    assert result["mode"] == "incremental" and result["slices"] == 0
+    again = maintenance.get_space_stats()
+    assert again["auto_vacuum"] == "INCREMENTAL" and again["page_count"] == converted["page_count"]
+    engine.dispose()
+
+def test_wal_checkpoint_truncates_when_idle(monkeypatch, tmp_path):
+    engine = file_engine(monkeypatch, tmp_path, "wal.db")
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([AppConfig(key=f"k{i}", value="v" * 1000) for i in range(100)])
+        session.commit()
+    assert maintenance.get_space_stats()["wal_bytes"] > 0
+
+    # A running poll downgrades TRUNCATE to a non-blocking PASSIVE checkpoint
+    shared_cache.set(POLL_LEASE_KEY, {"pid": 0}, ttl=60)
+    try:
+        passive = maintenance.run_wal_checkpoint("TRUNCATE")
+    finally:
+        shared_cache.delete(POLL_LEASE_KEY)
+    assert passive["mode"] == "PASSIVE" and passive["busy"] == 0
+    assert passive["checkpointed"] == passive["log_frames"] > 0
+
+    truncated = maintenance.run_wal_checkpoint("TRUNCATE")
+    assert truncated["mode"] == "TRUNCATE" and truncated["busy"] == 0
+    assert maintenance.get_space_stats()["wal_bytes"] == 0
+    engine.dispose()
@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select, func
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot, MapidLicenseUsage, AppConfig
+import app.services.mapid_backfill as mapid_backfill
+import app.services.writer as writer_module
+from app.services.shared_cache import shared_cache
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def mapid_rows():
+    with Session(engine) as session:
+        return session.exec(select(func.count(MapidLicenseUsage.id))).one()
+
+def test_backfill_runs_in_background_batches_and_resumes(monkeypatch):
+    monkeypatch.setattr(mapid_backfill, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+
+    now = datetime.utcnow().replace(microsecond=0)
+    with Session(engine) as session:
+        cluster = Cluster(name="legacy", api_url="https://x", token="t")
+        session.add(cluster)
+        session.add(AppConfig(key="LICENSE_DEFAULT_INCLUDE", value="True"))
+        session.commit()
+        nodes = [{"metadata": {"name": "n1", "labels": {}}, "status": {"capacity": {"cpu": "8"}}}]
+        for hours_ago in (3, 2, 1):
+            session.add(ClusterSnapshot(cluster_id=cluster.id, timestamp=now - timedelta(hours=hours_ago), data_json=json.dumps({"nodes": nodes})))
+        session.commit()
+
+    # Reads never backfill
+    data = client.get("/api/dashboard/mapid/global-trends?days=1").json()
+    assert data["labels"] == [] and mapid_rows() == 0
+
+    # Interrupted after the first batch: progress and cursor survive
+    real_write = mapid_backfill.write
+    calls = []
+    def flaky_write(job):
+        calls.append(job)
+        if len(calls) == 2:
+            raise RuntimeError("worker stopped")
+        return real_write(job)
+    monkeypatch.setattr(mapid_backfill, "write", flaky_write)
+    report = mapid_backfill.backfill_mapid_usage(batch_size=1)
+    assert report["status"] == "error" and report["done"] == 1 and report["total"] == 3
+    assert mapid_rows() == 1
+
+    monkeypatch.setattr(mapid_backfill, "write", real_write)
+    report = mapid_backfill.backfill_mapid_usage(batch_size=1)
+    assert report["status"] == "done" and report["total"] == 2
+    assert mapid_rows() == 3
+    assert client.get("/api/admin/clusters/config/mapid-backfill").json()["status"] == "done"
+
+    # A worker that died mid-run leaves a "running" report but no lease: restartable
+    shared_cache.set(mapid_backfill.MAPID_BACKFILL_PROGRESS_KEY, {"status": "running", "done": 1, "total": 3})
+    assert client.get("/api/admin/clusters/config/mapid-backfill").json()["status"] == "interrupted"
+    assert shared_cache.add(mapid_backfill.MAPID_BACKFILL_LEASE_KEY, {"pid": 0}, ttl=60)
+    assert client.post("/api/admin/clusters/config/mapid-backfill").json()["status"] == "running"
+    shared_cache.delete(mapid_backfill.MAPID_BACKFILL_LEASE_KEY)
+    assert client.post("/api/admin/clusters/config/mapid-backfill").json()["status"] == "accepted"
+    assert client.get("/api/admin/clusters/config/mapid-backfill").json()["status"] == "done"
+
+    data = client.get("/api/dashboard/mapid/global-trends?days=1").json()
+    assert len(data["datasets"]) == 1
+    assert all(value == 2 for value in data["datasets"][0]["data"]) # One 8 vCPU node, max per day
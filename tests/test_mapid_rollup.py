@@ -0,0 +1,114 @@
+import sys
+import os
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, PollRun, ClusterSnapshot, MapidLicenseUsage, MapidDailyRollup
+import app.services.rollup as rollup
+import app.services.writer as writer_module
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def rollups():
+    with Session(engine) as session:
+        rows = session.exec(select(MapidDailyRollup).order_by(MapidDailyRollup.cluster_id, MapidDailyRollup.day, MapidDailyRollup.mapid)).all()
+        return [r.model_dump() for r in rows]
+
+def test_rollup_is_maintained_on_insert_and_rebuildable(monkeypatch):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    with Session(engine) as session:
+        clusters = [Cluster(name="r1", api_url="https://r1", token="t"), Cluster(name="r2", api_url="https://r2", token="t")]
+        session.add_all(clusters)
+        session.commit()
+        runs = []
+        # Three polls today: M1 peaks at 6 on r1, M2 disappears from r1 in the last poll
+        for minutes, r1_m1, with_m2 in ((10, 4, True), (20, 6, True), (30, 2, False)):
+            ts = today + timedelta(minutes=minutes)
+            run = PollRun(started_at=ts)
+            session.add(run)
+            session.commit()
+            runs.append(run.id)
+            ts_str = ts.strftime("%Y-%m-%d %H:%M:%S")
+            session.add(ClusterSnapshot(cluster_id=clusters[0].id, run_id=run.id, timestamp=ts, data_json="{}"))
+            session.add(MapidLicenseUsage(cluster_id=clusters[0].id, run_id=run.id, timestamp=ts_str, mapid="M1", lob="Retail",
+                                          node_count=r1_m1, total_vcpu=4.0 * r1_m1, license_count=r1_m1))
+            if with_m2:
+                session.add(MapidLicenseUsage(cluster_id=clusters[0].id, run_id=run.id, timestamp=ts_str, mapid="M2",
+                                              node_count=1, total_vcpu=4.0, license_count=1))
+            session.add(MapidLicenseUsage(cluster_id=clusters[1].id, run_id=run.id, timestamp=ts_str, mapid="M1", lob="Retail",
+                                          node_count=3, total_vcpu=12.0, license_count=3))
+        session.commit()
+
+    incremental = rollups()
+    r1_m1 = incremental[0]
+    assert (r1_m1["samples"], r1_m1["max_licenses"], r1_m1["sum_licenses"], r1_m1["last_licenses"]) == (3, 6, 12, 2)
+    assert r1_m1["lob"] == "Retail" and r1_m1["last_vcpu"] == 8.0
+
+    # Rebuilding from raw rows gives the same table
+    monkeypatch.setattr(rollup, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    with Session(engine) as session:
+        for row in session.exec(select(MapidDailyRollup)).all():
+            session.delete(row)
+        session.commit()
+    rollup.rebuild_mapid_rollup()
+    assert rollups() == incremental
+
+    # Analytics read the rollup: peak per cluster summed, latest poll per cluster
+    trends = client.get("/api/dashboard/mapid/global-trends?days=1").json()
+    series = {d["label"]: d["data"][-1] for d in trends["datasets"]}
+    assert series == {"M1": 9, "M2": 1}
+    avg = client.get("/api/dashboard/mapid/global-trends?days=1&metric=avg").json()
+    assert {d["label"]: d["data"][-1] for d in avg["datasets"]} == {"M1": 7.0, "M2": 1.0}
+
+    breakdown = {c["cluster_name"]: c for c in client.get("/api/dashboard/mapid/cluster-breakdown").json()}
+    assert [(m["mapid"], m["license_count"]) for m in breakdown["r1"]["mapids"]] == [("M1", 2)] # M2 gone in the last poll
+    assert breakdown["r1"]["timestamp"] == (today + timedelta(minutes=30)).strftime("%Y-%m-%d %H:%M:%S")
+    by_mapid = {m["mapid"]: m for m in client.get("/api/dashboard/mapid-breakdown").json()}
+    assert by_mapid["M1"]["total_licenses"] == 5 and "M2" not in by_mapid
+
+    # Deleting a run re-derives the affected day from the remaining raw rows
+    assert client.post("/api/admin/clusters/snapshots/bulk-delete", json={"group_ids": [str(runs[1])]}).status_code == 200
+    r1_m1 = rollups()[0]
+    assert (r1_m1["samples"], r1_m1["max_licenses"], r1_m1["sum_licenses"]) == (2, 4, 6)
+
+    # Downsampled days keep every usage row: deleting one of their runs still re-derives the day
+    with Session(engine) as session:
+        for snap in session.exec(select(ClusterSnapshot)).all():
+            snap.resolution = "daily"
+            session.add(snap)
+        session.commit()
+    before = rollups()
+    rollup.rebuild_mapid_rollup()
+    assert rollups() == before
+    assert client.post("/api/admin/clusters/snapshots/bulk-delete", json={"group_ids": [str(runs[0])]}).status_code == 200
+    r1_m1 = rollups()[0]
+    assert (r1_m1["samples"], r1_m1["max_licenses"], r1_m1["sum_licenses"]) == (1, 2, 2)
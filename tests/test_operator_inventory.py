@@ -0,0 +1,128 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot, PollRun, OperatorInstall
+import app.services.poller as poller
+import app.services.unmapped as unmapped
+import app.services.writer as writer_module
+from app.services.cache import response_cache
+from app.services.operator_inventory import version_sort_key
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def olm(version, owned=None):
+    csv_name = f"advanced-cluster-management.v{version}"
+    subs = [{"metadata": {"name": "acm", "namespace": "open-cluster-management"},
+             "spec": {"name": "advanced-cluster-management", "channel": "release-2", "source": "redhat-operators"},
+             "status": {"installedCSV": csv_name}}]
+    csvs = [{"metadata": {"name": csv_name},
+             "spec": {"version": version, "displayName": "Advanced Cluster Management", "provider": {"name": "Red Hat"},
+                      "customresourcedefinitions": {"owned": owned or []}},
+             "status": {"phase": "Succeeded"}}]
+    return subs, csvs
+
+def poll(monkeypatch, cluster_id, version, started_at):
+    subs, csvs = olm(version, owned=[{"name": "multiclusterhubs.operator.open-cluster-management.io", "kind": "MultiClusterHub"}])
+    resources = {"Subscription": subs, "ClusterServiceVersion": csvs}
+    monkeypatch.setattr(poller, "fetch_resources", lambda cluster, api_version, kind, **kw: resources.get(kind, []))
+    with Session(engine) as session:
+        run = PollRun(started_at=started_at)
+        session.add(run)
+        session.commit()
+        run_id = run.id
+    poller.poll_cluster(cluster_id, rules=[], run_timestamp=started_at, run_id=run_id, default_include=True, collect_olm=True)
+
+def get(url):
+    response_cache.clear()
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_version_sort_key_orders_numerically():
+    assert version_sort_key("2.10.0") > version_sort_key("2.9.1")
+    assert version_sort_key("acm.v2.9") == version_sort_key("2.9.0")
+    assert version_sort_key("Pending") is None
+
+def test_matrix_and_fleet_queries_read_the_inventory(monkeypatch):
+    monkeypatch.setattr(poller, "engine", engine)
+    monkeypatch.setattr(unmapped, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    monkeypatch.setattr(poller, "get_service_mesh_details", lambda cluster: {})
+    monkeypatch.setattr(poller, "get_argocd_details", lambda cluster: {})
+
+    now = datetime.utcnow().replace(microsecond=0)
+    with Session(engine) as session:
+        clusters = [Cluster(name=name, api_url=f"https://{name}", token="t") for name in ("hub-a", "hub-b", "hub-old")]
+        session.add_all(clusters)
+        session.commit()
+        ids = [c.id for c in clusters]
+        # Polled before the inventory existed: the matrix falls back to the payload
+        subs, csvs = olm("2.8.0")
+        session.add(ClusterSnapshot(cluster_id=ids[2], timestamp=now - timedelta(hours=1), status="Success",
+                                    data_json=json.dumps({"nodes": [], "subscriptions": subs, "csvs": csvs})))
+        session.commit()
+
+    poll(monkeypatch, ids[0], "2.9.1", now - timedelta(hours=1))
+    poll(monkeypatch, ids[1], "2.10.0", now - timedelta(hours=1))
+
+    with Session(engine) as session:
+        snapshot = session.exec(select(ClusterSnapshot).where(ClusterSnapshot.cluster_id == ids[0])).one()
+        assert snapshot.olm_collected is True and snapshot.olm_auth_error is False
+        assert len(session.exec(select(OperatorInstall)).all()) == 2
+
+    matrix = get("/api/operators/matrix")
+    assert [c["data_collected"] for c in matrix["clusters"]] == [True, True, True]
+    [acm] = matrix["operators"]
+    assert acm["displayName"] == "Advanced Cluster Management" and acm["provider"] == "Red Hat"
+    assert {name: i["version"] for name, i in acm["installations"].items()} == {"hub-a": "2.9.1", "hub-b": "2.10.0", "hub-old": "2.8.0"}
+    assert acm["installations"]["hub-a"]["managed_crds"][0]["kind"] == "MultiClusterHub"
+    assert acm["installations"]["hub-a"]["channel"] == "release-2" and acm["installations"]["hub-a"]["status"] == "Succeeded"
+
+    # 2.10 sorts above 2.9 (a string comparison of the raw versions would not)
+    # Fleet queries include the pre-inventory snapshot, read from its payload
+    below = get("/api/operators/installs?package=advanced-cluster-management&below=2.10")
+    assert [i["cluster_name"] for i in below] == ["hub-old", "hub-a"]
+    assert below[0]["environment"] == "DEV" and below[0]["cluster_id"] == ids[2]
+    at_least = get("/api/operators/installs?package=advanced-cluster-management&at_least=2.9&channel=release-2")
+    assert [i["cluster_name"] for i in at_least] == ["hub-a", "hub-b"]
+    versions = get("/api/operators/advanced-cluster-management/versions")
+    assert [(v["version"], v["count"]) for v in versions] == [("2.8.0", 1), ("2.9.1", 1), ("2.10.0", 1)]
+    assert client.get("/api/operators/installs?package=x&below=latest").status_code == 400
+
+    # Deleting a snapshot removes its installs
+    with Session(engine) as session:
+        snapshot_id = session.exec(select(ClusterSnapshot.id).where(ClusterSnapshot.cluster_id == ids[1])).one()
+    assert client.delete(f"/api/admin/clusters/snapshots/{snapshot_id}").status_code == 200
+    with Session(engine) as session:
+        assert session.exec(select(OperatorInstall.cluster_id)).all() == [ids[0]]
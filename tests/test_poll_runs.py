@@ -0,0 +1,106 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user, get_session
+from app.models import User, Cluster, ClusterSnapshot, PollRun, LicenseUsage, ComplianceScore
+from app.services.poller import refresh_run_aggregates
+import app.services.writer as writer_module
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def seed_run(session, started_at, clusters, with_olm=False, with_compliance=False):
+    run = PollRun(started_at=started_at, trigger="scheduled")
+    session.add(run)
+    session.commit()
+    ts_str = started_at.strftime("%Y-%m-%d %H:%M:%S")
+    for c in clusters:
+        data = {"nodes": [{}] * 2}
+        if with_olm:
+            data["csvs"] = [{"metadata": {"name": "op.v1"}}]
+        session.add(ClusterSnapshot(
+            cluster_id=c.id, run_id=run.id, timestamp=started_at, status="Success",
+            node_count=2, vcpu_count=8.0, olm_collected=with_olm, data_json=json.dumps(data)
+        ))
+        session.add(LicenseUsage(cluster_id=c.id, run_id=run.id, timestamp=ts_str, node_count=2, total_vcpu=8.0, license_count=2))
+        if with_compliance:
+            session.add(ComplianceScore(cluster_id=c.id, run_id=run.id, timestamp=ts_str, passed_count=1, total_count=1, score=100.0))
+    session.commit()
+    refresh_run_aggregates(session, run.id, finished_at=started_at)
+    session.commit()
+    return run.id
+
+def test_run_listing_and_deletion(monkeypatch):
+    monkeypatch.setattr(writer_module, "engine", engine)
+    with Session(engine) as session:
+        clusters = [Cluster(name=f"c{i}", api_url="https://x", token="t") for i in range(3)]
+        session.add_all(clusters)
+        session.commit()
+        for c in clusters:
+            session.refresh(c)
+
+        now = datetime.utcnow().replace(microsecond=123456)
+        old_id = seed_run(session, now - timedelta(hours=1), clusters)
+        new_id = seed_run(session, now, clusters, with_olm=True, with_compliance=True)
+
+        # Finalizing reads stored columns only, never the payloads
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        refresh_run_aggregates(session, new_id)
+        event.remove(engine, "before_cursor_execute", listener)
+        assert statements and not [s for s in statements if "data_json" in s or "json_" in s]
+
+        run = session.get(PollRun, new_id)
+        assert run.total_clusters == 3
+        assert run.total_nodes == 6
+        assert run.total_vcpu == 24.0
+        assert json.loads(run.collected_components) == ["Cluster", "Operator", "Compliance"]
+
+    resp = client.get("/api/admin/clusters/snapshots")
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["total_runs"] == 2
+    assert [g["run_id"] for g in data["groups"]] == [new_id, old_id]
+    assert len(data["groups"][0]["snapshots"]) == 3
+    assert data["groups"][1]["collected_components"] == ["Cluster"]
+
+    # Delete one run by id and the other by its legacy timestamp string
+    legacy_ts = data["groups"][1]["timestamp_str"]
+    resp = client.post("/api/admin/clusters/snapshots/bulk-delete", json={"group_ids": [str(new_id), legacy_ts]})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["deleted_count"] == 6
+
+    with Session(engine) as session:
+        assert session.exec(select(PollRun)).all() == []
+        assert session.exec(select(ClusterSnapshot)).all() == []
+        assert session.exec(select(LicenseUsage)).all() == []
+        assert session.exec(select(ComplianceScore)).all() == []
@@ -0,0 +1,174 @@
+import sys
+import os
+import re
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, create_engine
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+import app.database as database
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot, PollRun, LicenseUsage, MapidLicenseUsage, ComplianceScore, OperatorInstall
+import app.services.retention as retention
+import app.services.writer as writer_module
+from app.services.snapshots import resolve_snapshot_ids
+from app.services.cache import response_cache
+
+# Setup Test DB: schema AND migrations, so the indexes under test are the ones production gets
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+
+# Tables that grow with every poll; a full scan of any of them is a regression.
+# Small configuration tables (cluster, rules, users...) may be scanned.
+GROWING_TABLES = {"clustersnapshot", "licenseusage", "mapidlicenseusage", "compliancescore", "pollrun", "license_change_event", "mapid_daily_rollup", "unmapped_resource", "operator_install"}
+
+# Statements captured while exercising the hot paths
+captured = []
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if not executemany and statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH", "DELETE", "UPDATE"):
+        captured.append((statement, parameters))
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    original = database.engine
+    database.engine = engine
+    try:
+        database.create_db_and_tables()
+    finally:
+        database.engine = original
+    seed()
+    event.listen(engine, "before_cursor_execute", _capture)
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    event.remove(engine, "before_cursor_execute", _capture)
+    app.dependency_overrides.clear()
+
+def seed():
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        clusters = [Cluster(name=f"c{i}", api_url=f"https://c{i}", token="t") for i in range(3)]
+        session.add_all(clusters)
+        session.commit()
+        for hours_ago in range(48, 0, -6):
+            ts = now - timedelta(hours=hours_ago)
+            ts_str = ts.strftime("%Y-%m-%d %H:%M:%S")
+            run = PollRun(started_at=ts, finished_at=ts)
+            session.add(run)
+            session.commit()
+            for c in clusters:
+                data = {"nodes": [{"metadata": {"name": "n1", "labels": {}}}], "csvs": [], "subscriptions": [], "projects": []}
+                # Older snapshots predate the operator inventory (olm_collected NULL)
+                snapshot = ClusterSnapshot(cluster_id=c.id, run_id=run.id, timestamp=ts, node_count=1, data_json=json.dumps(data),
+                                           olm_collected=True if hours_ago <= 24 else None)
+                session.add(snapshot)
+                if hours_ago <= 24:
+                    session.flush()
+                    session.add(OperatorInstall(cluster_id=c.id, snapshot_id=snapshot.id, package="acm", display_name="ACM",
+                                                version="2.9.1", version_key="00000002.00000009.00000001.00000000"))
+                session.add(LicenseUsage(cluster_id=c.id, run_id=run.id, timestamp=ts_str, node_count=1, total_vcpu=4, license_count=1))
+                session.add(MapidLicenseUsage(cluster_id=c.id, run_id=run.id, timestamp=ts_str, mapid="Unmapped", node_count=1, total_vcpu=4, license_count=1))
+                session.add(ComplianceScore(cluster_id=c.id, run_id=run.id, timestamp=ts_str, passed_count=1, total_count=1, score=100.0))
+        session.commit()
+
+def query_plan(statement, parameters) -> list:
+    raw = engine.raw_connection()
+    try:
+        return [row[-1] for row in raw.cursor().execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()]
+    finally:
+        raw.close()
+
+def full_scans(statement, parameters) -> list:
+    """Returns the EXPLAIN QUERY PLAN lines that scan a growing table end to end."""
+    plan = query_plan(statement, parameters)
+
+    # Resolve aliases ("FROM clustersnapshot s") so "SCAN s" maps back to its table
+    aliases = {alias: table for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+AS)?\s+(\w+)", statement, re.I)}
+    offenders = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and aliases.get(match.group(1), match.group(1)) in GROWING_TABLES:
+            offenders.append(detail)
+    return offenders
+
+def test_hot_queries_use_indexes():
+    target = (datetime.utcnow() - timedelta(hours=20)).strftime("%Y-%m-%dT%H:%M:%S")
+    hot_endpoints = [
+        ("get", "/api/dashboard/summary?mode=fast"),
+        ("get", f"/api/dashboard/summary?snapshot_time={target}"),
+        ("get", "/api/dashboard/simple-clusters"),
+        ("get", "/api/dashboard/snapshots"),
+        ("get", "/api/dashboard/trends"),
+        ("get", "/api/dashboard/trends?cluster_id=1"),
+        ("get", "/api/dashboard/trends?max_points=3"),
+        ("get", "/api/dashboard/trends?cluster_id=1&bucket=daily"),
+        ("get", "/api/dashboard/trends/diffs"),
+        ("get", "/api/dashboard/trends/diffs?cluster_id=1"),
+        ("get", "/api/dashboard/mapid/global-trends"),
+        ("get", "/api/dashboard/mapid/cluster-breakdown"),
+        ("get", "/api/dashboard/mapid/unmapped-nodes"),
+        ("get", f"/api/dashboard/1/details?snapshot_time={target}"),
+        ("get", "/api/operators/matrix"),
+        ("get", f"/api/operators/matrix?snapshot_time={target}"),
+        ("get", "/api/operators/installs?package=acm&below=2.10"),
+        ("get", "/api/operators/acm/versions"),
+        ("get", "/api/audit/compliance/latest"),
+        ("get", "/api/audit/history/1"),
+    ]
+    for method, url in hot_endpoints:
+        response = getattr(client, method)(url)
+        assert response.status_code == 200, (url, response.text)
+
+    with Session(engine) as session:
+        resolve_snapshot_ids(session)
+        resolve_snapshot_ids(session, datetime.utcnow() - timedelta(hours=20), [1, 2])
+
+    # Retention deletes in batches by timestamp; nothing old enough exists, only the plans matter
+    original = retention.engine, writer_module.engine
+    retention.engine = writer_module.engine = engine
+    try:
+        retention.purge_snapshots_before(datetime.utcnow() - timedelta(days=365), batch_size=10, pause_ms=0)
+    finally:
+        retention.engine, writer_module.engine = original
+
+    assert captured, "No statements captured"
+    failures = {}
+    for statement, parameters in captured:
+        offenders = full_scans(statement, parameters)
+        if offenders:
+            failures[" ".join(statement.split())[:200]] = offenders
+    assert not failures, "Full table scans on hot paths:\n" + "\n".join(f"{s}\n  -> {o}" for s, o in failures.items())
+
+def test_latest_per_cluster_lookups_walk_the_index():
+    """Newest-row-per-cluster lookups must walk the composite index in order, not sort a cluster's history."""
+    captured.clear()
+    response_cache.clear() # The endpoints below were answered (and cached) by the previous test
+    with Session(engine) as session:
+        resolve_snapshot_ids(session, datetime.utcnow() - timedelta(hours=20))
+    for url in ("/api/audit/compliance/latest", "/api/dashboard/mapid/cluster-breakdown"):
+        assert client.get(url).status_code == 200
+
+    lookups = [(st, params) for st, params in captured if "ORDER BY" in st.upper()]
+    assert len(lookups) >= 3
+    for statement, parameters in lookups:
+        plan = query_plan(statement, parameters)
+        assert not any("TEMP B-TREE FOR ORDER BY" in line for line in plan), (" ".join(statement.split()), plan)
+        assert any(re.search(r"USING (COVERING )?INDEX ix_\w+_(cluster_status_ts|cluster_epoch)", line) for line in plan), plan
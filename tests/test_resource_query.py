@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot
+import app.routers.dashboard as dashboard
+from app.services.cache import response_cache
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def project(i):
+    labels = {"env": "prod" if i % 2 else "dev"}
+    if i % 3 == 0:
+        labels["mapid"] = f"M{i}"
+    return {"metadata": {"name": f"team-{i:03d}", "labels": labels, "annotations": {"big": "x" * 100}}, "status": {"phase": "Active"}}
+
+def test_snapshot_list_is_filtered_sorted_paged_and_projected():
+    ts = datetime.utcnow().replace(microsecond=0) - timedelta(hours=1)
+    with Session(engine) as session:
+        cluster = Cluster(name="big", api_url="https://x", token="t")
+        session.add(cluster)
+        session.commit()
+        session.add(ClusterSnapshot(cluster_id=cluster.id, timestamp=ts, status="Success",
+                                    data_json=json.dumps({"projects": [project(i) for i in range(120)]})))
+        session.commit()
+        cid = cluster.id
+    response_cache.clear()
+    base = f"/api/dashboard/{cid}/resources/projects?snapshot_time={ts.strftime('%Y-%m-%dT%H:%M:%S')}"
+
+    # No paging parameters: the plain list, as before
+    assert len(client.get(base).json()) == 120
+
+    page = client.get(base + "&sort=-metadata.name&limit=10&offset=5&fields=metadata.name,metadata.labels.env").json()
+    assert page["total"] == 120 and page["offset"] == 5 and page["limit"] == 10
+    assert [p["metadata"]["name"] for p in page["items"]] == [f"team-{i:03d}" for i in range(114, 104, -1)]
+    assert page["items"][0] == {"metadata": {"name": "team-114", "labels": {"env": "dev"}}}
+
+    # Text and label filters; items without the sort field go last
+    page = client.get(base + "&q=TEAM-01&label=env=prod,!mapid&sort=metadata.labels.mapid&limit=50").json()
+    assert [p["metadata"]["name"] for p in page["items"]] == ["team-011", "team-013", "team-017", "team-019"]
+    page = client.get(base + "&q=m102&limit=50&fields=metadata.name").json() # Label values match too
+    assert page["items"] == [{"metadata": {"name": "team-102"}}]
+    page = client.get(base + "&label=mapid&sort=metadata.labels.mapid&limit=3").json()
+    assert page["total"] == 40
+    assert [p["metadata"]["labels"]["mapid"] for p in page["items"]] == ["M0", "M102", "M105"]
+
+    assert client.get(base + "&label==prod").status_code == 400
+    assert client.get(base + "&limit=0").status_code == 422
+
+def test_live_label_selector_is_pushed_down(monkeypatch):
+    with Session(engine) as session:
+        cluster = Cluster(name="live", api_url="https://x", token="t")
+        session.add(cluster)
+        session.commit()
+        cid = cluster.id
+
+    seen = {}
+    def fake_fetch(cluster, api_version, kind, **kw):
+        seen.update(kw)
+        return [project(1), project(3)]
+    monkeypatch.setattr(dashboard, "fetch_resources", fake_fetch)
+
+    rows = client.get(f"/api/dashboard/{cid}/resources/projects?label=env=prod&fields=metadata.name").json()
+    assert seen["label_selector"] == "env=prod"
+    assert rows == [{"metadata": {"name": "team-001"}}, {"metadata": {"name": "team-003"}}]
@@ -0,0 +1,172 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, text
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot, LicenseRule, AppConfig
+from app.services.cache import ResponseCache, generation, _MISS
+from app.services.shared_cache import shared_cache
+import app.routers.dashboard as dashboard
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+statements = []
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+    event.listen(engine, "before_cursor_execute", _count)
+
+def teardown_module(module):
+    event.remove(engine, "before_cursor_execute", _count)
+    app.dependency_overrides.clear()
+
+def add_snapshot(cluster_id, ts, node_count):
+    data = {"nodes": [{"metadata": {"name": f"n{i}", "labels": {}}} for i in range(node_count)]}
+    with Session(engine) as session:
+        session.add(ClusterSnapshot(cluster_id=cluster_id, timestamp=ts, node_count=node_count, data_json=json.dumps(data)))
+        session.commit()
+
+def test_cached_until_data_generation_changes():
+    with Session(engine) as session:
+        session.add(Cluster(name="c1", api_url="https://c1", token="t"))
+        session.commit()
+    add_snapshot(1, datetime.utcnow() - timedelta(hours=1), 2)
+
+    first = client.get("/api/dashboard/summary?mode=fast").json()
+    assert first["global_stats"]["total_nodes"] == 2
+
+    # Repeat requests are answered without touching the database
+    statements.clear()
+    assert client.get("/api/dashboard/summary?mode=fast").json()["clusters"] == first["clusters"]
+    assert client.get("/api/dashboard/summary?mode=fast").json()["clusters"] == first["clusters"]
+    assert not [s for s in statements if "clustersnapshot" in s.lower()]
+
+    # A committed snapshot starts a new generation
+    before = generation.value
+    add_snapshot(1, datetime.utcnow(), 5)
+    assert generation.value > before
+    assert client.get("/api/dashboard/summary?mode=fast").json()["global_stats"]["total_nodes"] == 5
+
+    # So does a rule change, and raw-SQL maintenance
+    before = generation.value
+    with Session(engine) as session:
+        session.add(LicenseRule(name="r", rule_type="exclude", match_field="name", match_value="x"))
+        session.commit()
+    with Session(engine) as session:
+        session.execute(text("DELETE FROM licenserule"))
+        session.commit()
+    assert generation.value == before + 2
+
+    # Reads and rolled-back writes do not invalidate
+    before = generation.value
+    with Session(engine) as session:
+        session.execute(text("SELECT 1"))
+        session.commit()
+        session.add(LicenseRule(name="r", rule_type="exclude", match_field="name", match_value="x"))
+        session.flush()
+        session.rollback()
+    assert generation.value == before
+
+    # Settings are not snapshot or usage data
+    with Session(engine) as session:
+        session.add(AppConfig(key="POLL_INTERVAL_MINUTES", value="30"))
+        session.commit()
+        session.execute(text("UPDATE appconfig SET value = '45'"))
+        session.commit()
+    assert generation.value == before
+
+def test_live_fallback_is_not_cached(monkeypatch):
+    calls = []
+    def fake_fetch(cluster, api_version, kind, **kw):
+        calls.append(kind)
+        return []
+    monkeypatch.setattr(dashboard, "fetch_resources", fake_fetch)
+    with Session(engine) as session:
+        session.add(Cluster(name="never-polled", api_url="https://np", token="t"))
+        session.commit()
+        cluster_id = session.exec(text("SELECT id FROM cluster WHERE name = 'never-polled'")).one()[0]
+
+    for _ in range(2):
+        assert client.get(f"/api/dashboard/{cluster_id}/mapid/m1/resources").json() == {"nodes": [], "projects": []}
+    assert calls == ["Node", "Project", "Node", "Project"]
+
+def test_params_key_and_headers_replayed():
+    first = client.get("/api/dashboard/trends?days=7")
+    assert first.status_code == 200
+    statements.clear()
+    again = client.get("/api/dashboard/trends?days=7")
+    assert again.json() == first.json()
+    assert again.headers.get("X-Data-Resolution") == first.headers.get("X-Data-Resolution")
+    assert not statements
+
+    # Different parameters are a different entry
+    assert client.get("/api/dashboard/trends?days=8").status_code == 200
+    assert statements
+
+def test_lru_respects_memory_budget():
+    cache = ResponseCache(max_bytes=100)
+    gen = generation.value
+    cache.put("a", gen, "x" * 40, {}) # 42 bytes serialized
+    cache.put("b", gen, "y" * 40, {})
+    assert cache.get("a")[2] == "x" * 40 # "a" becomes most recently used
+    cache.put("c", gen, "z" * 40, {})
+    assert cache.get("b") is _MISS
+    assert cache.get("a")[2] == "x" * 40 and cache.get("c")[2] == "z" * 40
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["bytes"] <= 100
+
+    # Oversized values are not cached; entries from an older generation are dropped on read
+    cache.put("huge", gen, "w" * 500, {})
+    assert cache.stats()["entries"] == 2
+    generation.bump()
+    assert cache.get("a") is _MISS
+    assert cache.stats()["entries"] == 1
+
+def test_generation_read_once_per_refresh_interval(monkeypatch):
+    reads = []
+    real_counter = shared_cache.counter
+    monkeypatch.setattr(shared_cache, "counter", lambda name: reads.append(name) or real_counter(name))
+    monkeypatch.setattr(generation, "refresh_seconds", 3600)
+    generation._last = (generation._last[0], float("-inf"))
+
+    before = generation.value
+    cache = ResponseCache(max_bytes=1000)
+    for _ in range(20):
+        cache.get("k")
+    assert len(reads) == 1
+
+    # Another worker's commit is not seen until the interval passes; our own bumps are seen at once
+    shared_cache.incr(generation.COUNTER)
+    assert generation.value == before
+    generation.bump()
+    assert generation.value == before + 2 and len(reads) == 1
+    shared_cache.incr(generation.COUNTER)
+    monkeypatch.setattr(generation, "refresh_seconds", 0)
+    assert generation.value == before + 3
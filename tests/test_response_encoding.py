@@ -0,0 +1,82 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot, AppConfig
+from app.services.cache import response_cache
+from app.services.encoding import dumps, GZIP_MINIMUM_BYTES
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def node(i):
+    return {"metadata": {"name": f"worker-{i}", "labels": {"mapid": "M1"}}, "status": {"capacity": {"cpu": "8", "memory": "32Gi"}}}
+
+def test_large_responses_are_gzipped_and_streams_too():
+    ts = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+    with Session(engine) as session:
+        cluster = Cluster(name="gz", api_url="https://x", token="t")
+        session.add(cluster)
+        session.add(AppConfig(key="LICENSE_DEFAULT_INCLUDE", value="True"))
+        session.commit()
+        session.add(ClusterSnapshot(cluster_id=cluster.id, timestamp=ts, status="Success",
+                                    data_json=json.dumps({"nodes": [node(i) for i in range(200)]})))
+        session.commit()
+        cid = cluster.id
+    response_cache.clear()
+    url = f"/api/dashboard/{cid}/resources/nodes?snapshot_time={ts.strftime('%Y-%m-%dT%H:%M:%S')}"
+
+    big = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.headers["etag"] # Headers set on the injected response survive the fast path
+    assert len(big.json()) == 200
+    assert "content-encoding" not in client.get(url, headers={"Accept-Encoding": "identity"}).headers
+
+    small = client.get(url + "&limit=1&fields=metadata.name", headers={"Accept-Encoding": "gzip"})
+    assert len(small.content) < GZIP_MINIMUM_BYTES and "content-encoding" not in small.headers
+
+    report = client.post("/api/reports/generate", json={}, headers={"Accept-Encoding": "gzip"})
+    assert report.headers["content-encoding"] == "gzip"
+    rows = report.json()
+    assert len(rows) == 200 and rows[0]["Cluster Name"] == "gz"
+
+def test_event_streams_are_never_gzipped():
+    stream = client.get("/api/dashboard/summary/stream", headers={"Accept-Encoding": "gzip"})
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in stream.headers
+    assert '"done"' in stream.text
+
+def test_fast_encoder_matches_default_path():
+    value = {"when": datetime(2024, 1, 2, 3, 4, 5), "n": [1, 2.5, None], 3: "int key", "odd": Decimal("1.5")}
+    assert json.loads(dumps(value)) == json.loads(json.dumps(jsonable_encoder(value)))
@@ -0,0 +1,122 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.models import Cluster, ClusterSnapshot, PollRun, LicenseUsage, MapidLicenseUsage
+import app.services.retention as retention
+import app.services.writer as writer_module
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def seed(session, cluster, started_at, status="Success"):
+    run = PollRun(started_at=started_at, finished_at=started_at)
+    session.add(run)
+    session.commit()
+    ts_str = started_at.strftime("%Y-%m-%d %H:%M:%S")
+    session.add(ClusterSnapshot(cluster_id=cluster.id, run_id=run.id, timestamp=started_at, status=status, data_json=json.dumps({"nodes": ["x" * 100]})))
+    session.add(LicenseUsage(cluster_id=cluster.id, run_id=run.id, timestamp=ts_str, node_count=1, total_vcpu=4, license_count=1))
+    session.add(MapidLicenseUsage(cluster_id=cluster.id, run_id=run.id, timestamp=ts_str, mapid="m1", node_count=1, total_vcpu=4, license_count=1))
+    session.commit()
+
+def test_purge_is_batched_and_cascades(monkeypatch):
+    monkeypatch.setattr(retention, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        cluster = Cluster(name="c1", api_url="https://x", token="t")
+        session.add(cluster)
+        session.commit()
+        session.refresh(cluster)
+
+        for days_ago in range(1, 11):
+            seed(session, cluster, now - timedelta(days=days_ago))
+        # Live dashboard row without a run
+        session.add(LicenseUsage(cluster_id=cluster.id, timestamp=(now - timedelta(days=9)).strftime("%Y-%m-%d %H:%M:%S"), node_count=1, total_vcpu=4, license_count=1))
+        session.commit()
+
+    report = retention.purge_snapshots_before(now - timedelta(days=5, hours=12), batch_size=2, pause_ms=0)
+
+    assert report["snapshots"] == 5
+    assert report["licenseusage"] == 6
+    assert report["mapidlicenseusage"] == 5
+    assert report["pollrun"] == 5
+    assert report["batches"] >= 3
+    assert report["payload_bytes"] > 500
+
+    with Session(engine) as session:
+        assert len(session.exec(select(ClusterSnapshot)).all()) == 5
+        assert len(session.exec(select(PollRun)).all()) == 5
+        assert len(session.exec(select(LicenseUsage)).all()) == 5
+
+def test_parse_retention_tiers():
+    assert retention.parse_retention_tiers("30:daily, 7:hourly") == [(7, "hourly"), (30, "daily")]
+    assert retention.parse_retention_tiers("") == []
+    for bad in ["7:weekly", "7:daily,30:hourly", "x:hourly", "0:hourly"]:
+        try:
+            retention.parse_retention_tiers(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+def test_downsampling_is_deterministic(monkeypatch):
+    monkeypatch.setattr(retention, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+
+    now = datetime(2024, 1, 10, 12, 0)
+    tiers = retention.parse_retention_tiers("1:hourly,2:daily")
+    with Session(engine) as session:
+        cluster = Cluster(name="c2", api_url="https://y", token="t")
+        session.add(cluster)
+        session.commit()
+        session.refresh(cluster)
+        cluster_id = cluster.id
+
+        # Every 15 minutes for 3.5 days; the last slot of each hour failed
+        ts = datetime(2024, 1, 7)
+        while ts <= now:
+            seed(session, cluster, ts, status="Failed" if ts.minute == 45 else "Success")
+            ts += timedelta(minutes=15)
+
+    report = retention.downsample_snapshots(tiers, now=now, batch_size=50, pause_ms=0)
+
+    with Session(engine) as session:
+        snaps = session.exec(select(ClusterSnapshot).where(ClusterSnapshot.cluster_id == cluster_id).order_by(ClusterSnapshot.timestamp)).all()
+        by_res = {}
+        for s in snaps:
+            by_res.setdefault(s.resolution, []).append(s)
+
+        # raw: [01-09 12:00, now], hourly: [01-08 00:00, 01-09 12:00), daily: before 01-08
+        assert len(by_res["raw"]) == 97
+        assert len(by_res["hourly"]) == 36
+        assert [s.timestamp for s in by_res["daily"]] == [datetime(2024, 1, 7, 23, 30)]
+        assert all(s.timestamp.minute == 30 and s.status == "Success" for s in by_res["hourly"])
+        assert report["snapshots"] == 337 - 134
+        # Usage history survives thinning
+        assert "licenseusage" not in report
+        assert len(session.exec(select(LicenseUsage).where(LicenseUsage.cluster_id == cluster_id)).all()) == 337
+        # ...and so do the runs it references
+        assert report["pollrun"] == 0
+        run_ids = set(session.exec(select(PollRun.id)).all())
+        assert all(u.run_id in run_ids for u in session.exec(select(LicenseUsage).where(LicenseUsage.cluster_id == cluster_id)).all())
+
+    # Re-running is a no-op
+    assert retention.downsample_snapshots(tiers, now=now, batch_size=50, pause_ms=0)["snapshots"] == 0
+
+    # The purge drops thinned runs together with their usage rows
+    report = retention.purge_snapshots_before(datetime(2024, 1, 8), batch_size=50, pause_ms=0)
+    with Session(engine) as session:
+        assert report["pollrun"] == 96 and report["licenseusage"] == 96
+        assert session.exec(select(PollRun).where(PollRun.started_at < datetime(2024, 1, 8))).all() == []
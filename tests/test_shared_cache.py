@@ -0,0 +1,56 @@
+import sys
+import os
+import time
+import multiprocessing
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.services.shared_cache import SharedCache
+
+def _race_for_lease(path, results):
+    results.put(SharedCache(path).add("poll:running", {"pid": os.getpid()}, ttl=60))
+
+def test_lease_is_exclusive_across_processes(tmp_path):
+    path = str(tmp_path / "shared.cache.db")
+    SharedCache(path).counter("warmup") # Create the schema before the race
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_race_for_lease, args=(path, results)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+    outcomes = [results.get(timeout=5) for _ in procs]
+    assert outcomes.count(True) == 1
+
+    # Released leases can be taken again; expired ones are taken over
+    cache = SharedCache(path)
+    assert not cache.add("poll:running", {}, ttl=60)
+    cache.delete("poll:running")
+    assert cache.add("poll:running", {}, ttl=0.01)
+    time.sleep(0.05)
+    assert cache.add("poll:running", {}, ttl=60)
+
+def test_entries_counters_and_events_are_shared(tmp_path):
+    path = str(tmp_path / "shared.cache.db")
+    worker_a, worker_b = SharedCache(path), SharedCache(path)
+
+    stamp = worker_a.set("dashboard:summary", {"clusters": [1, 2]})
+    assert worker_b.get_with_time("dashboard:summary") == ({"clusters": [1, 2]}, stamp)
+    worker_a.set_many({"diff:a": [1], "diff:b": [2]}, ttl=60)
+    assert worker_b.get_many(["diff:a", "diff:b", "diff:c"]) == {"diff:a": [1], "diff:b": [2]}
+    worker_a.set("short", 1, ttl=0.01)
+    time.sleep(0.05)
+    assert worker_b.get("short", "gone") == "gone"
+
+    assert worker_a.incr("data_generation") == 1
+    assert worker_b.incr("data_generation") == 2
+    assert worker_a.counter("data_generation") == 2
+
+    start = worker_b.last_seq("poll")
+    worker_a.publish("poll", {"type": "cluster_start"})
+    worker_a.publish("other", {"type": "ignored"})
+    worker_a.publish("poll", {"type": "done"})
+    assert [event for _, event in worker_b.events_since("poll", start)] == [{"type": "cluster_start"}, {"type": "done"}]
@@ -0,0 +1,93 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.models import Cluster, ClusterSnapshot
+import app.services.snapshots as snapshots
+from app.services.snapshots import resolve_snapshot_ids, load_snapshots_as_of, iter_snapshots_as_of, load_snapshot_payload, ParsedSnapshotCache, SNAPSHOT_GRACE_SECONDS
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def test_as_of_resolution_matches_grace_policy():
+    base = datetime(2024, 3, 1, 12, 0)
+    with Session(engine) as session:
+        for name in ("a", "b", "c", "d"):
+            session.add(Cluster(name=name, api_url=f"https://{name}", token="t"))
+        session.commit()
+
+        def snap(cluster_id, ts, status="Success"):
+            s = ClusterSnapshot(cluster_id=cluster_id, timestamp=ts, status=status, data_json="{}")
+            session.add(s)
+            session.commit()
+            return s.id
+
+        a_old = snap(1, base - timedelta(hours=1))
+        a_grace = snap(1, base + timedelta(seconds=SNAPSHOT_GRACE_SECONDS)) # Exactly on the grace boundary
+        snap(1, base + timedelta(seconds=SNAPSHOT_GRACE_SECONDS, microseconds=1))
+        b_ok = snap(2, base - timedelta(minutes=5))
+        snap(2, base, status="Failed") # Never picked
+        c_first = snap(3, base)
+        c_tie = snap(3, base) # Same timestamp: highest id wins
+        snap(4, base + timedelta(days=1)) # Only after the window
+
+        assert resolve_snapshot_ids(session, base) == {1: a_grace, 2: b_ok, 3: c_tie}
+        assert resolve_snapshot_ids(session, base - timedelta(minutes=30)) == {1: a_old}
+        assert resolve_snapshot_ids(session, base, [2, 4]) == {2: b_ok}
+        assert resolve_snapshot_ids(session, base, []) == {}
+        assert resolve_snapshot_ids(session)[4] is not None # Latest mode ignores the window
+        assert c_first < c_tie
+
+        snaps = load_snapshots_as_of(session, base)
+        assert {cid: s.id for cid, s in snaps.items()} == {1: a_grace, 2: b_ok, 3: c_tie}
+        assert all("data_json" in inspect(s).unloaded for s in snaps.values()) # Blobs load on access only
+        session.expunge_all()
+
+        seen = {}
+        for cid, s in iter_snapshots_as_of(session, base):
+            assert s.data_json is not None
+            assert all(other not in session for other in seen.values()) # One payload held at a time
+            seen[cid] = s
+        assert {cid: s.id for cid, s in seen.items()} == {1: a_grace, 2: b_ok, 3: c_tie}
+
+def test_parsed_payloads_are_cached_per_snapshot(monkeypatch):
+    cache = ParsedSnapshotCache(max_bytes=1000)
+    monkeypatch.setattr(snapshots, "parsed_snapshots", cache)
+    base = datetime(2024, 5, 1, 12, 0)
+    with Session(engine) as session:
+        cluster = Cluster(name="payload", api_url="https://payload", token="t")
+        session.add(cluster)
+        session.commit()
+        for hours, nodes in ((2, 1), (1, 2)):
+            data = {"nodes": [{"metadata": {"name": f"n{i}"}} for i in range(nodes)]}
+            session.add(ClusterSnapshot(cluster_id=cluster.id, timestamp=base - timedelta(hours=hours), data_json=json.dumps(data), argocd_json='{"is_active": true}'))
+        session.commit()
+
+        first = load_snapshot_payload(session, cluster.id, base)
+        assert len(first["nodes"]) == 2 and first["argocd"] == {"is_active": True}
+        # Follow-up drill-downs on the same snapshot get the decoded object back
+        assert load_snapshot_payload(session, cluster.id, base) is first
+        older = load_snapshot_payload(session, cluster.id, base - timedelta(hours=1, minutes=30))
+        assert len(older["nodes"]) == 1
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2 and cache.stats()["entries"] == 2
+        # Charged at the decoded size, not the JSON length
+        with_blobs = sum(len(s.data_json) + len(s.argocd_json) for s in session.exec(select(ClusterSnapshot).where(ClusterSnapshot.cluster_id == cluster.id)).all())
+        assert cache.bytes >= with_blobs * 5
+
+        # Least recently used payloads are evicted to stay within the byte budget
+        cache.max_bytes = cache.bytes - 1
+        cache.put(("other", "ts"), {}, 1)
+        assert cache.stats()["evictions"] >= 1 and cache.bytes <= cache.max_bytes
+        assert load_snapshot_payload(session, cluster.id, base - timedelta(days=30)) is None
@@ -0,0 +1,90 @@
+import sys
+import os
+import calendar
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select, text
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+import app.database as database
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, MapidLicenseUsage, ComplianceScore, epoch_seconds
+
+def make_engine():
+    return create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+
+def test_epoch_migration_backfills_legacy_rows(monkeypatch):
+    engine = make_engine()
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Legacy schema: string timestamps only
+        for table in ("licenseusage", "mapidlicenseusage", "compliancescore"):
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN ts_epoch"))
+        conn.execute(text("""
+            INSERT INTO compliancescore (cluster_id, timestamp, passed_count, total_count, score)
+            VALUES (1, '2024-02-29 23:59:59', 1, 1, 100.0), (1, '2024-03-01 00:00:00', 1, 1, 100.0)
+        """))
+
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "EPOCH_BACKFILL_BATCH", 1)
+    database.create_db_and_tables()
+
+    with Session(engine) as session:
+        scores = session.exec(select(ComplianceScore).order_by(ComplianceScore.id)).all()
+        assert [s.ts_epoch for s in scores] == [
+            calendar.timegm((2024, 2, 29, 23, 59, 59)), calendar.timegm((2024, 3, 1, 0, 0, 0))
+        ]
+        # New ORM rows get it on insert
+        session.add(ComplianceScore(cluster_id=1, timestamp="2024-03-02 06:00:00", passed_count=0, total_count=1, score=0.0))
+        session.commit()
+        assert session.exec(select(ComplianceScore.ts_epoch).order_by(ComplianceScore.id.desc())).first() == epoch_seconds(datetime(2024, 3, 2, 6))
+
+def test_mapid_global_trends_buckets_by_utc_day():
+    engine = make_engine()
+    SQLModel.metadata.create_all(engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+    try:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        with Session(engine) as session:
+            session.add_all([Cluster(name="a", api_url="https://a", token="t"), Cluster(name="b", api_url="https://b", token="t")])
+            session.commit()
+
+            def usage(cluster_id, ts, count, mapid="M1"):
+                session.add(MapidLicenseUsage(cluster_id=cluster_id, timestamp=ts.strftime("%Y-%m-%d %H:%M:%S"),
+                                              mapid=mapid, node_count=1, total_vcpu=4, license_count=count))
+
+            # The cutoff's own day: later the same day than the cutoff, so it must be included
+            cutoff_day = today - timedelta(days=2)
+            usage(1, cutoff_day + timedelta(hours=23, minutes=59), 7)
+            # Max per cluster per day, then summed across clusters
+            usage(1, today + timedelta(minutes=1), 3)
+            usage(1, today + timedelta(minutes=2), 5)
+            usage(2, today + timedelta(minutes=3), 2)
+            usage(2, today + timedelta(minutes=4), 1, mapid="M2")
+            # Outside the window
+            usage(1, today - timedelta(days=5), 100)
+            session.commit()
+
+        client = TestClient(app)
+        data = client.get("/api/dashboard/mapid/global-trends?days=2").json()
+        assert data["labels"] == [cutoff_day.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")]
+        series = {d["label"]: d["data"] for d in data["datasets"]}
+        assert series == {"M1": [7, 7], "M2": [0, 1]}
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, ClusterSnapshot
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+    seed()
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def seed():
+    # Two clusters polled every 15 minutes for just under 2 days
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        clusters = [Cluster(name=f"bucket-{i}", api_url=f"https://b{i}", token="t") for i in range(2)]
+        session.add_all(clusters)
+        session.commit()
+        for step in range(180):
+            ts = now - timedelta(minutes=15 * step + 1)
+            for c in clusters:
+                licenses = 10 + (step % 4) # Peaks at 13 within every hour
+                session.add(ClusterSnapshot(
+                    cluster_id=c.id, timestamp=ts, node_count=3, vcpu_count=12.0, license_count=licenses,
+                    licensed_node_count=3, data_json=json.dumps({})
+                ))
+        session.commit()
+
+def test_max_points_picks_finest_bucket_that_fits():
+    raw = client.get("/api/dashboard/trends?cluster_id=1&days=2")
+    assert raw.headers["X-Trend-Bucket"] == "raw"
+    assert len(raw.json()) == 180
+
+    response = client.get("/api/dashboard/trends?cluster_id=1&days=2&max_points=60")
+    assert response.status_code == 200
+    assert response.headers["X-Trend-Bucket"] == "hourly"
+    points = response.json()
+    assert len(points) <= 60
+    assert all(p["licenses"] == 13 for p in points[1:-1]) # Peak of each full hour
+    assert all(p["timestamp"].endswith(":00:00") for p in points)
+
+    # Already small enough: raw points are returned untouched
+    assert client.get("/api/dashboard/trends?cluster_id=1&days=2&max_points=500").headers["X-Trend-Bucket"] == "raw"
+
+def test_global_series_share_bucket_timestamps():
+    response = client.get("/api/dashboard/trends?days=2&bucket=6h")
+    assert response.headers["X-Trend-Bucket"] == "6h"
+    series = response.json()
+    assert set(series) == {"bucket-0", "bucket-1"}
+    assert [p["timestamp"] for p in series["bucket-0"]] == [p["timestamp"] for p in series["bucket-1"]]
+    assert len(series["bucket-0"]) <= 9
+
+    assert client.get("/api/dashboard/trends?days=2&bucket=fortnightly").status_code == 400
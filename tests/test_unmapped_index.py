@@ -0,0 +1,119 @@
+import sys
+import os
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.main import app
+from app.dependencies import get_current_user
+from app.database import get_session, get_read_session
+from app.models import User, Cluster, PollRun, NamespaceExclusionRule, UnmappedResource
+import app.services.poller as poller
+import app.services.unmapped as unmapped
+import app.services.writer as writer_module
+from app.services.cache import response_cache
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def get_session_override():
+    with Session(engine) as session:
+        yield session
+
+client = TestClient(app)
+
+def setup_module(module):
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_current_user] = lambda: User(username="admin_test", role="admin")
+
+def teardown_module(module):
+    app.dependency_overrides.clear()
+
+def resource(name, mapid=None, cpu=4):
+    labels = {"mapid": mapid} if mapid is not None else {}
+    return {"metadata": {"name": name, "labels": labels}, "status": {"capacity": {"cpu": str(cpu)}}}
+
+def poll(monkeypatch, cluster_id, nodes, projects, started_at):
+    resources = {"Node": nodes, "Project": projects}
+    monkeypatch.setattr(poller, "fetch_resources", lambda cluster, api_version, kind, **kw: resources.get(kind, []))
+    with Session(engine) as session:
+        run = PollRun(started_at=started_at)
+        session.add(run)
+        session.commit()
+        run_id = run.id
+    poller.poll_cluster(cluster_id, rules=[], run_timestamp=started_at, run_id=run_id, default_include=True, collect_olm=False)
+
+def report():
+    response_cache.clear()
+    response = client.get("/api/dashboard/mapid/unmapped-nodes")
+    assert response.status_code == 200
+    return [(r["cluster_name"], r["node_name"], r["reason"]) for r in response.json()]
+
+def test_index_follows_polls_and_namespace_rules(monkeypatch):
+    monkeypatch.setattr(poller, "engine", engine)
+    monkeypatch.setattr(unmapped, "engine", engine)
+    monkeypatch.setattr(writer_module, "engine", engine)
+    monkeypatch.setattr(poller, "get_service_mesh_details", lambda cluster: {})
+    monkeypatch.setattr(poller, "get_argocd_details", lambda cluster: {})
+
+    with Session(engine) as session:
+        session.add(NamespaceExclusionRule(name="platform", match_pattern="^openshift-"))
+        session.add(NamespaceExclusionRule(name="broken", match_pattern="[unclosed")) # Skipped, not fatal
+        cluster = Cluster(name="fleet-a", api_url="https://x", token="t")
+        session.add(cluster)
+        session.commit()
+        cid = cluster.id
+
+    now = datetime.utcnow().replace(microsecond=0)
+    projects = [resource("team-a", mapid="M1"), resource("team-b"), resource("team-c", mapid=""), resource("openshift-monitoring")]
+    poll(monkeypatch, cid, [resource("n1", mapid="M1"), resource("n2")], projects, now - timedelta(hours=2))
+
+    assert report() == [
+        ("fleet-a", "[Node] n2", "Licensed Node missing MAPID"),
+        ("fleet-a", "[Project] team-b", "Project missing MAPID"),
+        ("fleet-a", "[Project] team-c", "Project missing MAPID"),
+    ]
+
+    # Rule changes re-flag the indexed projects without a poll
+    rule_id = client.post("/settings/api/namespaces/rules", json={"name": "team-b", "match_pattern": "^team-b$"}).json()["rule"]["id"]
+    assert "[Project] team-b" not in [r[1] for r in report()]
+    client.delete(f"/settings/api/namespaces/rules/{rule_id}")
+    assert "[Project] team-b" in [r[1] for r in report()]
+    assert unmapped.refresh_namespace_exclusions() == 0 # Flags already match the committed rules
+
+    # A new successful poll replaces the cluster's rows
+    poll(monkeypatch, cid, [resource("n1", mapid="M1"), resource("n2", mapid="M2")], projects[:2], now - timedelta(hours=1))
+    assert report() == [("fleet-a", "[Project] team-b", "Project missing MAPID")]
+
+    # Existing databases: built once from the latest snapshots
+    with Session(engine) as session:
+        for row in session.exec(select(UnmappedResource)).all():
+            session.delete(row)
+        session.commit()
+    assert unmapped.ensure_unmapped_index()["rows"] == 1
+    assert report() == [("fleet-a", "[Project] team-b", "Project missing MAPID")]
+    assert unmapped.ensure_unmapped_index() == {"status": "skipped"}
+
+    # Deleting the indexed snapshot re-indexes the cluster from its previous one
+    with Session(engine) as session:
+        latest = session.exec(select(UnmappedResource.snapshot_id)).first()
+        run_id = session.exec(select(PollRun.id).order_by(PollRun.id.desc())).first()
+    assert client.delete(f"/api/admin/clusters/snapshots/{latest}").status_code == 200
+    # (no license rules stored here, so only the projects are re-derived)
+    assert report() == [
+        ("fleet-a", "[Project] team-b", "Project missing MAPID"),
+        ("fleet-a", "[Project] team-c", "Project missing MAPID"),
+    ]
+    with Session(engine) as session:
+        assert latest not in session.exec(select(UnmappedResource.snapshot_id)).all()
+        assert session.get(PollRun, run_id) is None # Nothing references the emptied run
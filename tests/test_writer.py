@@ -0,0 +1,88 @@
+import sys
+import os
+import threading
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select, text
+from sqlmodel.pool import StaticPool
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.models import AppConfig, PollRun
+import app.services.writer as writer_module
+
+# Setup Test DB
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+SQLModel.metadata.create_all(engine)
+
+def test_grouped_commits_and_failure_isolation(monkeypatch):
+    monkeypatch.setattr(writer_module, "engine", engine)
+    writer = writer_module.DbWriter(batch_max=32)
+
+    def worker(n):
+        for i in range(25):
+            writer.run(lambda s, k=f"K{n}-{i}": s.add(AppConfig(key=k, value="v")))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with Session(engine) as session:
+        assert len(session.exec(select(AppConfig)).all()) == 200
+    stats = writer.stats()
+    assert stats["jobs"] == 200 and stats["queue_depth"] == 0
+    assert stats["commit_latency_ms"]["p95"] is not None
+
+    # A failing job is retried alone and does not take down the jobs grouped with it
+    gate = threading.Event()
+    blocker = writer.submit(lambda s: gate.wait(5))
+    bad = writer.submit(lambda s: s.execute(text("INSERT INTO missing_table VALUES (1)")))
+    good = writer.submit(lambda s: s.add(AppConfig(key="after-failure", value="v")))
+    gate.set()
+    blocker.result(5)
+    with pytest.raises(Exception):
+        bad.result(5)
+    good.result(5)
+
+    with Session(engine) as session:
+        assert session.get(AppConfig, "after-failure") is not None
+    assert writer.stats()["failed_jobs"] == 1
+
+def test_replayed_jobs_get_fresh_primary_keys(monkeypatch):
+    monkeypatch.setattr(writer_module, "engine", engine)
+    writer = writer_module.DbWriter(batch_max=32)
+
+    # Stands in for a row committed elsewhere between the grouped attempt and the replay
+    attempts = []
+    def elsewhere(session):
+        attempts.append(1)
+        if len(attempts) > 1:
+            session.add(PollRun())
+            session.flush()
+
+    rows = [PollRun(), PollRun()]
+    def add_rows(session):
+        session.add_all(rows)
+        session.flush()
+        return [r.id for r in rows]
+
+    gate = threading.Event()
+    blocker = writer.submit(lambda s: gate.wait(5))
+    first = writer.submit(elsewhere)
+    added = writer.submit(add_rows)
+    bad = writer.submit(lambda s: s.execute(text("INSERT INTO missing_table VALUES (1)")))
+    gate.set()
+    blocker.result(5)
+    first.result(5)
+    with pytest.raises(Exception):
+        bad.result(5)
+
+    ids = added.result(5)
+    with Session(engine) as session:
+        assert sorted(session.exec(select(PollRun.id)).all()) == sorted(ids + [min(ids) - 1])